@@ -1,30 +1,43 @@
+import os
+import threading
+import time
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import numpy as np
+from typing import Dict, List, Optional
 
-# --- 1. Load Class Mapping ---
-CLASS_MAPPING = {}
-try:
-    with open("class_mapping.txt", 'r') as f:
+from healthy_gate import HEALTHY_GATE_PATH, HealthyGate
+from model_registry import ModelRegistry, check_normalization
+from model_variants import BASELINE_ARCHITECTURE, SPECTRAL_ARCHITECTURE, build_variant, read_model_config
+from normalization import normalize_windows
+from resampling import SOURCE_SAMPLE_RATE, to_model_rate, window_samples
+from spectral import SpectralFrontEnd
+
+# Nothing is loaded at import time: call `load_model()` (and `warm_up()`) at
+# startup. Inference functions load the model lazily if that was skipped.
+
+# --- 1. Class Mapping ---
+CLASS_MAPPING_PATH = "class_mapping.txt"
+CLASS_MAPPING: Dict[int, str] = {}  # mapping of the active model, filled in place by activate()
+
+def load_class_mapping(path: str = CLASS_MAPPING_PATH) -> Dict[int, str]:
+    """Reads the "index:class_name" lines written by train.py. Raises on a missing or empty file."""
+    mapping = {}
+    with open(path, 'r') as f:
         for line in f:
             line = line.strip()
             if ":" in line:
                 idx_str, class_name = line.split(':', 1)
-                CLASS_MAPPING[int(idx_str)] = class_name
-    print(f"Loaded class mapping: {CLASS_MAPPING}")
-except FileNotFoundError:
-    print("Error: class_mapping.txt not found. Exiting.")
-    exit()
-except Exception as e:
-    print(f"Error reading class_mapping.txt: {e}")
-    exit()
+                mapping[int(idx_str)] = class_name
+    if not mapping:
+        raise ValueError(f"{path} does not contain any classes")
+    return mapping
 
 
 # --- 2. Define The Model Architecture ---
 # This MUST be the *exact* same architecture as in your train.py
-# The number of classes is now dynamic based on your mapping file.
-NUM_CLASSES = len(CLASS_MAPPING)
+# The number of classes is dynamic, based on your mapping file.
 
 class SimpleCNN(nn.Module):
     def __init__(self, num_classes=4):
@@ -60,22 +73,262 @@ class SimpleCNN(nn.Module):
         x = self.fc3(x)
         return x
 
-# --- 3. Load Model and Weights ---
-MODEL_PATH = "fault_detector.pt"
+# --- 3. Inference Backends ---
+# All backends take a normalized float32 array of shape [B, 1, num_samples]
+# (or [B, num_bands, num_frames] spectral features for spectral models, see
+# LoadedModel.front_end) and return logits of shape [B, num_classes] as a numpy array.
+MODEL_PATH = "fault_detector.pt"                          # eager state dict (train.py)
+TORCHSCRIPT_MODEL_PATH = "fault_detector.torchscript.pt"  # frozen TorchScript (train.py export)
+ONNX_MODEL_PATH = "fault_detector.onnx"                   # BN-folded ONNX graph (train.py export)
+QUANTIZED_MODEL_PATH = "fault_detector_int8.torchscript.pt"  # INT8 TorchScript (quantize.py)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "eager")  # eager | torchscript | onnxruntime | int8
+WINDOW_SAMPLES = window_samples(SOURCE_SAMPLE_RATE)  # requests at other rates are resampled, see prepare_windows
+
+
+def load_weights(model: nn.Module, path: str):
+    """
+    Loads a state dict into `model`. Where torch supports it the checkpoint is
+    memory-mapped and the mapped tensors become the parameters (assign=True), so
+    the weights are neither read into a buffer nor copied, and processes loading
+    the same file share its pages through the page cache.
+    """
+    try:
+        state_dict = torch.load(path, map_location=torch.device('cpu'), mmap=True, weights_only=True)
+        model.load_state_dict(state_dict, assign=True)
+    except (TypeError, RuntimeError):
+        # Older torch without mmap/assign, or a legacy (non-zipfile) checkpoint
+        model.load_state_dict(torch.load(path, map_location=torch.device('cpu')))
+
+
+class EagerBackend:
+    """
+    Plain PyTorch: rebuilds the architecture named in the model's
+    model_config.json (SimpleCNN if there is none, see model_variants.py) and
+    loads the state dict.
+    """
+    name = "eager"
+    filename = MODEL_PATH
+
+    def __init__(self, path: str = MODEL_PATH, num_classes: Optional[int] = None):
+        num_classes = num_classes or len(CLASS_MAPPING or load_class_mapping())
+        config = read_model_config(os.path.dirname(path) or ".")
+        self.architecture = config["architecture"]
+        if self.architecture == BASELINE_ARCHITECTURE:
+            self.model = SimpleCNN(num_classes=num_classes)
+        else:
+            self.model = build_variant(self.architecture, num_classes, config.get("spectral"))
+        load_weights(self.model, path)
+        self.model.eval() # Set model to evaluation mode (VERY IMPORTANT!)
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            return self.model(torch.from_numpy(batch)).numpy()
+
+
+class TorchScriptBackend:
+    """Frozen TorchScript module exported by train.py (no Python model class needed)."""
+    name = "torchscript"
+    filename = TORCHSCRIPT_MODEL_PATH
+
+    def __init__(self, path: str = TORCHSCRIPT_MODEL_PATH):
+        self.model = torch.jit.load(path, map_location=torch.device('cpu'))
+        self.model.eval()
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            return self.model(torch.from_numpy(batch)).numpy()
+
+
+class QuantizedBackend(TorchScriptBackend):
+    """INT8 fault detector (static conv stack + dynamic Linear layers) exported by quantize.py."""
+    name = "int8"
+    filename = QUANTIZED_MODEL_PATH
+
+    def __init__(self, path: str = QUANTIZED_MODEL_PATH):
+        super().__init__(path)
+
+
+class OnnxRuntimeBackend:
+    """ONNX graph (BatchNorm folded into the convolutions) run with onnxruntime on CPU."""
+    name = "onnxruntime"
+    filename = ONNX_MODEL_PATH
+
+    def __init__(self, path: str = ONNX_MODEL_PATH):
+        import onnxruntime as ort  # optional dependency, only needed for this backend
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+BACKENDS = {
+    EagerBackend.name: EagerBackend,
+    TorchScriptBackend.name: TorchScriptBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    QuantizedBackend.name: QuantizedBackend,
+}
 
-# Initialize the model
-model = SimpleCNN(num_classes=NUM_CLASSES)
 
-# Load the saved weights
-try:
-    # Use map_location='cpu' if you are not using a GPU for inference
-    model.load_state_dict(torch.load(MODEL_PATH, map_location=torch.device('cpu')))
-    model.eval() # Set model to evaluation mode (VERY IMPORTANT!)
-    print(f"Successfully loaded model from {MODEL_PATH}")
-except Exception as e:
-    print(f"Error loading model {MODEL_PATH}: {e}")
-    print("Please make sure the file exists and the model definition is correct.")
-    exit()
+def load_backend(name: str = INFERENCE_BACKEND, model_dir: str = ".", num_classes: Optional[int] = None):
+    """Creates the inference backend with the given name from its model file in `model_dir`."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose from: {', '.join(BACKENDS)}")
+    backend_cls = BACKENDS[name]
+    path = os.path.join(model_dir, backend_cls.filename)
+    if backend_cls is EagerBackend:
+        return EagerBackend(path, num_classes=num_classes)
+    return backend_cls(path)
+
+
+# --- Optional Cascade: cheap "clearly healthy" gate in front of the model ---
+INFERENCE_CASCADE = os.environ.get("INFERENCE_CASCADE", "0") == "1"
+CASCADE_THRESHOLD = os.environ.get("CASCADE_THRESHOLD", "")  # empty = threshold chosen by train.py
+PREDICTION_TOP_K = int(os.environ.get("PREDICTION_TOP_K", "3"))
+
+# --- Model Loading, Hot Swap and Warm-up ---
+class LoadedModel:
+    """
+    One model version ready to serve: its backend, class mapping, (optional)
+    healthy gate, input sample rate and, for models with a spectral input, the front end that
+    turns normalized windows into their input features. Never mutated after creation, so a version can be swapped for
+    another by replacing a single reference (see `activate`).
+    """
+
+    def __init__(self, version: str, model_dir: str, backend, class_mapping: Dict[int, str],
+                 healthy_gate: Optional[HealthyGate] = None, front_end: Optional[SpectralFrontEnd] = None,
+                 sample_rate: int = SOURCE_SAMPLE_RATE):
+        self.version = version
+        self.model_dir = model_dir
+        self.backend = backend
+        self.class_mapping = class_mapping
+        self.healthy_gate = healthy_gate
+        self.front_end = front_end
+        self.sample_rate = sample_rate
+        self.window_samples = window_samples(sample_rate)
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "model_dir": self.model_dir,
+            "backend": self.backend.name,
+            "classes": [self.class_mapping[i] for i in sorted(self.class_mapping)],
+            "cascade": self.healthy_gate is not None,
+            "input": "spectral" if self.front_end is not None else "waveform",
+            "sample_rate": self.sample_rate,
+        }
+
+
+active_model: Optional[LoadedModel] = None
+_load_lock = threading.Lock()
+
+def resolve_model_dir(registry: Optional[ModelRegistry] = None):
+    """
+    (version, directory) to serve at startup: the registry's active version, or
+    the model files in the working directory (version "local") if nothing has
+    been activated yet.
+    """
+    registry = registry or ModelRegistry()
+    version = registry.active_version()
+    if version is None:
+        return "local", "."
+    return version, registry.path(version)
+
+def build_model(model_dir: str = ".", backend_name: str = INFERENCE_BACKEND, version: str = "local",
+                cascade: bool = INFERENCE_CASCADE) -> LoadedModel:
+    """
+    Loads one model version from `model_dir` without activating it: class
+    mapping, inference backend, input sample rate, spectral front end (spectral
+    models) and (with `cascade`) the healthy gate. Raises if the artifacts are missing or were
+    trained with a different normalization.
+    """
+    check_normalization(model_dir)
+    class_mapping = load_class_mapping(os.path.join(model_dir, CLASS_MAPPING_PATH))
+    loaded_backend = load_backend(backend_name, model_dir, num_classes=len(class_mapping))
+    config = read_model_config(model_dir)
+    front_end = None
+    if config["architecture"] == SPECTRAL_ARCHITECTURE:
+        front_end = SpectralFrontEnd.from_config(config.get("spectral"))
+
+    gate = None
+    if cascade:
+        gate_path = os.path.join(model_dir, HEALTHY_GATE_PATH)
+        try:
+            gate = HealthyGate.load(gate_path)
+            if CASCADE_THRESHOLD:
+                gate.threshold = float(CASCADE_THRESHOLD)
+        except Exception as e:
+            # The cascade is only an optimization: fall back to the full model for every window
+            print(f"Warning: could not load healthy gate '{gate_path}' ({e}); cascade disabled")
+    return LoadedModel(version, model_dir, loaded_backend, class_mapping, gate, front_end, config["sample_rate"])
+
+def activate(model: LoadedModel) -> Optional[LoadedModel]:
+    """
+    Makes `model` the one every new batch uses and returns the previous one.
+    Batches already running keep the model they started with.
+    """
+    global active_model
+    with _load_lock:
+        previous = active_model
+        active_model = model  # single reference swap: readers see the old or the new model, never a mix
+        CLASS_MAPPING.clear()
+        CLASS_MAPPING.update(model.class_mapping)
+    return previous
+
+def load_model(backend_name: str = INFERENCE_BACKEND, model_dir: Optional[str] = None,
+               version: Optional[str] = None):
+    """
+    Loads and activates the startup model: `model_dir` if given, otherwise the
+    registry's active version (or the working directory). Does nothing if a
+    model is already active; raises if it cannot be loaded, so the caller
+    decides how to report it.
+    """
+    with _load_lock:
+        if active_model is not None:
+            return
+    if model_dir is None:
+        version, model_dir = resolve_model_dir()
+    started = time.perf_counter()
+    model = build_model(model_dir, backend_name, version or "local")
+    with _load_lock:
+        if active_model is not None:
+            return  # loaded concurrently
+    activate(model)
+    print(f"Loaded class mapping: {model.class_mapping}")
+    if model.healthy_gate is not None:
+        print(f"Cascade enabled: healthy gate threshold {model.healthy_gate.threshold:.3f}")
+    print(f"Successfully loaded model '{model.version}' ('{model.backend.name}' backend) "
+          f"in {time.perf_counter() - started:.2f}s")
+
+def current_model() -> LoadedModel:
+    """The active model, loading the startup model first if that was skipped."""
+    model = active_model
+    if model is None:
+        load_model()
+        model = active_model
+    return model
+
+def warm_up(batch_sizes=(1,), passes: int = 1, model: Optional[LoadedModel] = None) -> float:
+    """
+    Runs `passes` forward passes at each batch size (plus one full classify_batch)
+    so oneDNN selects its kernels and the allocator grows its pools before real
+    traffic arrives. Warms `model` (e.g. a version about to be swapped in) or the
+    active model. Returns the seconds spent.
+    """
+    model = model or current_model()
+    started = time.perf_counter()
+    rng = np.random.default_rng(0)
+    for batch_size in batch_sizes:
+        windows = normalize_windows(rng.standard_normal((batch_size, model.window_samples), dtype=np.float32))
+        for _ in range(passes):
+            _forward_probabilities(windows, model)
+    if passes > 0:
+        # Source-rate windows: also builds the resampling filter of models at a lower rate
+        classify_batch(rng.standard_normal((1, WINDOW_SAMPLES), dtype=np.float32), model=model)
+    return time.perf_counter() - started
 
 # --- 4. Define Prediction Function ---
 def predict_fault(samples: np.ndarray) -> str:
@@ -86,37 +339,312 @@ def predict_fault(samples: np.ndarray) -> str:
     if samples.ndim != 1:
         raise ValueError(f"Expected 1D numpy array, but got shape {samples.shape}")
 
-    # 1. Normalize the new, incoming data
-    #    This MUST match the normalization used in your `preprocess_data.py`
-    # normalized_samples = samples
-    chunk_mean = np.mean(samples)
-    chunk_std = np.std(samples)
-    if chunk_std > 0:
-        # Z-score normalization then scale to [-1, 1]
-        chunk_normalized = (samples - chunk_mean) / chunk_std
-        chunk_max = np.max(np.abs(chunk_normalized))
-        if chunk_max > 0:
-            normalized_samples = chunk_normalized / chunk_max
-        else:
-            normalized_samples = chunk_normalized
+    result = classify_batch(samples[np.newaxis, :])[0]
+    print(f"🤖 AI Prediction: '{result['label']}' (confidence {result['confidence']:.2%}, {result['stage']} stage)")
+    return result["label"]
+
+# --- 5. Batched Prediction ---
+def prepare_windows(windows, model: Optional[LoadedModel] = None) -> np.ndarray:
+    """
+    Normalized [B, model.window_samples] model input from raw windows: a 2D
+    [B, num_samples] array or a sequence of 1D windows of any lengths. Each
+    window covers one second (resampling.WINDOW_SECONDS), so its length is its
+    sample rate; windows at another rate than the model's are resampled to it,
+    one vectorized pass per distinct length.
+    """
+    model = model or current_model()
+    if isinstance(windows, np.ndarray) and windows.ndim == 2:
+        return to_model_rate(windows, model.sample_rate)
+    lengths = np.array([len(window) for window in windows])
+    if len(lengths) and (lengths == lengths[0]).all():
+        return to_model_rate(np.stack(windows), model.sample_rate)
+    batch = np.empty((len(windows), model.window_samples), dtype=np.float32)
+    for length in np.unique(lengths):
+        rows = np.flatnonzero(lengths == length)
+        batch[rows] = to_model_rate(np.stack([windows[i] for i in rows]), model.sample_rate)
+    return batch
+
+def _forward_probabilities(batch: np.ndarray, model: Optional[LoadedModel] = None) -> np.ndarray:
+    """Runs an already normalized [B, num_samples] float32 batch and returns softmax probabilities [B, num_classes]."""
+    model = model or current_model()
+    if model.front_end is None:
+        inputs = batch[:, np.newaxis, :]
     else:
-        # If std is 0 (constant signal), just center around 0
-        normalized_samples = np.zeros_like(samples)
-    
-    # 2. Convert to PyTorch Tensor
-    #    Shape must be [1, 1, num_samples] -> (Batch, Channels, Length)
-    with torch.no_grad(): # Disable gradient calculation for inference
-        signal_tensor = torch.tensor(normalized_samples, dtype=torch.float32).unsqueeze(0).unsqueeze(0) # TODO: Check Size
-        
-        # 3. Get model output (logits)
-        logits = model(signal_tensor)
-        
-        # 4. Get predicted class index
-        predicted_idx = torch.argmax(logits, dim=1).item()
-        
-        # 5. Map index to string label
-        label = CLASS_MAPPING.get(predicted_idx, "healthy")  # Default to healthy instead of Unknown
-        
-        print(f"🤖 AI Prediction: Index {predicted_idx} -> '{label}' (confidence based on logits)")
-        
-        return label
\ No newline at end of file
+        with torch.no_grad():
+            inputs = model.front_end.torch_features(torch.from_numpy(batch)).numpy()
+    logits = torch.from_numpy(model.backend(inputs))
+    return F.softmax(logits, dim=1).numpy()
+
+def _full_result(probs: np.ndarray, top_k: int, class_mapping: Dict[int, str]) -> dict:
+    order = np.argsort(probs)[::-1][:top_k]
+    label = class_mapping.get(int(order[0]), "healthy")
+    return {
+        "label": label,
+        "confidence": float(probs[order[0]]),
+        "top_k": [{"label": class_mapping.get(int(i), "healthy"), "probability": float(probs[i])} for i in order],
+        "probabilities": {class_mapping.get(i, str(i)): float(p) for i, p in enumerate(probs)},
+        "stage": "full",
+    }
+
+def _gate_result(p_healthy: float, healthy_gate: HealthyGate) -> dict:
+    # The gate only knows P(healthy); the per-class split of the rest is unknown
+    return {
+        "label": healthy_gate.healthy_label,
+        "confidence": float(p_healthy),
+        "top_k": [{"label": healthy_gate.healthy_label, "probability": float(p_healthy)}],
+        "probabilities": None,
+        "stage": "gate",
+    }
+
+def classify_batch(windows: np.ndarray, top_k: int = PREDICTION_TOP_K, timings: Optional[dict] = None,
+                   model: Optional[LoadedModel] = None) -> List[dict]:
+    """
+    Takes a 2D numpy array of shape [B, num_samples] (one window per row, or a
+    list of windows at different rates, see prepare_windows) and returns one
+    result per row: label, confidence (softmax probability of the label), the
+    `top_k` most likely classes, the full probability map and the cascade
+    `stage` that produced it ("gate" or "full").
+
+    With INFERENCE_CASCADE=1, rows the healthy gate is confident about are
+    answered by the gate; only the remaining rows go through the model, as one
+    forward pass.
+
+    If `timings` is given, the seconds spent per stage ("normalize", including
+    any resampling, "gate", "forward") for this batch are stored in it. The whole batch runs on `model`
+    (default: the active model at the time of the call), even if another
+    version is activated meanwhile.
+    """
+    model = model or current_model()
+    healthy_gate = model.healthy_gate
+    started = time.perf_counter()
+    batch = prepare_windows(windows, model)
+    results: List[dict] = [None] * len(batch)
+    normalized = time.perf_counter()
+
+    remaining = np.arange(len(batch))
+    if healthy_gate is not None:
+        p_healthy = healthy_gate.probability(batch)
+        confident = p_healthy >= healthy_gate.threshold
+        for i in np.flatnonzero(confident):
+            results[i] = _gate_result(p_healthy[i], healthy_gate)
+        remaining = np.flatnonzero(~confident)
+    gated = time.perf_counter()
+
+    if len(remaining):
+        rows = batch if len(remaining) == len(batch) else batch[remaining]
+        for i, probs in zip(remaining, _forward_probabilities(rows, model)):
+            results[i] = _full_result(probs, top_k, model.class_mapping)
+
+    if timings is not None:
+        timings["normalize"] = normalized - started
+        if healthy_gate is not None:
+            timings["gate"] = gated - normalized
+        if len(remaining):
+            timings["forward"] = time.perf_counter() - gated
+    return results
+
+def predict_batch(windows: np.ndarray) -> List[str]:
+    """
+    Takes a 2D numpy array of shape [B, num_samples] (one window per row)
+    and returns one string label per row.
+
+    All rows are normalized in one vectorized pass (same function as
+    `preprocess_data.py`), then the whole batch goes through the model as a
+    single [B, 1, num_samples] forward pass (see `classify_batch`).
+    """
+    return [result["label"] for result in classify_batch(windows)]
+
+def predict_probabilities(windows: np.ndarray, model: Optional[LoadedModel] = None) -> np.ndarray:
+    """
+    Takes a 2D numpy array of shape [B, num_samples] and returns the model's
+    softmax probabilities [B, num_classes] as float32, always from the full
+    model (no cascade, no per-row dicts) - for offline scoring of large archives.
+    """
+    model = model or current_model()
+    return _forward_probabilities(prepare_windows(windows, model), model).astype(np.float32, copy=False)
+
+
+# --- 6. Streaming (Sliding-Window) Prediction ---
+STREAM_HOP_SAMPLES = int(os.environ.get("STREAM_HOP_SAMPLES", "9600"))  # 250 ms at 38.4 kHz
+STREAM_SMOOTHING = float(os.environ.get("STREAM_SMOOTHING", "0.5"))      # EMA weight of the newest window
+
+# Running sums drift slightly with every add/subtract, so they are recomputed
+# exactly from the ring buffer every this many hops.
+_STREAM_RESYNC_HOPS = 256
+
+
+class _DeviceStream:
+    __slots__ = ("ring", "hop", "pos", "filled", "since_hop", "hops", "total", "sum", "sumsq", "smoothed")
+
+    def __init__(self, window_samples: int, hop_samples: int):
+        self.ring = np.zeros(window_samples, dtype=np.float32)
+        self.hop = hop_samples
+        self.pos = 0          # next write position in the ring
+        self.filled = 0       # valid samples in the ring (<= window_samples)
+        self.since_hop = 0    # samples received since the last inference
+        self.hops = 0
+        self.total = 0        # samples received over the device's lifetime
+        self.sum = 0.0        # running sum / sum of squares of the ring contents (float64)
+        self.sumsq = 0.0
+        self.smoothed = None  # EMA of class probabilities
+
+    def write(self, chunk: np.ndarray):
+        """Appends samples (len <= ring size) and updates the running sums incrementally."""
+        n = len(chunk)
+        size = len(self.ring)
+        end = self.pos + n
+        if end <= size:
+            parts = [(self.pos, end, chunk)]
+        else:
+            split = size - self.pos
+            parts = [(self.pos, size, chunk[:split]), (0, end - size, chunk[split:])]
+
+        for start, stop, values in parts:
+            # The ring fills from position 0, so only positions below `filled` hold
+            # samples to subtract (a write that wraps fills the end of the ring first)
+            valid_stop = min(stop, self.filled)
+            if valid_stop > start:
+                outgoing = self.ring[start:valid_stop].astype(np.float64)
+                self.sum -= outgoing.sum()
+                self.sumsq -= np.dot(outgoing, outgoing)
+            incoming = values.astype(np.float64)
+            self.sum += incoming.sum()
+            self.sumsq += np.dot(incoming, incoming)
+            self.ring[start:stop] = values
+            self.filled = max(self.filled, stop)
+
+        self.pos = end % size
+        self.since_hop += n
+        self.total += n
+
+    def resync(self):
+        values = self.ring[:self.filled].astype(np.float64)
+        self.sum = values.sum()
+        self.sumsq = np.dot(values, values)
+
+    def snapshot_normalized(self, out: np.ndarray):
+        """
+        Writes the current window (oldest sample first) into `out`, normalized
+        like `normalization.normalize_window` but with mean/std taken from the
+        running sums.
+        """
+        size = len(self.ring)
+        out[:size - self.pos] = self.ring[self.pos:]
+        out[size - self.pos:] = self.ring[:self.pos]
+
+        mean = self.sum / size
+        std = np.sqrt(max(self.sumsq / size - mean * mean, 0.0))
+        if std > 0:
+            # Z-score normalization then scale to [-1, 1]
+            max_abs = max(out.max() - mean, mean - out.min()) / std
+            scale = 1.0 / (std * max_abs) if max_abs > 0 else 1.0 / std
+            out -= np.float32(mean)
+            out *= np.float32(scale)
+        else:
+            out.fill(0.0)
+
+
+class StreamingPredictor:
+    """
+    Sliding-window inference over continuous per-device sample streams.
+
+    Raw samples are appended to a per-device ring buffer holding the most recent
+    `window_samples`; every `hop_samples` new samples the model classifies the
+    latest full window. Mean/std come from running sums updated as samples enter
+    and leave the ring, so nothing is recomputed from scratch per hop. All windows
+    that become due within one `push` (e.g. a 1-second chunk with a 250 ms hop)
+    run as a single forward pass. Class probabilities are smoothed with an
+    exponential moving average, and the smoothed argmax is the reported label.
+
+    `hop_samples` and `window_samples` are counted at the source rate; a device
+    streaming at another rate gets a ring of one second at its own rate and a
+    hop of the same duration, and its windows are resampled to the model's rate
+    (see prepare_windows) before the forward pass.
+    """
+
+    def __init__(
+        self,
+        hop_samples: int = STREAM_HOP_SAMPLES,
+        window_samples: int = WINDOW_SAMPLES,
+        smoothing: float = STREAM_SMOOTHING,
+    ):
+        if not 0 < hop_samples <= window_samples:
+            raise ValueError("hop_samples must be in (0, window_samples]")
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in (0, 1]")
+        self.hop_samples = hop_samples
+        self.window_samples = window_samples
+        self.smoothing = smoothing
+        self._streams: Dict[str, _DeviceStream] = {}
+        self._lock = threading.Lock()
+
+    def push(self, device_id: str, samples: np.ndarray, sample_rate: Optional[int] = None) -> List[dict]:
+        """
+        Appends raw samples for one device and returns one prediction per window
+        that became due, oldest first. Each prediction carries the raw and the
+        smoothed label plus the stream position (`sample_index`) it ends at.
+        A device that changes `sample_rate` (default: the source rate) starts a new stream.
+        """
+        if samples.ndim != 1:
+            raise ValueError(f"Expected 1D numpy array, but got shape {samples.shape}")
+        ring_samples = self.window_samples if sample_rate is None else window_samples(sample_rate)
+
+        with self._lock:
+            stream = self._streams.get(device_id)
+            if stream is None or len(stream.ring) != ring_samples:
+                hop = max(1, round(self.hop_samples * ring_samples / self.window_samples))
+                stream = self._streams[device_id] = _DeviceStream(ring_samples, hop)
+
+            due = []
+            offset = 0
+            while offset < len(samples):
+                # Write up to the next hop boundary
+                take = min(len(samples) - offset, stream.hop - stream.since_hop)
+                stream.write(samples[offset:offset + take])
+                offset += take
+
+                if stream.since_hop < stream.hop:
+                    continue
+                stream.since_hop = 0
+                if stream.filled < ring_samples:
+                    continue  # not enough history for a full window yet
+
+                stream.hops += 1
+                if stream.hops % _STREAM_RESYNC_HOPS == 0:
+                    stream.resync()
+                row = np.empty(ring_samples, dtype=np.float32)
+                stream.snapshot_normalized(row)
+                due.append((stream.total, row))
+
+        if not due:
+            return []
+
+        # One forward pass for every window that became due in this push
+        model = current_model()
+        rows = np.stack([row for _, row in due])
+        if ring_samples != model.window_samples:
+            rows = to_model_rate(rows, model.sample_rate, normalized=True)
+        probabilities = _forward_probabilities(rows, model)
+
+        results = []
+        with self._lock:
+            for (sample_index, _), probs in zip(due, probabilities):
+                if stream.smoothed is None or stream.smoothed.shape != probs.shape:
+                    # First window, or a swapped-in model version with different classes
+                    stream.smoothed = probs.astype(np.float64)
+                else:
+                    stream.smoothed += self.smoothing * (probs - stream.smoothed)
+                raw_idx = int(np.argmax(probs))
+                smooth_idx = int(np.argmax(stream.smoothed))
+                results.append({
+                    "sample_index": sample_index,
+                    "raw_label": model.class_mapping.get(raw_idx, "healthy"),
+                    "label": model.class_mapping.get(smooth_idx, "healthy"),
+                    "confidence": float(stream.smoothed[smooth_idx]),
+                })
+        return results
+
+    def reset(self, device_id: str):
+        """Forgets a device's buffered samples and smoothing state."""
+        with self._lock:
+            self._streams.pop(device_id, None)
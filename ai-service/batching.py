@@ -0,0 +1,368 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# --- Batching Configuration (override with environment variables) ---
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "5"))
+BATCH_MAX_QUEUE_DEPTH = int(os.environ.get("BATCH_MAX_QUEUE_DEPTH", "1024"))
+
+# --- Admission Control ---
+ADMISSION_DEVICE_QUEUE_DEPTH = int(os.environ.get("ADMISSION_DEVICE_QUEUE_DEPTH", "4"))     # windows waiting per device
+ADMISSION_COALESCE = os.environ.get("ADMISSION_COALESCE", "1") == "1"                       # latest window per device wins
+ADMISSION_MAX_QUEUE_DELAY_MS = float(os.environ.get("ADMISSION_MAX_QUEUE_DELAY_MS", "1000"))  # 0 = no delay limit
+WINDOW_COST_SMOOTHING = 0.2  # EMA weight of the newest batch in the per-window cost estimate
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a window is not admitted: the batching queue is full
+    (reason "queue_full") or the windows ahead of it would take longer than
+    the queue delay limit ("overloaded"). `retry_after` is a hint in whole
+    seconds for when the backlog should have drained.
+    """
+    status_code = 503
+
+    def __init__(self, message: str, reason: str = "queue_full", retry_after: int = 1):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeviceQueueFullError(QueueFullError):
+    """Raised when one device already has its share of windows waiting (the device, not the service, is over its limit)."""
+    status_code = 429
+
+
+class _PendingWindow:
+    __slots__ = ("samples", "device_id", "futures", "enqueued_at")
+
+    def __init__(self, samples: np.ndarray, device_id: str, future: asyncio.Future):
+        self.samples = samples
+        self.device_id = device_id
+        self.futures = [future]  # callers of every window this one replaced (latest wins) share its result
+        self.enqueued_at = time.perf_counter()
+
+    @property
+    def active(self) -> bool:
+        return any(not future.done() for future in self.futures)
+
+    def set_result(self, result: Any):
+        for future in self.futures:
+            if not future.done():
+                future.set_result(result)
+
+    def set_exception(self, error: BaseException):
+        for future in self.futures:
+            if not future.done():
+                future.set_exception(error)
+
+
+class BatchScheduler:
+    """
+    Dynamic micro-batching in front of the model.
+
+    Windows from every device are queued and grouped into one [B, num_samples]
+    array as soon as either `max_batch_size` windows are waiting or the oldest
+    window has waited `max_wait_ms`. The batch runs through `predict_batch_fn`
+    in a worker thread (so the event loop stays free) and each caller's future
+    is resolved with its own result.
+
+    Alternatively `runner` - an async callable taking the list of windows, e.g.
+    `InferenceWorkerPool.run_batch` - executes batches, with up to
+    `max_inflight_batches` of them running concurrently. A new batch only starts
+    forming once a slot is free, so windows keep accumulating while all are busy.
+    `runner` may be replaced while the scheduler runs (e.g. to swap worker
+    pools); batches already started finish on the runner they started with.
+
+    `on_batch`, if given, is called on the event loop with every completed
+    batch's windows, results and device ids (e.g. to sample shadow traffic).
+
+    Admission control keeps one queue per device and builds batches
+    round-robin across devices, so a device flooding the service only delays
+    its own windows. With `coalesce` a new window replaces the device's
+    window still waiting in the queue (latest wins): the queued entry keeps
+    its place, runs on the newest samples, and every caller it absorbed gets
+    that result. Without it each device may have `max_device_queue_depth`
+    windows waiting (DeviceQueueFullError beyond). A window is also refused
+    (QueueFullError) once `max_queue_depth` windows are waiting in total, or
+    when the windows queued and running would take longer than
+    `max_queue_delay_ms` at the recent per-window cost, so queueing delay
+    stays bounded under overload instead of growing without limit.
+    `on_coalesce`, if given, is called with the device id of every replaced window.
+    """
+
+    def __init__(
+        self,
+        predict_batch_fn: Optional[Callable[[np.ndarray], List[Any]]] = None,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        max_queue_depth: int = BATCH_MAX_QUEUE_DEPTH,
+        runner: Optional[Callable[[Sequence[np.ndarray]], Awaitable[List[Any]]]] = None,
+        max_inflight_batches: int = 1,
+        on_batch: Optional[Callable[[Sequence[np.ndarray], List[Any], Sequence[str]], None]] = None,
+        max_device_queue_depth: int = ADMISSION_DEVICE_QUEUE_DEPTH,
+        coalesce: bool = ADMISSION_COALESCE,
+        max_queue_delay_ms: float = ADMISSION_MAX_QUEUE_DELAY_MS,
+        on_coalesce: Optional[Callable[[str], None]] = None,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if (predict_batch_fn is None) == (runner is None):
+            raise ValueError("Pass exactly one of predict_batch_fn or runner")
+        self.predict_batch_fn = predict_batch_fn
+        self.runner = runner or self._run_in_thread
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_depth = max_queue_depth
+        self.max_inflight_batches = max_inflight_batches
+        self.on_batch = on_batch
+        self.max_device_queue_depth = max_device_queue_depth
+        self.coalesce = coalesce
+        self.max_queue_delay = max_queue_delay_ms / 1000.0
+        self.on_coalesce = on_coalesce
+
+        # Per-device FIFOs, and the devices with waiting windows in round-robin order
+        self._device_queues: Dict[str, Deque[_PendingWindow]] = {}
+        self._ready: Deque[str] = deque()
+        self._queued = 0
+        self._available: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight = set()
+        self._inflight_windows = 0
+        self._window_seconds = 0.0  # EMA of forward time per window (0 until the first batch)
+        # A single inference thread: torch already parallelises inside one forward pass
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+
+        # Statistics
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = {"queue_full": 0, "overloaded": 0, "device_queue_full": 0}
+        self._coalesced = 0
+        self._failed = 0
+        self._batches = 0
+        self._batch_size_total = 0
+        self._largest_batch = 0
+        self._queue_wait_total = 0.0
+        self._forward_time_total = 0.0
+
+    # --- Lifecycle ---
+    async def start(self):
+        if self._task is not None:
+            return
+        self._available = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        for task in list(self._inflight):
+            task.cancel()
+        await asyncio.gather(self._task, *self._inflight, return_exceptions=True)
+        self._task = None
+
+        # Fail anything still waiting so no caller hangs forever
+        while self._queued:
+            self._pop_next().set_exception(RuntimeError("Batch scheduler stopped"))
+        self._executor.shutdown(wait=False)
+
+    # --- Public API ---
+    async def submit(self, samples: np.ndarray, device_id: str) -> Any:
+        """
+        Queue one window and wait for its result (whatever the batch function
+        returns per row). Raises QueueFullError (DeviceQueueFullError) if the
+        window is not admitted.
+        """
+        if self._available is None:
+            raise RuntimeError("Batch scheduler is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._device_queues.get(device_id)
+        if queue and self.coalesce:
+            # Latest wins: the waiting window is replaced, nothing new is queued
+            pending = queue[-1]
+            pending.samples = samples
+            pending.futures.append(future)
+            self._coalesced += 1
+            if self.on_coalesce is not None:
+                self.on_coalesce(device_id)
+        else:
+            self._admit(device_id, queue)
+            if queue is None:
+                queue = self._device_queues[device_id] = deque()
+                self._ready.append(device_id)
+            queue.append(_PendingWindow(samples, device_id, future))
+            self._queued += 1
+            self._available.set()
+
+        self._submitted += 1
+        return await future
+
+    def estimated_wait(self) -> float:
+        """Seconds until a window queued now would start: everything queued and running at the recent per-window cost."""
+        backlog = self._queued + self._inflight_windows
+        return backlog * self._window_seconds / self.max_inflight_batches
+
+    def _admit(self, device_id: str, queue: Optional[Deque[_PendingWindow]]):
+        if queue is not None and len(queue) >= self.max_device_queue_depth:
+            self._reject(DeviceQueueFullError, "device_queue_full",
+                         f"Device '{device_id}' already has {len(queue)} windows waiting")
+        if self._queued >= self.max_queue_depth:
+            self._reject(QueueFullError, "queue_full",
+                         f"Inference queue is full ({self.max_queue_depth} windows waiting)")
+        if self.max_queue_delay > 0:
+            wait = self.estimated_wait()
+            if wait > self.max_queue_delay:
+                self._reject(QueueFullError, "overloaded",
+                             f"Inference is overloaded (estimated wait {wait * 1000:.0f} ms, "
+                             f"limit {self.max_queue_delay * 1000:.0f} ms)")
+
+    def _reject(self, error_cls, reason: str, message: str):
+        self._rejected[reason] += 1
+        raise error_cls(message, reason=reason, retry_after=max(1, math.ceil(self.estimated_wait())))
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    @property
+    def devices_waiting(self) -> int:
+        return len(self._device_queues)
+
+    @property
+    def inflight_batches(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> dict:
+        batches = self._batches or 1
+        completed = self._completed or 1
+        return {
+            "config": {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_queue_depth": self.max_queue_depth,
+                "max_inflight_batches": self.max_inflight_batches,
+                "max_device_queue_depth": self.max_device_queue_depth,
+                "coalesce": self.coalesce,
+                "max_queue_delay_ms": self.max_queue_delay * 1000.0,
+            },
+            "queue_depth": self.queue_depth,
+            "devices_waiting": self.devices_waiting,
+            "inflight_batches": self.inflight_batches,
+            "estimated_wait_ms": self.estimated_wait() * 1000.0,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "coalesced": self._coalesced,
+            "rejected": sum(self._rejected.values()),
+            "rejected_by_reason": dict(self._rejected),
+            "failed": self._failed,
+            "batches": self._batches,
+            "avg_batch_size": self._batch_size_total / batches,
+            "largest_batch": self._largest_batch,
+            "avg_queue_wait_ms": self._queue_wait_total / completed * 1000.0,
+            "avg_forward_ms": self._forward_time_total / batches * 1000.0,
+        }
+
+    # --- Internals ---
+    def _pop_next(self) -> _PendingWindow:
+        """Oldest window of the next device in round-robin order."""
+        device_id = self._ready.popleft()
+        queue = self._device_queues[device_id]
+        pending = queue.popleft()
+        if queue:
+            self._ready.append(device_id)
+        else:
+            del self._device_queues[device_id]
+        self._queued -= 1
+        return pending
+
+    async def _collect_batch(self) -> List[_PendingWindow]:
+        loop = asyncio.get_running_loop()
+
+        # Block until at least one window is available
+        while not self._queued:
+            self._available.clear()
+            await self._available.wait()
+        batch = [self._pop_next()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take everything that is already queued without waiting
+            if self._queued:
+                batch.append(self._pop_next())
+                continue
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._available.clear()
+            try:
+                await asyncio.wait_for(self._available.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run_in_thread(self, windows: Sequence[np.ndarray]) -> List[Any]:
+        # Windows declared at different sample rates differ in length and are passed as a list
+        batch = np.stack(windows) if len({len(window) for window in windows}) == 1 else list(windows)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.predict_batch_fn, batch)
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.max_inflight_batches)
+        while True:
+            await slots.acquire()
+            batch = await self._collect_batch()
+
+            # Callers that already went away (e.g. client disconnected) are skipped
+            batch = [p for p in batch if p.active]
+            if not batch:
+                slots.release()
+                continue
+
+            self._inflight_windows += len(batch)
+            task = asyncio.create_task(self._execute(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _execute(self, batch: List[_PendingWindow]):
+        started = time.perf_counter()
+        windows = [p.samples for p in batch]
+        try:
+            results = await self.runner(windows)
+        except asyncio.CancelledError:
+            for p in batch:
+                p.set_exception(RuntimeError("Batch scheduler stopped"))
+            raise
+        except Exception as e:
+            self._failed += len(batch)
+            for p in batch:
+                p.set_exception(e)
+            return
+        finally:
+            self._inflight_windows -= len(batch)
+        finished = time.perf_counter()
+
+        self._batches += 1
+        self._batch_size_total += len(batch)
+        self._largest_batch = max(self._largest_batch, len(batch))
+        self._forward_time_total += finished - started
+        window_seconds = (finished - started) / len(batch)
+        self._window_seconds = window_seconds if not self._window_seconds else (
+            WINDOW_COST_SMOOTHING * window_seconds + (1 - WINDOW_COST_SMOOTHING) * self._window_seconds)
+
+        for p, result in zip(batch, results):
+            self._queue_wait_total += started - p.enqueued_at
+            self._completed += len(p.futures)
+            p.set_result(result)
+
+        if self.on_batch is not None:
+            self.on_batch(windows, results, [p.device_id for p in batch])
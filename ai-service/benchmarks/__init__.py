@@ -0,0 +1 @@
+"""Benchmarks for the AI service. Run from the ai-service directory, e.g. `python -m benchmarks.decode_bench`."""
@@ -0,0 +1,85 @@
+"""
+Window archive benchmark: records the same windows with every codec of
+window_archive.py through the background WindowRecorder and reports, per
+segment, write throughput and disk footprint, then read (decode) throughput
+and reconstruction error through ArchiveReader.
+
+Usage (from the ai-service directory):
+    python -m benchmarks.archive_bench --windows 512 --segment-mb 16 --output archive.json
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import DEFAULT_CHUNKS_DIR, load_windows, write_json
+from window_archive import CODECS, ArchiveReader, WindowRecorder
+
+
+def bench_codec(windows: np.ndarray, codec: str, directory: str, segment_mb: float, batch_size: int) -> dict:
+    recorder = WindowRecorder(directory, codec=codec, segment_mb=segment_mb, max_pending=len(windows))
+    results = [{"label": "healthy", "confidence": 1.0}] * batch_size
+    started = time.perf_counter()
+    for start in range(0, len(windows), batch_size):
+        batch = windows[start:start + batch_size]
+        recorder.record(batch, results, [f"bench-{i % 4}" for i in range(len(batch))])
+    queued = time.perf_counter()
+    recorder.stop(timeout=600)
+    written = time.perf_counter()
+    stats = recorder.stats()
+
+    reader = ArchiveReader(directory)
+    rows = reader.select()
+    read_started = time.perf_counter()
+    decoded = reader.read(rows)
+    read_seconds = time.perf_counter() - read_started
+
+    return {
+        "codec": codec,
+        "windows_recorded": stats["windows_recorded"],
+        "windows_dropped": stats["windows_dropped"],
+        "record_call_us_per_window": (queued - started) / len(windows) * 1e6,
+        "write_mb_s": windows.nbytes / (written - started) / 1e6,
+        "read_mb_s": decoded.nbytes / read_seconds / 1e6,
+        "disk_bytes": stats["disk_bytes"],
+        "compression_ratio": stats["compression_ratio"],
+        "max_abs_error": float(np.max(np.abs(decoded - windows))),
+        "segments": [{key: segment[key] for key in ("file", "windows", "raw_bytes", "stored_bytes",
+                                                    "compression_ratio", "write_mb_s")}
+                     for segment in stats["closed_segments"]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--windows", type=int, default=512)
+    parser.add_argument("--source", default=DEFAULT_CHUNKS_DIR, help="secdatachunks directory, or 'synthetic'")
+    parser.add_argument("--codecs", nargs="+", choices=CODECS, default=list(CODECS))
+    parser.add_argument("--segment-mb", type=float, default=16.0)
+    parser.add_argument("--batch-size", type=int, default=32, help="windows per record() call (one service batch)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    windows = load_windows(args.source, args.windows, seed=args.seed)
+    results = []
+    for codec in args.codecs:
+        with tempfile.TemporaryDirectory(prefix=f"archive-{codec}-") as directory:
+            result = bench_codec(windows, codec, directory, args.segment_mb, args.batch_size)
+        results.append(result)
+        print(f"\n{codec}: {result['windows_recorded']} windows ({result['windows_dropped']} dropped), "
+              f"{result['disk_bytes'] / 1e6:.1f} MB on disk ({result['compression_ratio']:.2f}x), "
+              f"write {result['write_mb_s']:.1f} MB/s, read {result['read_mb_s']:.1f} MB/s, "
+              f"record() {result['record_call_us_per_window']:.1f} us/window, "
+              f"max abs error {result['max_abs_error']:.2e}")
+        print(f"  {'segment':<20} {'windows':>8} {'raw MB':>8} {'disk MB':>8} {'ratio':>6} {'MB/s':>7}")
+        for segment in result["segments"]:
+            print(f"  {segment['file']:<20} {segment['windows']:>8} {segment['raw_bytes'] / 1e6:>8.1f} "
+                  f"{segment['stored_bytes'] / 1e6:>8.1f} {segment['compression_ratio']:>6.2f} "
+                  f"{segment['write_mb_s']:>7.1f}")
+    write_json(args.output, "archive_bench", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Inference backend parity check and CPU latency/throughput comparison.
+
+Loads every backend whose artifact is present (eager, torchscript, onnxruntime),
+checks that their logits match the eager model within a tolerance, then times
+each one across batch sizes.
+
+Usage (from the ai-service directory, with the exported models present):
+    python -m benchmarks.backend_bench --batch-sizes 1 2 4 8 16 32 64
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+
+import ai_inference
+
+WINDOW_SAMPLES = 38400
+
+
+def load_available_backends() -> dict:
+    backends = {}
+    for name, backend_cls in ai_inference.BACKENDS.items():
+        try:
+            backends[name] = backend_cls()
+        except Exception as e:
+            print(f"⚠️  Skipping '{name}' backend: {e}")
+    return backends
+
+
+def check_parity(backends: dict, batch: np.ndarray, atol: float, rtol: float) -> bool:
+    reference = backends["eager"](batch)
+    ok = True
+    for name, backend in backends.items():
+        logits = backend(batch)
+        max_diff = float(np.max(np.abs(logits - reference)))
+        matches = np.allclose(logits, reference, atol=atol, rtol=rtol)
+        same_labels = np.array_equal(np.argmax(logits, axis=1), np.argmax(reference, axis=1))
+        print(f"  {name:<12} max |logit diff| = {max_diff:.2e}  "
+              f"{'OK' if matches else 'MISMATCH'}  labels {'match' if same_labels else 'DIFFER'}")
+        # INT8 is approximate by design; it is reported but does not fail the check
+        ok = ok and (matches or name == "int8")
+    return ok
+
+
+def time_backend(backend, batch: np.ndarray, repeats: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        backend(batch)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        backend(batch)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000.0
+    p50 = float(np.percentile(timings, 50))
+    return {
+        "p50_ms": p50,
+        "p99_ms": float(np.percentile(timings, 99)),
+        "windows_per_s": batch.shape[0] / (p50 / 1000.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--atol", type=float, default=1e-4)
+    parser.add_argument("--rtol", type=float, default=1e-4)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    backends = load_available_backends()
+    if "eager" not in backends:
+        raise SystemExit("The eager backend is required as the parity reference")
+
+    rng = np.random.default_rng(0)
+    parity_batch = rng.uniform(-1.0, 1.0, (8, 1, WINDOW_SAMPLES)).astype(np.float32)
+    print(f"Parity check vs eager (atol={args.atol}, rtol={args.rtol}):")
+    if not check_parity(backends, parity_batch, args.atol, args.rtol):
+        raise SystemExit("❌ Backend logits do not match")
+
+    print(f"\nCPU latency ({torch.get_num_threads()} torch threads, p50 over {args.repeats} runs):")
+    print(f"{'batch':>6} " + " ".join(f"{name + ' ms':>16} {'win/s':>9}" for name in backends))
+    for batch_size in args.batch_sizes:
+        batch = rng.uniform(-1.0, 1.0, (batch_size, 1, WINDOW_SAMPLES)).astype(np.float32)
+        row = [f"{batch_size:>6}"]
+        for backend in backends.values():
+            t = time_backend(backend, batch, args.repeats, args.warmup)
+            row.append(f"{t['p50_ms']:>16.2f} {t['windows_per_s']:>9.1f}")
+        print(" ".join(row))
+
+
+if __name__ == "__main__":
+    main()
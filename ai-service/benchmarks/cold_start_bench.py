@@ -0,0 +1,161 @@
+"""
+Cold-start benchmark: starts the service as a subprocess and measures
+
+  - time until /health answers (process up) and until /ready answers (model loaded + warmed up)
+  - time to first prediction: a client retrying from process start until a prediction succeeds
+  - the first-request latency spike: the latency of that first successful
+    prediction and of the first burst of concurrent windows, versus the
+    steady-state median
+
+once per configuration, by default without warm-up (WARMUP_PASSES=0, how the
+service used to start) and with the default warm-up.
+
+Usage (from the ai-service directory; --model-dir holds fault_detector.pt and class_mapping.txt):
+    python -m benchmarks.cold_start_bench --model-dir . --output cold_start.json
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from benchmarks.common import latency_summary, synthetic_windows, write_json
+from benchmarks.load_generator import HTTPConnection
+
+AI_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIGS = {
+    "no_warmup": {"WARMUP_PASSES": "0"},
+    "warmup": {},
+}
+
+
+async def wait_for(host: str, port: int, path: str, started: float, timeout: float) -> Optional[float]:
+    """Seconds from `started` until GET `path` returns 200 (None on timeout)."""
+    while time.perf_counter() - started < timeout:
+        conn = HTTPConnection(host, port)
+        try:
+            status, _ = await conn.request("GET", path)
+            if status == 200:
+                return time.perf_counter() - started
+        except OSError:
+            pass
+        finally:
+            conn.close()
+        await asyncio.sleep(0.02)
+    return None
+
+
+async def first_prediction(host: str, port: int, body: bytes, started: float,
+                           timeout: float) -> Tuple[Optional[float], Optional[float]]:
+    """
+    A client that keeps sending one window (honouring 503s) from process start
+    until it gets a prediction. Returns the time from `started` and the latency
+    of that first successful request.
+    """
+    headers = {"Content-Type": "application/octet-stream", "X-Device-Id": "cold-start"}
+    while time.perf_counter() - started < timeout:
+        conn = HTTPConnection(host, port)
+        try:
+            sent = time.perf_counter()
+            status, _ = await conn.request("POST", "/predict-real-time/binary", body, headers)
+            if status == 200:
+                now = time.perf_counter()
+                return now - started, now - sent
+        except OSError:
+            pass
+        finally:
+            conn.close()
+        await asyncio.sleep(0.02)
+    return None, None
+
+
+async def timed_requests(host: str, port: int, bodies, concurrency: int) -> list:
+    """Sends `concurrency` windows at once (one connection each) and returns their latencies."""
+    async def one(i):
+        conn = HTTPConnection(host, port)
+        headers = {"Content-Type": "application/octet-stream", "X-Device-Id": f"cold-start-{i}"}
+        try:
+            start = time.perf_counter()
+            status, _ = await conn.request("POST", "/predict-real-time/binary", bodies[i % len(bodies)], headers)
+            if status != 200:
+                raise RuntimeError(f"prediction failed with HTTP {status}")
+            return time.perf_counter() - start
+        finally:
+            conn.close()
+    return list(await asyncio.gather(*(one(i) for i in range(concurrency))))
+
+
+async def measure(args, env_overrides: dict) -> dict:
+    env = dict(os.environ, **env_overrides)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [AI_SERVICE_DIR, env.get("PYTHONPATH")]))
+    command = [sys.executable, "-m", "uvicorn", "new-app:app", "--app-dir", AI_SERVICE_DIR,
+               "--host", args.host, "--port", str(args.port), "--log-level", "warning"]
+
+    bodies = [w.astype("<f4").tobytes() for w in synthetic_windows(max(args.burst, 1))]
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=args.model_dir, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        health, ready, (first, first_latency) = await asyncio.gather(
+            wait_for(args.host, args.port, "/health", started, args.timeout),
+            wait_for(args.host, args.port, "/ready", started, args.timeout),
+            first_prediction(args.host, args.port, bodies[0], started, args.timeout),
+        )
+        if ready is None:
+            raise SystemExit("Service did not become ready in time")
+
+        # First burst after the first prediction, then steady state
+        first_burst = await timed_requests(args.host, args.port, bodies, args.burst)
+        steady_single, steady_burst = [], []
+        for _ in range(args.repeats):
+            steady_single += await timed_requests(args.host, args.port, bodies, 1)
+            steady_burst.append(max(await timed_requests(args.host, args.port, bodies, args.burst)))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    steady_single_ms = float(np.median(steady_single) * 1000.0)
+    steady_burst_ms = float(np.median(steady_burst) * 1000.0)
+    return {
+        "time_to_health_s": health,
+        "time_to_ready_s": ready,
+        "time_to_first_prediction_s": first,
+        "first_single_ms": first_latency * 1000.0,
+        "steady_single": latency_summary(steady_single),
+        "single_spike_x": first_latency * 1000.0 / steady_single_ms,
+        "first_burst_max_ms": max(first_burst) * 1000.0,
+        "steady_burst_max_median_ms": steady_burst_ms,
+        "burst_spike_x": max(first_burst) * 1000.0 / steady_burst_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir", default=".", help="working directory of the service (model files)")
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8051)
+    parser.add_argument("--burst", type=int, default=8, help="concurrent windows in the burst measurement")
+    parser.add_argument("--repeats", type=int, default=5, help="steady-state rounds after the first requests")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", default=None, help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.configs:
+        print(f"Measuring '{name}' start-up...")
+        r = results[name] = asyncio.run(measure(args, CONFIGS[name]))
+        print(f"  /health {r['time_to_health_s']:.2f}s  /ready {r['time_to_ready_s']:.2f}s  "
+              f"first prediction {r['time_to_first_prediction_s']:.2f}s")
+        print(f"  first window {r['first_single_ms']:.1f} ms vs steady {r['steady_single']['p50_ms']:.1f} ms "
+              f"({r['single_spike_x']:.2f}x); first burst of {args.burst} {r['first_burst_max_ms']:.1f} ms "
+              f"vs steady {r['steady_burst_max_median_ms']:.1f} ms ({r['burst_spike_x']:.2f}x)")
+    write_json(args.output, "cold_start_bench", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Shared helpers for the benchmark scripts: window sources, latency summaries,
+RSS sampling and JSON result files that can be diffed between commits.
+"""
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+from window_archive import ARCHIVE_MANIFEST, ArchiveReader
+
+WINDOW_SAMPLES = 38400
+SAMPLE_RATE = 38400
+DEFAULT_CHUNKS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "trainingcode", "data", "secdatachunks")
+
+
+# --- Window sources ---
+def synthetic_windows(count: int, seed: int = 0) -> np.ndarray:
+    """Vibration-like windows: a few harmonics of a random shaft frequency plus noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(WINDOW_SAMPLES, dtype=np.float64) / SAMPLE_RATE
+    windows = np.empty((count, WINDOW_SAMPLES), dtype=np.float32)
+    for i in range(count):
+        f0 = rng.uniform(20.0, 60.0)
+        signal = sum(rng.uniform(0.1, 1.0) * np.sin(2 * np.pi * f0 * k * t + rng.uniform(0, 2 * np.pi))
+                     for k in (1, 2, 3))
+        windows[i] = signal + 0.2 * rng.standard_normal(WINDOW_SAMPLES)
+    return windows
+
+
+def load_windows(source: str, count: int, seed: int = 0) -> np.ndarray:
+    """
+    `count` windows from a secdatachunks-style directory (class subfolders of
+    .npy chunks, cycled if there are fewer files), a window archive recorded by
+    the service (RECORD_DIR) or, for "synthetic", generated.
+    """
+    if source == "synthetic":
+        return synthetic_windows(count, seed)
+    if os.path.exists(os.path.join(source, ARCHIVE_MANIFEST)):
+        reader = ArchiveReader(source)
+        rows = reader.select()
+        picks = np.random.default_rng(seed).permutation(len(rows))
+        return reader.read(rows[np.sort(picks[np.arange(count) % len(rows)])])
+    files = sorted(glob.glob(os.path.join(source, "*", "*.npy")))
+    if not files:
+        raise SystemExit(f"No .npy chunks found under {source}")
+    rng = np.random.default_rng(seed)
+    picks = rng.permutation(len(files))
+    return np.stack([
+        np.load(files[picks[i % len(files)]]).astype(np.float32) for i in range(count)
+    ])
+
+
+# --- Measurements ---
+def latency_summary(seconds: Iterable[float]) -> dict:
+    values = np.asarray(list(seconds), dtype=np.float64) * 1000.0
+    if values.size == 0:
+        return {"count": 0}
+    return {
+        "count": int(values.size),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+
+def rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Current resident set size of `pid` (default: this process) from /proc, in MB."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def time_call(fn, repeats: int, warmup: int = 2) -> list:
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+# --- Result files ---
+def environment_info() -> dict:
+    info = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    try:
+        info["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["git_commit"] = None
+    return info
+
+
+def write_json(path: Optional[str], benchmark: str, config: dict, results) -> dict:
+    report = {"benchmark": benchmark, "environment": environment_info(), "config": config, "results": results}
+    if path:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {path}")
+    return report
@@ -0,0 +1,85 @@
+"""
+Request-decode benchmark: JSON (`PredictionRequest.samples: List[float]`)
+versus the binary endpoint (raw float32 LE / .npy wrapped with np.frombuffer).
+
+Usage (from the ai-service directory):
+    python -m benchmarks.decode_bench --repeats 200
+"""
+import argparse
+import io
+import json
+import time
+from typing import List
+
+import numpy as np
+from pydantic import BaseModel
+
+from binary_codec import CONTENT_TYPE_NPY, CONTENT_TYPE_RAW, decode_window
+
+WINDOW_SAMPLES = 38400
+
+
+# Mirrors the request model in new-app.py
+class PredictionRequest(BaseModel):
+    samples: List[float]
+    deviceId: str
+
+
+def decode_json(body: bytes) -> np.ndarray:
+    request = PredictionRequest.model_validate_json(body)
+    return np.array(request.samples, dtype=np.float32)
+
+
+def time_decode(fn, repeats: int) -> dict:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000.0
+    return {
+        "mean_ms": float(timings.mean()),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=100)
+    parser.add_argument("--samples", type=int, default=WINDOW_SAMPLES)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    window = rng.uniform(-1.0, 1.0, args.samples).astype(np.float32)
+
+    # Same payload shape the Node side builds with Array.from(dataChunk)
+    json_body = json.dumps({"samples": window.tolist(), "deviceId": "bench"}).encode()
+    raw_body = window.astype("<f4").tobytes()
+    npy_buffer = io.BytesIO()
+    np.save(npy_buffer, window)
+    npy_body = npy_buffer.getvalue()
+
+    # Sanity check: every path must yield the same samples
+    assert np.array_equal(decode_json(json_body), window)
+    assert np.array_equal(decode_window(raw_body, CONTENT_TYPE_RAW), window)
+    assert np.array_equal(decode_window(npy_body, CONTENT_TYPE_NPY), window)
+
+    results = {
+        "json": (len(json_body), time_decode(lambda: decode_json(json_body), args.repeats)),
+        "raw float32": (len(raw_body), time_decode(lambda: decode_window(raw_body, CONTENT_TYPE_RAW), args.repeats)),
+        ".npy": (len(npy_body), time_decode(lambda: decode_window(npy_body, CONTENT_TYPE_NPY), args.repeats)),
+    }
+
+    print(f"Decode benchmark: {args.samples} samples, {args.repeats} repeats")
+    print(f"{'path':<12} {'body bytes':>12} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, (size, t) in results.items():
+        print(f"{name:<12} {size:>12,} {t['mean_ms']:>10.4f} {t['p50_ms']:>10.4f} {t['p99_ms']:>10.4f}")
+
+    json_mean = results["json"][1]["mean_ms"]
+    raw_mean = results["raw float32"][1]["mean_ms"]
+    print(f"\nBinary decode is {json_mean / raw_mean:,.0f}x faster than JSON")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Inference-path micro-benchmarks across batch sizes and torch thread counts:
+  - predict_fault on single windows
+  - classify_batch (normalize + forward) per batch size
+  - normalize_windows per batch size
+  - BatchScheduler end to end: many concurrent submits, per-window latency
+
+Usage (from the ai-service directory, with the model files present):
+    python -m benchmarks.inference_bench --threads 1 2 4 --batch-sizes 1 8 32 --output inference.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+import numpy as np
+import torch
+
+import ai_inference
+from batching import BatchScheduler
+from normalization import normalize_windows
+
+from benchmarks.common import latency_summary, load_windows, peak_rss_mb, time_call, write_json
+
+
+def bench_predict_fault(windows: np.ndarray, repeats: int, warmup: int) -> dict:
+    window = windows[0]
+    # predict_fault prints every prediction; keep the output out of the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        timings = time_call(lambda: ai_inference.predict_fault(window), repeats, warmup)
+    return latency_summary(timings)
+
+
+def bench_classify_batch(windows: np.ndarray, batch_size: int, repeats: int, warmup: int) -> dict:
+    batch = windows[:batch_size]
+    summary = latency_summary(time_call(lambda: ai_inference.classify_batch(batch), repeats, warmup))
+    summary["windows_per_s"] = batch_size / (summary["p50_ms"] / 1000.0)
+    return summary
+
+
+def bench_normalization(windows: np.ndarray, batch_size: int, repeats: int) -> dict:
+    batch = windows[:batch_size]
+    out = np.empty_like(batch)
+    summary = latency_summary(time_call(lambda: normalize_windows(batch, out=out), repeats))
+    summary["us_per_window"] = summary["p50_ms"] * 1000.0 / batch_size
+    return summary
+
+
+async def bench_scheduler(windows: np.ndarray, max_batch_size: int, total: int) -> dict:
+    """Submits `total` windows at once and measures each window's submit-to-result latency."""
+    scheduler = BatchScheduler(ai_inference.classify_batch, max_batch_size=max_batch_size,
+                               max_queue_depth=max(total, 1))
+    await scheduler.start()
+
+    async def one(i):
+        start = time.perf_counter()
+        await scheduler.submit(windows[i % len(windows)], f"bench-{i}")
+        return time.perf_counter() - start
+
+    try:
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+    finally:
+        stats = scheduler.stats()
+        await scheduler.stop()
+
+    summary = latency_summary(latencies)
+    summary["windows_per_s"] = total / elapsed
+    summary["avg_batch_size"] = stats["avg_batch_size"]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--threads", type=int, nargs="+", default=[torch.get_num_threads()],
+                        help="torch intra-op thread counts to sweep")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--scheduler-windows", type=int, default=128,
+                        help="windows submitted concurrently in the BatchScheduler benchmark")
+    parser.add_argument("--source", default="synthetic",
+                        help="'synthetic' or a secdatachunks directory (class subfolders of .npy chunks)")
+    parser.add_argument("--output", default=None, help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    windows = load_windows(args.source, max(args.batch_sizes))
+    results = {"normalization": {}, "threads": {}}
+
+    print(f"{'batch':>6} {'normalize p50 ms':>17} {'us/window':>10}")
+    for batch_size in args.batch_sizes:
+        r = bench_normalization(windows, batch_size, args.repeats)
+        results["normalization"][str(batch_size)] = r
+        print(f"{batch_size:>6} {r['p50_ms']:>17.3f} {r['us_per_window']:>10.1f}")
+
+    for threads in args.threads:
+        torch.set_num_threads(threads)
+        per_thread = results["threads"][str(threads)] = {"classify_batch": {}, "scheduler": {}}
+
+        single = per_thread["predict_fault"] = bench_predict_fault(windows, args.repeats, args.warmup)
+        print(f"\n{threads} torch thread(s): predict_fault p50 {single['p50_ms']:.2f} ms, "
+              f"p99 {single['p99_ms']:.2f} ms")
+        print(f"{'batch':>6} {'classify p50 ms':>16} {'p99 ms':>9} {'win/s':>9} "
+              f"{'sched p50 ms':>13} {'sched p99 ms':>13} {'sched win/s':>12}")
+        for batch_size in args.batch_sizes:
+            c = bench_classify_batch(windows, batch_size, args.repeats, args.warmup)
+            s = asyncio.run(bench_scheduler(windows, batch_size, args.scheduler_windows))
+            per_thread["classify_batch"][str(batch_size)] = c
+            per_thread["scheduler"][str(batch_size)] = s
+            print(f"{batch_size:>6} {c['p50_ms']:>16.2f} {c['p99_ms']:>9.2f} {c['windows_per_s']:>9.1f} "
+                  f"{s['p50_ms']:>13.1f} {s['p99_ms']:>13.1f} {s['windows_per_s']:>12.1f}")
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    print(f"\nPeak RSS: {results['peak_rss_mb']:.1f} MB")
+    write_json(args.output, "inference_bench", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Synthetic load generator: N simulated devices each producing one 38,400-sample
+window per second against a running AI service.
+
+Transports:
+  http-json    POST /predict-real-time with the JSON body the Node service sends
+  http-binary  POST /predict-real-time/binary with raw float32 LE samples
+  udp          the Raspberry Pi packet format (120 packets/s per device) to the
+               native UDP ingest port (service started with UDP_INGEST_PORT)
+
+HTTP sends are open-loop: every device has a fixed schedule and latency is
+measured from the scheduled send time, so a slow server shows up as latency
+instead of a silently lower request rate. Each device uses one keep-alive
+connection. With --sample-rate, HTTP devices resample their windows before
+sending (as a device decimating on board would, see resampling.py) and
+declare the rate, so the service's cost at smaller payloads can be measured. UDP has no response, so its latency percentiles are estimated from
+the service's `ai_stage_duration_seconds{stage="scheduler"}` histogram on /metrics
+(delta over the run) and throughput from /udp/stats. UDP ingest identifies
+devices by source IP, so against a loopback target each device sends from its
+own 127.0.1.x address.
+
+Usage (from the ai-service directory, service running on :8001):
+    python -m benchmarks.load_generator --devices 16 --duration 30 --transport http-binary --output load.json
+    python -m benchmarks.load_generator --devices 8 --transport udp --udp-port 9001 --server-pid $(pgrep -f new-app)
+"""
+import argparse
+import asyncio
+import ipaddress
+import json
+import socket
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.common import DEFAULT_CHUNKS_DIR, latency_summary, load_windows, rss_mb, write_json
+from resampling import SOURCE_SAMPLE_RATE, resample_windows
+from udp_ingest import HEADER, PACKETS_PER_WINDOW, SAMPLES_PER_PACKET
+
+WINDOW_PERIOD_S = 1.0  # one window per device per second
+
+
+# --- Minimal keep-alive HTTP/1.1 client (stdlib only) ---
+class HTTPConnection:
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: bytes = b"", headers: Dict[str, str] = None) -> Tuple[int, bytes]:
+        for attempt in range(2):
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                return await self._roundtrip(method, path, body, headers or {})
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if attempt:
+                    raise
+        raise ConnectionError("unreachable")
+
+    async def _roundtrip(self, method, path, body, headers) -> Tuple[int, bytes]:
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        head.extend(f"{k}: {v}" for k, v in headers.items())
+        self._writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await self._writer.drain()
+
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed by server")
+        status = int(status_line.split()[1])
+        length = 0
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        return status, await self._reader.readexactly(length)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+# --- HTTP devices ---
+def http_requests(transport: str, device_id: str, windows: np.ndarray,
+                  sample_rate: int = SOURCE_SAMPLE_RATE) -> Tuple[str, Dict[str, str], List[bytes]]:
+    """Path, headers and pre-encoded bodies for one device (encoding is kept out of the timed loop)."""
+    if transport == "http-json":
+        bodies = [json.dumps({"samples": w.tolist(), "deviceId": device_id, "sampleRate": sample_rate}).encode()
+                  for w in windows]
+        return "/predict-real-time", {"Content-Type": "application/json"}, bodies
+    headers = {"Content-Type": "application/octet-stream", "X-Device-Id": device_id,
+               "X-Sample-Rate": str(sample_rate)}
+    return "/predict-real-time/binary", headers, [w.astype("<f4").tobytes() for w in windows]
+
+
+async def http_device(path: str, headers: Dict[str, str], bodies: List[bytes], host: str, port: int,
+                      start_at: float, end_at: float, latencies: List[float], errors: Dict[str, int]):
+    conn = HTTPConnection(host, port)
+    loop = asyncio.get_running_loop()
+    scheduled = start_at
+    i = 0
+    try:
+        while scheduled < end_at:
+            await asyncio.sleep(max(0.0, scheduled - loop.time()))
+            try:
+                status, _ = await conn.request("POST", path, bodies[i % len(bodies)], headers)
+                if status == 200:
+                    latencies.append(loop.time() - scheduled)
+                else:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+            except (OSError, asyncio.IncompleteReadError) as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            i += 1
+            scheduled += WINDOW_PERIOD_S
+    finally:
+        conn.close()
+
+
+# --- UDP devices ---
+def packet_payloads(window: np.ndarray) -> List[bytes]:
+    """The 120 float32 LE sample payloads of one window, without headers."""
+    samples = window.astype("<f4")
+    return [
+        samples[seq * SAMPLES_PER_PACKET:(seq + 1) * SAMPLES_PER_PACKET].tobytes()
+        for seq in range(PACKETS_PER_WINDOW)
+    ]
+
+
+def udp_sockets(devices: int, source_base: Optional[str]) -> List[socket.socket]:
+    sockets = []
+    for d in range(devices):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if source_base:
+            sock.bind((str(ipaddress.IPv4Address(source_base) + d), 0))
+        sock.setblocking(False)
+        sockets.append(sock)
+    return sockets
+
+
+async def udp_devices(windows: np.ndarray, sockets: List[socket.socket], host: str, port: int,
+                      start_at: float, end_at: float) -> dict:
+    """
+    One ticker sends the next packet of every device each 1/120 s, so N devices
+    cost one timer instead of N. Window ids are unique across devices, so
+    windows do not collide even if the service sees one source address.
+    """
+    loop = asyncio.get_running_loop()
+    interval = WINDOW_PERIOD_S / PACKETS_PER_WINDOW
+    payloads = [packet_payloads(w) for w in windows]
+    sent = errors = 0
+    lag = []
+    tick = 0
+    while True:
+        scheduled = start_at + tick * interval
+        if scheduled >= end_at:
+            break
+        await asyncio.sleep(max(0.0, scheduled - loop.time()))
+        lag.append(loop.time() - scheduled)
+        window_number, seq = divmod(tick, PACKETS_PER_WINDOW)
+        for d, sock in enumerate(sockets):
+            window_id = window_number * len(sockets) + d
+            packet = HEADER.pack(window_id, seq, seq * SAMPLES_PER_PACKET, SAMPLES_PER_PACKET) \
+                + payloads[(window_number + d) % len(payloads)][seq]
+            try:
+                sock.sendto(packet, (host, port))
+                sent += 1
+            except OSError:
+                errors += 1
+        tick += 1
+    return {
+        "packets_sent": sent,
+        "send_errors": errors,
+        "ticker_lag": latency_summary(lag),
+    }
+
+
+# --- Service-side measurements ---
+async def fetch_json(host: str, port: int, path: str) -> Optional[dict]:
+    conn = HTTPConnection(host, port)
+    try:
+        status, body = await conn.request("GET", path)
+        return json.loads(body) if status == 200 else None
+    except OSError:
+        return None
+    finally:
+        conn.close()
+
+
+async def fetch_histogram(host: str, port: int, stage: str) -> Dict[float, float]:
+    """Cumulative bucket counts of ai_stage_duration_seconds for one stage, from /metrics."""
+    conn = HTTPConnection(host, port)
+    buckets = {}
+    try:
+        status, body = await conn.request("GET", "/metrics")
+    except OSError:
+        return buckets
+    finally:
+        conn.close()
+    prefix = 'ai_stage_duration_seconds_bucket{stage="' + stage + '",le="'
+    for line in body.decode().splitlines():
+        if line.startswith(prefix):
+            bound, value = line[len(prefix):].split('"} ')
+            buckets[float("inf") if bound == "+Inf" else float(bound)] = float(value)
+    return buckets
+
+
+def histogram_quantiles(before: Dict[float, float], after: Dict[float, float], quantiles=(0.5, 0.95, 0.99)) -> dict:
+    """Quantile upper bounds (bucket boundaries, in ms) of the observations made between two scrapes."""
+    bounds = sorted(after)
+    counts = [after[b] - before.get(b, 0.0) for b in bounds]
+    total = counts[-1] if counts else 0.0
+    result = {"count": int(total)}
+    for q in quantiles:
+        if total <= 0:
+            break
+        bound = next(b for b, c in zip(bounds, counts) if c >= q * total)
+        result[f"p{int(q * 100)}_ms_upper_bound"] = bound * 1000.0 if bound != float("inf") else None
+    return result
+
+
+async def sample_rss(pid: Optional[int], stop: asyncio.Event, samples: List[float]):
+    while not stop.is_set():
+        value = rss_mb(pid)
+        if value is not None:
+            samples.append(value)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+# --- Driver ---
+async def run(args) -> dict:
+    windows = load_windows(args.source, args.windows, seed=args.seed)
+    loop = asyncio.get_running_loop()
+    if args.transport.startswith("http"):
+        if args.sample_rate != SOURCE_SAMPLE_RATE:
+            windows = resample_windows(windows, SOURCE_SAMPLE_RATE, args.sample_rate)
+        requests = [http_requests(args.transport, f"loadgen-{d}", np.roll(windows, -d, axis=0), args.sample_rate)
+                    for d in range(args.devices)]
+    start_at = loop.time() + 0.5
+    end_at = start_at + args.duration
+
+    rss_stop = asyncio.Event()
+    server_rss: List[float] = []
+    rss_task = asyncio.create_task(sample_rss(args.server_pid, rss_stop, server_rss)) if args.server_pid else None
+
+    results = {}
+    if args.transport.startswith("http"):
+        latencies: List[float] = []
+        errors: Dict[str, int] = {}
+        rng = np.random.default_rng(args.seed)
+        # Devices are spread over the first second so they do not all fire at once
+        offsets = rng.uniform(0, WINDOW_PERIOD_S, args.devices)
+        await asyncio.gather(*(
+            http_device(path, headers, bodies, args.host, args.port,
+                        start_at + offsets[d], end_at, latencies, errors)
+            for d, (path, headers, bodies) in enumerate(requests)
+        ))
+        elapsed = loop.time() - start_at
+        results["latency"] = latency_summary(latencies)
+        results["windows_ok"] = len(latencies)
+        results["errors"] = errors
+        results["windows_per_s"] = len(latencies) / elapsed
+        results["request_bytes"] = len(requests[0][2][0]) if requests else 0
+    else:
+        source_base = args.udp_source_base
+        if source_base is None and ipaddress.ip_address(socket.gethostbyname(args.host)).is_loopback:
+            source_base = "127.0.1.1"
+        sockets = udp_sockets(args.devices, source_base)
+        udp_before = await fetch_json(args.host, args.port, "/udp/stats")
+        hist_before = await fetch_histogram(args.host, args.port, "scheduler")
+        try:
+            results["sender"] = await udp_devices(windows, sockets, args.host, args.udp_port, start_at, end_at)
+        finally:
+            for sock in sockets:
+                sock.close()
+        await asyncio.sleep(args.drain)  # let the last windows finish inference
+        elapsed = loop.time() - start_at
+        udp_after = await fetch_json(args.host, args.port, "/udp/stats")
+        hist_after = await fetch_histogram(args.host, args.port, "scheduler")
+        if udp_before and udp_after:
+            delta = {k: udp_after[k] - udp_before[k] for k in udp_after
+                     if k.startswith(("packets_", "windows_")) and k in udp_before}
+            results["server_udp"] = delta
+            results["windows_per_s"] = delta.get("windows_completed", 0) / args.duration
+        results["server_latency"] = histogram_quantiles(hist_before, hist_after)
+        results["elapsed_s"] = elapsed
+
+    if rss_task is not None:
+        rss_stop.set()
+        await rss_task
+        if server_rss:
+            results["server_rss_mb"] = {"mean": float(np.mean(server_rss)), "max": float(np.max(server_rss))}
+    results["generator_rss_mb"] = rss_mb()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--transport", choices=["http-json", "http-binary", "udp"], default="http-binary")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001, help="HTTP port of the service")
+    parser.add_argument("--udp-port", type=int, default=9001, help="UDP_INGEST_PORT of the service")
+    parser.add_argument("--udp-source-base", default=None,
+                        help="first source IP for UDP devices (default 127.0.1.1 for loopback targets)")
+    parser.add_argument("--source", default=DEFAULT_CHUNKS_DIR,
+                        help="secdatachunks directory or recorded window archive to replay, or 'synthetic'")
+    parser.add_argument("--windows", type=int, default=32, help="distinct windows to cycle through")
+    parser.add_argument("--sample-rate", type=int, default=SOURCE_SAMPLE_RATE,
+                        help="HTTP: resample windows to this rate (Hz) and declare it")
+    parser.add_argument("--server-pid", type=int, default=None, help="sample this process's RSS during the run")
+    parser.add_argument("--drain", type=float, default=2.0, help="UDP: seconds to wait for in-flight windows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    print(f"Load: {args.devices} device(s) x 1 window/s over {args.transport} for {args.duration:.0f} s")
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    write_json(args.output, "load_generator", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Normalization micro-benchmark: time and allocations per window for the old
+per-chunk recipe versus the shared vectorized `normalization.normalize_windows`
+(allocating, and writing into a preallocated buffer).
+
+Usage (from the ai-service directory):
+    python -m benchmarks.normalization_bench --batch-sizes 1 8 32 128
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from normalization import normalize_windows
+
+WINDOW_SAMPLES = 38400
+
+
+def per_chunk_reference(windows: np.ndarray) -> np.ndarray:
+    """The pre-existing recipe: one chunk at a time, z-score then divide by max |z|."""
+    out = np.empty(windows.shape, dtype=np.float32)
+    for i, chunk in enumerate(windows):
+        chunk_mean = np.mean(chunk)
+        chunk_std = np.std(chunk)
+        if chunk_std > 0:
+            chunk_normalized = (chunk - chunk_mean) / chunk_std
+            chunk_max = np.max(np.abs(chunk_normalized))
+            out[i] = chunk_normalized / chunk_max if chunk_max > 0 else chunk_normalized
+        else:
+            out[i] = 0.0
+    return out
+
+
+def measure(fn, windows: np.ndarray, repeats: int) -> dict:
+    fn(windows)  # warm-up
+
+    tracemalloc.start()
+    fn(windows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(windows)
+    elapsed = time.perf_counter() - start
+
+    n = windows.shape[0]
+    return {
+        "us_per_window": elapsed / repeats / n * 1e6,
+        "peak_alloc_kb_per_window": peak / n / 1024.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'batch':>6} {'method':<26} {'us/window':>10} {'peak alloc KB/window':>21}")
+    for batch_size in args.batch_sizes:
+        windows = (1.75 + 0.1 * rng.standard_normal((batch_size, WINDOW_SAMPLES))).astype(np.float32)
+        out = np.empty_like(windows)
+
+        # Results must agree to float32 rounding with the old recipe
+        assert np.allclose(normalize_windows(windows), per_chunk_reference(windows), atol=1e-6)
+
+        methods = {
+            "per-chunk (old)": per_chunk_reference,
+            "normalize_windows": normalize_windows,
+            "normalize_windows(out=)": lambda w: normalize_windows(w, out=out),
+        }
+        for name, fn in methods.items():
+            r = measure(fn, windows, args.repeats)
+            print(f"{batch_size:>6} {name:<26} {r['us_per_window']:>10.1f} {r['peak_alloc_kb_per_window']:>21.1f}")
+
+
+if __name__ == "__main__":
+    main()
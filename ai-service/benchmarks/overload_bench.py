@@ -0,0 +1,162 @@
+"""
+Overload test of the admission layer in batching.BatchScheduler.
+
+Devices each submit one window per second (open loop, latency measured from
+the scheduled send time) to an in-process scheduler whose batch cost is
+simulated as `--batch-overhead-ms + --window-ms x batch size`, so capacity is
+known and the run is repeatable on any machine; `--backend model` runs
+ai_inference.classify_batch instead and measures its capacity first. The
+number of devices is `load x capacity`, plus one device flooding at
+`--flood-rate` windows/s (the Node fake-data generator's 100 ms interval).
+
+Each load runs twice:
+  fifo       admission off - one unbounded queue, every window is scored
+             (how the service behaved before admission control)
+  admission  the service defaults: round-robin over per-device queues,
+             latest window per device wins, shedding beyond ADMISSION_MAX_QUEUE_DELAY_MS
+
+and reports p50/p99 latency of answered windows for regular devices and for
+the flooding one, plus shed (429/503) and coalesced windows.
+
+Usage (from the ai-service directory):
+    python -m benchmarks.overload_bench --loads 1 2 --duration 20 --output overload.json
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from batching import ADMISSION_MAX_QUEUE_DELAY_MS, BATCH_MAX_SIZE, BatchScheduler, QueueFullError
+from benchmarks.common import WINDOW_SAMPLES, latency_summary, synthetic_windows, write_json
+
+WINDOW_PERIOD_S = 1.0
+FLOOD_DEVICE = "flood"
+MODES = {
+    "fifo": {"coalesce": False, "max_queue_delay_ms": 0, "max_queue_depth": 1 << 30,
+             "max_device_queue_depth": 1 << 30},
+    "admission": {},
+}
+
+
+def simulated_model(batch_overhead_ms: float, window_ms: float):
+    def predict(batch: np.ndarray):
+        time.sleep((batch_overhead_ms + window_ms * len(batch)) / 1000.0)
+        return [{"label": "healthy"}] * len(batch)
+    return predict
+
+
+def measure_capacity(predict, max_batch_size: int, repeats: int = 3) -> float:
+    """Windows/s with full batches."""
+    batch = synthetic_windows(max_batch_size)
+    predict(batch)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predict(batch)
+    return max_batch_size * repeats / (time.perf_counter() - start)
+
+
+async def device(scheduler: BatchScheduler, device_id: str, window: np.ndarray, period: float,
+                 start_at: float, end_at: float, latencies: List[float], outcomes: Dict[str, int]):
+    loop = asyncio.get_running_loop()
+
+    async def send(scheduled: float):
+        try:
+            await scheduler.submit(window, device_id)
+            latencies.append(loop.time() - scheduled)
+            outcomes["ok"] += 1
+        except QueueFullError as e:
+            outcomes[str(e.status_code)] += 1
+
+    # Every window is sent on schedule, whether or not earlier ones were answered
+    sends = []
+    scheduled = start_at
+    while scheduled < end_at:
+        await asyncio.sleep(max(0.0, scheduled - loop.time()))
+        sends.append(asyncio.create_task(send(scheduled)))
+        scheduled += period
+    await asyncio.gather(*sends)
+
+
+async def run_scenario(predict, mode: str, devices: int, flood_rate: float, duration: float,
+                       max_batch_size: int, seed: int) -> dict:
+    scheduler = BatchScheduler(predict, max_batch_size=max_batch_size, **MODES[mode])
+    await scheduler.start()
+    window = np.zeros(WINDOW_SAMPLES, dtype=np.float32)
+    loop = asyncio.get_running_loop()
+    start_at = loop.time() + 0.2
+    end_at = start_at + duration
+    offsets = np.random.default_rng(seed).uniform(0, WINDOW_PERIOD_S, devices)
+
+    regular: List[float] = []
+    flood: List[float] = []
+    outcomes = {"ok": 0, "429": 0, "503": 0}
+    flood_outcomes = {"ok": 0, "429": 0, "503": 0}
+    tasks = [device(scheduler, f"device-{d}", window, WINDOW_PERIOD_S, start_at + offsets[d], end_at,
+                    regular, outcomes) for d in range(devices)]
+    if flood_rate > 0:
+        tasks.append(device(scheduler, FLOOD_DEVICE, window, 1.0 / flood_rate, start_at, end_at,
+                            flood, flood_outcomes))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        stats = scheduler.stats()
+        await scheduler.stop()
+
+    return {
+        "regular": {**latency_summary(regular), **outcomes},
+        "flood": {**latency_summary(flood), **flood_outcomes},
+        "coalesced": stats["coalesced"],
+        "rejected_by_reason": stats["rejected_by_reason"],
+        "avg_batch_size": stats["avg_batch_size"],
+        "windows_scored_per_s": stats["avg_batch_size"] * stats["batches"] / duration,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loads", type=float, nargs="+", default=[1.0, 2.0],
+                        help="offered load as a multiple of the measured capacity")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per scenario")
+    parser.add_argument("--backend", choices=["simulated", "model"], default="simulated")
+    parser.add_argument("--batch-overhead-ms", type=float, default=20.0, help="simulated: fixed cost per batch")
+    parser.add_argument("--window-ms", type=float, default=5.0, help="simulated: cost per window")
+    parser.add_argument("--max-batch-size", type=int, default=BATCH_MAX_SIZE)
+    parser.add_argument("--flood-rate", type=float, default=10.0, help="windows/s of the flooding device (0 = none)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.backend == "model":
+        import ai_inference
+
+        ai_inference.load_model()
+        predict = ai_inference.classify_batch
+    else:
+        predict = simulated_model(args.batch_overhead_ms, args.window_ms)
+    capacity = measure_capacity(predict, args.max_batch_size)
+    print(f"Capacity: {capacity:.1f} windows/s at batch size {args.max_batch_size}; "
+          f"queue delay limit {ADMISSION_MAX_QUEUE_DELAY_MS:.0f} ms")
+
+    results = {"capacity_windows_per_s": capacity, "scenarios": []}
+    print(f"\n{'load':>5} {'mode':<10} {'devices':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'flood p99':>9} {'answered':>8} {'coalesced':>9} {'429':>6} {'503':>6}")
+    for load in args.loads:
+        devices = max(1, int(round(load * capacity - args.flood_rate)))
+        for mode in MODES:
+            scenario = asyncio.run(run_scenario(predict, mode, devices, args.flood_rate, args.duration,
+                                                args.max_batch_size, args.seed))
+            scenario.update(load=load, mode=mode, devices=devices)
+            results["scenarios"].append(scenario)
+            regular, flood = scenario["regular"], scenario["flood"]
+            answered = regular["ok"] + flood["ok"]
+            print(f"{load:>4.1f}x {mode:<10} {devices:>7} {regular.get('p50_ms', float('nan')):>8.0f} "
+                  f"{regular.get('p99_ms', float('nan')):>8.0f} {regular.get('max_ms', float('nan')):>8.0f} "
+                  f"{flood.get('p99_ms', float('nan')):>9.0f} {answered:>8} {scenario['coalesced']:>9} "
+                  f"{regular['429'] + flood['429']:>6} {regular['503'] + flood['503']:>6}")
+    write_json(args.output, "overload_bench", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
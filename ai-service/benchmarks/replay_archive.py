@@ -0,0 +1,117 @@
+"""
+Replays windows recorded by the AI service (RECORD_DIR, see window_archive.py)
+against a running service: each window is POSTed to /predict-real-time/binary
+under its recorded device id, at the recorded pace scaled by --speed
+(1 = real time, 10 = ten times faster, 0 = as fast as --concurrency allows).
+
+Latency is measured from each window's scheduled send time (open loop, as in
+load_generator.py). Reports latency, windows/s, response codes (429/503 from
+admission control) and how often the service's answer matches the recorded
+prediction, e.g. to check a new model version against recorded traffic.
+
+Usage (from the ai-service directory, service running on :8001):
+    python -m benchmarks.replay_archive recordings --speed 10 --devices pi-1 pi-2 --output replay.json
+"""
+import argparse
+import asyncio
+import json
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.common import latency_summary, write_json
+from benchmarks.load_generator import HTTPConnection
+from window_archive import ArchiveReader
+
+
+async def replay(args) -> dict:
+    reader = ArchiveReader(args.archive)
+    rows = reader.select(devices=args.devices, labels=args.labels, start=args.start, end=args.end)
+    if args.limit:
+        rows = rows[:args.limit]
+    if not len(rows):
+        raise SystemExit("No recorded windows match the selection")
+    print(f"Replaying {len(rows)} of {len(reader)} recorded windows "
+          f"({len(np.unique(rows['device']))} device(s)) at "
+          + (f"{args.speed:g}x real time" if args.speed > 0 else f"full speed, {args.concurrency} in flight"))
+
+    loop = asyncio.get_running_loop()
+    start_at = loop.time() + 0.5
+    first = float(rows["timestamp"][0])
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    agreement = {"agree": 0, "disagree": 0}
+    pool: asyncio.Queue = asyncio.Queue()
+    for _ in range(args.concurrency):
+        pool.put_nowait(HTTPConnection(args.host, args.port))
+
+    async def send(row, scheduled: float):
+        # Decoding happens before the scheduled time, so it is not part of the latency
+        body = reader.read_window(row).astype("<f4").tobytes()
+        headers = {"Content-Type": "application/octet-stream", "X-Device-Id": reader.device_of(row)}
+        await asyncio.sleep(max(0.0, scheduled - loop.time()))
+        conn = await pool.get()
+        try:
+            status, response = await conn.request("POST", "/predict-real-time/binary", body, headers)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            statuses[type(e).__name__] = statuses.get(type(e).__name__, 0) + 1
+            return
+        finally:
+            pool.put_nowait(conn)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if status == 200:
+            latencies.append(loop.time() - scheduled)
+            same = json.loads(response)["label"] == reader.label_of(row)
+            agreement["agree" if same else "disagree"] += 1
+
+    tasks = set()
+    for row in rows:
+        scheduled = start_at + (float(row["timestamp"]) - first) / args.speed if args.speed > 0 else start_at
+        if args.speed > 0:
+            # Only windows due within the next second are decoded ahead of time
+            await asyncio.sleep(max(0.0, scheduled - 1.0 - loop.time()))
+        else:
+            # Full speed: never more windows decoded and waiting than connections
+            while len(tasks) >= args.concurrency:
+                _, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        tasks.add(asyncio.create_task(send(row, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start_at
+
+    while not pool.empty():
+        pool.get_nowait().close()
+    answered = agreement["agree"] + agreement["disagree"]
+    return {
+        "windows": int(len(rows)),
+        "recorded_span_s": float(rows["timestamp"][-1] - first),
+        "elapsed_s": elapsed,
+        "windows_per_s": answered / elapsed if elapsed > 0 else None,
+        "latency": latency_summary(latencies),
+        "statuses": statuses,
+        "agreement_rate": agreement["agree"] / answered if answered else None,
+        "archive": {key: value for key, value in reader.describe().items() if key != "segments"},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("archive", help="RECORD_DIR of the recording service")
+    parser.add_argument("--speed", type=float, default=1.0, help="multiple of real time (0 = as fast as possible)")
+    parser.add_argument("--concurrency", type=int, default=8, help="connections (requests in flight)")
+    parser.add_argument("--devices", nargs="+", default=None)
+    parser.add_argument("--labels", nargs="+", default=None, help="only windows recorded with these predictions")
+    parser.add_argument("--start", type=float, default=None, help="Unix time")
+    parser.add_argument("--end", type=float, default=None, help="Unix time")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--output", default=None, help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = asyncio.run(replay(args))
+    print(json.dumps(results, indent=2))
+    write_json(args.output, "replay_archive", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Device state event benchmark (in process, no server needed): feeds noisy
+per-window predictions for --devices devices through DeviceStateTracker and
+fans the resulting events out to --subscribers EventBroadcaster subscribers.
+
+Each device's true class changes every --segment windows, and a --noise
+fraction of windows is labelled with a random class instead. Reports messages
+per window compared with re-broadcasting every prediction, state changes
+beyond the true ones (flips caused by noise), the mean lag (in windows) of the
+reported state behind a true change, and the tracking and fan-out cost.
+
+Usage (from the ai-service directory):
+    python -m benchmarks.state_events_bench --devices 64 --subscribers 100 --noise 0.2 --output state.json
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from benchmarks.common import write_json
+from device_state import (STATE_CONFIRM_WINDOWS, STATE_HYSTERESIS, STATE_SMOOTHING, DeviceStateTracker,
+                          EventBroadcaster)
+
+LABELS = ["bearing", "belt", "flywheel", "healthy"]
+
+
+def noisy_results(rng: np.random.Generator, truth: np.ndarray, noise: float, confidence: float) -> list:
+    """One prediction per true class; a `noise` fraction of them names a random class."""
+    predicted = np.where(rng.random(len(truth)) < noise, rng.integers(len(LABELS), size=len(truth)), truth)
+    rest = (1.0 - confidence) / (len(LABELS) - 1)
+    results = []
+    for cls in predicted:
+        probabilities = {label: (confidence if i == cls else rest) for i, label in enumerate(LABELS)}
+        results.append({"label": LABELS[cls], "confidence": confidence, "probabilities": probabilities})
+    return results
+
+
+async def run(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    tracker = DeviceStateTracker(args.smoothing, args.hysteresis, args.confirm_windows)
+    broadcaster = EventBroadcaster(max_queue=args.windows)
+    subscriptions = [broadcaster.subscribe() for _ in range(args.subscribers)]
+    device_ids = [f"device-{d}" for d in range(args.devices)]
+
+    # True class per device and window, changing every --segment windows
+    segments = -(-args.windows // args.segment)
+    truth = np.repeat(rng.integers(len(LABELS), size=(args.devices, segments)), args.segment, axis=1)
+    truth = truth[:, :args.windows]
+    true_changes = int(np.sum(truth[:, 1:] != truth[:, :-1])) + args.devices  # + each device's first state
+
+    track_seconds = publish_seconds = 0.0
+    change_windows = {device_id: [] for device_id in device_ids}
+    for w in range(args.windows):
+        # One "batch" per window period: every device's window
+        results = noisy_results(rng, truth[:, w], args.noise, args.confidence)
+        started = time.perf_counter()
+        events = tracker.update_batch(results, device_ids)
+        tracked = time.perf_counter()
+        broadcaster.publish(events)
+        publish_seconds += time.perf_counter() - tracked
+        track_seconds += tracked - started
+        for event in events:
+            change_windows[event["deviceId"]].append(w)
+
+    lags = []
+    for d, device_id in enumerate(device_ids):
+        for start in np.flatnonzero(truth[d, 1:] != truth[d, :-1]) + 1:
+            later = [w for w in change_windows[device_id] if w >= start]
+            if later:
+                lags.append(later[0] - start)
+
+    windows = args.devices * args.windows
+    events = tracker.stats()["events"]
+    delivered = broadcaster.stats()["events_delivered"]
+    return {
+        "windows": windows,
+        "events": events,
+        "true_changes": true_changes,
+        "spurious_changes": max(0, events - true_changes),
+        "mean_lag_windows": float(np.mean(lags)) if lags else None,
+        "messages_per_window": events / windows,
+        "messages_saved": 1.0 - events / windows,
+        "track_us_per_window": track_seconds / windows * 1e6,
+        "publish_us_per_delivery": publish_seconds / delivered * 1e6 if delivered else None,
+        "subscriber_backlog": subscriptions[0].queue.qsize() if subscriptions else 0,
+        "broadcaster": broadcaster.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=64)
+    parser.add_argument("--windows", type=int, default=600, help="windows per device")
+    parser.add_argument("--segment", type=int, default=120, help="windows between true state changes")
+    parser.add_argument("--noise", type=float, default=0.2, help="fraction of windows with a random label")
+    parser.add_argument("--confidence", type=float, default=0.7, help="probability of each window's label")
+    parser.add_argument("--subscribers", type=int, default=100)
+    parser.add_argument("--smoothing", type=float, default=STATE_SMOOTHING)
+    parser.add_argument("--hysteresis", type=float, default=STATE_HYSTERESIS)
+    parser.add_argument("--confirm-windows", type=int, default=STATE_CONFIRM_WINDOWS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{results['windows']} windows -> {results['events']} state events "
+          f"({results['messages_per_window']:.4f} per window, {results['true_changes']} true changes, "
+          f"{results['spurious_changes']} spurious), mean lag {results['mean_lag_windows']:.1f} windows")
+    print(f"tracking {results['track_us_per_window']:.1f} us/window, fan-out to {args.subscribers} subscribers "
+          f"{results['publish_us_per_delivery']:.2f} us/delivery")
+    write_json(args.output, "state_events_bench", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
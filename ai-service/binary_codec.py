@@ -0,0 +1,74 @@
+import io
+
+import numpy as np
+from numpy.lib import format as npy_format
+
+# Content types accepted by the binary prediction endpoint
+CONTENT_TYPE_RAW = "application/octet-stream"  # raw little-endian float32 samples
+CONTENT_TYPE_NPY = "application/x-npy"         # .npy file, same as the training chunks
+
+FLOAT32_LE = np.dtype("<f4")
+
+
+class BinaryDecodeError(ValueError):
+    """Raised when a binary request body cannot be decoded into a float32 window."""
+
+
+def decode_raw_float32(body: bytes) -> np.ndarray:
+    """
+    Wraps a raw little-endian float32 body as a 1D array without copying.
+    The returned array is read-only and shares memory with `body`.
+    """
+    if len(body) % FLOAT32_LE.itemsize != 0:
+        raise BinaryDecodeError(
+            f"Body length {len(body)} is not a multiple of {FLOAT32_LE.itemsize} bytes (float32)"
+        )
+    return np.frombuffer(body, dtype=FLOAT32_LE)
+
+
+def decode_npy(body: bytes) -> np.ndarray:
+    """
+    Parses the .npy header and wraps the array data without copying.
+    Only non-float32 or big-endian payloads are converted (and therefore copied).
+    """
+    fp = io.BytesIO(body)
+    try:
+        version = npy_format.read_magic(fp)
+        if version == (1, 0):
+            shape, fortran_order, dtype = npy_format.read_array_header_1_0(fp)
+        else:
+            shape, fortran_order, dtype = npy_format.read_array_header_2_0(fp)
+    except ValueError as e:
+        raise BinaryDecodeError(f"Invalid .npy payload: {e}")
+
+    if len(shape) != 1:
+        raise BinaryDecodeError(f"Expected a 1D .npy array, got shape {shape}")
+    if dtype.kind not in "fiu":
+        # Strings, bools, complex, structured and object arrays are not samples
+        raise BinaryDecodeError(f"Expected a float or integer .npy array, got dtype {dtype}")
+
+    count = shape[0]
+    offset = fp.tell()
+    if len(body) - offset < count * dtype.itemsize:
+        raise BinaryDecodeError(
+            f".npy payload truncated: header declares {count} x {dtype} "
+            f"but only {len(body) - offset} data bytes were sent"
+        )
+
+    samples = np.frombuffer(body, dtype=dtype, count=count, offset=offset)
+    if dtype != FLOAT32_LE:
+        samples = samples.astype(FLOAT32_LE)
+    return samples
+
+
+def decode_window(body: bytes, content_type: str) -> np.ndarray:
+    """Decodes a binary request body according to its Content-Type."""
+    media_type = (content_type or CONTENT_TYPE_RAW).split(";")[0].strip().lower()
+    if media_type == CONTENT_TYPE_NPY:
+        return decode_npy(body)
+    if media_type == CONTENT_TYPE_RAW:
+        return decode_raw_float32(body)
+    raise BinaryDecodeError(
+        f"Unsupported Content-Type '{content_type}'. "
+        f"Use '{CONTENT_TYPE_RAW}' or '{CONTENT_TYPE_NPY}'"
+    )
@@ -0,0 +1,260 @@
+"""
+Per-device health state, pushed to subscribers only when it changes.
+
+Every window the micro-batcher classifies (HTTP and UDP, through its
+`on_batch` hook) updates its device's state incrementally: an exponential
+moving average of the class probabilities (STATE_SMOOTHING = weight of the
+newest window) with hysteresis on the reported label. Another class takes over
+only once its smoothed probability leads the current label's by at least
+STATE_HYSTERESIS for STATE_CONFIRM_WINDOWS consecutive windows, so one noisy
+window never flips a device's state. A device's state is one small float32
+vector plus a few counters (`_DeviceState`).
+
+State changes (and a device's first window) become events. Each event is
+serialized once, and the same str/bytes objects go to every subscriber of GET
+/predictions/events (Server-Sent Events) and /predictions/ws (WebSocket).
+Downstream consumers therefore get one message per state change instead of
+one per window. Every subscriber has a bounded queue (STATE_SUBSCRIBER_QUEUE).
+A subscriber that falls that far behind is disconnected instead of being
+buffered without limit, and gets a fresh snapshot when it reconnects.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+STATE_SMOOTHING = float(os.environ.get("STATE_SMOOTHING", "0.3"))       # EMA weight of the newest window
+STATE_HYSTERESIS = float(os.environ.get("STATE_HYSTERESIS", "0.15"))    # lead a new label needs over the current one
+STATE_CONFIRM_WINDOWS = int(os.environ.get("STATE_CONFIRM_WINDOWS", "3"))  # consecutive windows it must lead for
+STATE_SUBSCRIBER_QUEUE = int(os.environ.get("STATE_SUBSCRIBER_QUEUE", "256"))  # events a subscriber may lag behind
+STATE_HEARTBEAT_SECONDS = float(os.environ.get("STATE_HEARTBEAT_SECONDS", "15"))
+
+
+class _DeviceState:
+    __slots__ = ("probs", "label", "challenger", "streak", "windows", "changes", "changed_at", "updated_at")
+
+    def __init__(self, probs: np.ndarray, now: float):
+        self.probs = probs          # EMA of class probabilities (float32, indexed like tracker.labels)
+        self.label = int(np.argmax(probs))
+        self.challenger = -1        # class currently leading the label by the hysteresis margin
+        self.streak = 0             # consecutive windows the challenger has led
+        self.windows = 1            # windows since the last change
+        self.changes = 0
+        self.changed_at = now
+        self.updated_at = now
+
+
+class DeviceStateTracker:
+    """
+    Smoothed label per device (see the module docstring). Not thread-safe: the
+    service updates and reads it on the event loop only.
+    """
+
+    def __init__(
+        self,
+        smoothing: float = STATE_SMOOTHING,
+        hysteresis: float = STATE_HYSTERESIS,
+        confirm_windows: int = STATE_CONFIRM_WINDOWS,
+    ):
+        if not 0 < smoothing <= 1:
+            raise ValueError("smoothing must be in (0, 1]")
+        if hysteresis < 0 or confirm_windows < 1:
+            raise ValueError("hysteresis must be >= 0 and confirm_windows >= 1")
+        self.smoothing = smoothing
+        self.hysteresis = hysteresis
+        self.confirm_windows = confirm_windows
+        self.labels: List[str] = []       # class labels in vector order, extended as new ones appear
+        self._label_index: Dict[str, int] = {}
+        self._states: Dict[str, _DeviceState] = {}
+        self._windows = 0
+        self._events = 0
+
+    def _index(self, label: str) -> int:
+        index = self._label_index.get(label)
+        if index is None:
+            index = self._label_index[label] = len(self.labels)
+            self.labels.append(label)
+        return index
+
+    def _vector(self, result: dict) -> np.ndarray:
+        """Class probabilities of one prediction as a vector over `labels`."""
+        probabilities = result.get("probabilities")
+        # The cascade gate only reports P(label): the rest is spread over the other classes
+        known = probabilities or {result["label"]: result["confidence"]}
+        indices = [self._index(label) for label in known]
+        vector = np.zeros(len(self.labels), dtype=np.float32)
+        vector[indices] = list(known.values())
+        if probabilities is None and len(self.labels) > 1:
+            others = np.ones(len(self.labels), dtype=bool)
+            others[indices] = False
+            vector[others] = max(0.0, 1.0 - float(vector.sum())) / others.sum()
+        return vector
+
+    def update(self, device_id: str, result: dict, now: Optional[float] = None) -> Optional[dict]:
+        """Folds one prediction into the device's state; returns a "change" event if its label changed."""
+        now = time.time() if now is None else now
+        probs = self._vector(result)
+        self._windows += 1
+        state = self._states.get(device_id)
+        if state is None:
+            state = self._states[device_id] = _DeviceState(probs, now)
+            self._events += 1
+            return self._event(device_id, state, "change", previous=None)
+
+        if len(state.probs) < len(probs):  # a class the device has not seen yet
+            state.probs = np.pad(state.probs, (0, len(probs) - len(state.probs)))
+        state.probs += self.smoothing * (probs - state.probs)
+        state.windows += 1
+        state.updated_at = now
+
+        leader = int(np.argmax(state.probs))
+        if leader == state.label or state.probs[leader] - state.probs[state.label] < self.hysteresis:
+            state.challenger, state.streak = -1, 0
+            return None
+        state.streak = state.streak + 1 if leader == state.challenger else 1
+        state.challenger = leader
+        if state.streak < self.confirm_windows:
+            return None
+
+        previous = self.labels[state.label]
+        state.label, state.challenger, state.streak = leader, -1, 0
+        state.changes += 1
+        state.changed_at = now
+        event = self._event(device_id, state, "change", previous=previous)
+        state.windows = 0
+        self._events += 1
+        return event
+
+    def update_batch(self, results: Sequence[dict], device_ids: Sequence[str]) -> List[dict]:
+        """update() for every window of a batch; returns the events (usually none)."""
+        now = time.time()
+        events = [self.update(device_id, result, now) for device_id, result in zip(device_ids, results)]
+        return [event for event in events if event is not None]
+
+    def _event(self, device_id: str, state: _DeviceState, kind: str, previous: Optional[str] = None) -> dict:
+        event = {
+            "type": kind,
+            "deviceId": device_id,
+            "label": self.labels[state.label],
+            "confidence": float(state.probs[state.label]),
+            "probabilities": {label: float(p) for label, p in zip(self.labels, state.probs)},
+            "windows": state.windows,   # windows the previous state lasted (change) or the current one has (snapshot)
+            "changes": state.changes,
+            "timestamp": state.updated_at,
+        }
+        if kind == "change":
+            event["previous"] = previous
+        return event
+
+    def snapshot(self, device_ids: Optional[Iterable[str]] = None) -> List[dict]:
+        """Current state of every device (or of `device_ids`), as "snapshot" events."""
+        ids = self._states if device_ids is None else [d for d in device_ids if d in self._states]
+        return [self._event(device_id, self._states[device_id], "snapshot") for device_id in ids]
+
+    def forget(self, device_id: str):
+        self._states.pop(device_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "devices": len(self._states),
+            "windows": self._windows,
+            "events": self._events,
+            "events_per_window": self._events / self._windows if self._windows else None,
+            "smoothing": self.smoothing,
+            "hysteresis": self.hysteresis,
+            "confirm_windows": self.confirm_windows,
+        }
+
+
+class EncodedEvent:
+    """One event serialized once: `text` (JSON, for WebSocket) and `sse` (a complete SSE frame)."""
+    __slots__ = ("device_id", "text", "sse")
+
+    def __init__(self, event_id: int, event: dict):
+        self.device_id = event["deviceId"]
+        self.text = json.dumps(event, separators=(",", ":"))
+        self.sse = f"id: {event_id}\nevent: {event['type']}\ndata: {self.text}\n\n".encode()
+
+
+class Subscription:
+    """A subscriber's bounded queue; `None` in it means "disconnected for falling behind"."""
+    __slots__ = ("queue", "devices", "dropped")
+
+    def __init__(self, max_queue: int, devices: Optional[Set[str]]):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue + 1)  # + 1 for the sentinel
+        self.devices = devices
+        self.dropped = False
+
+    def wants(self, device_id: str) -> bool:
+        return self.devices is None or device_id in self.devices
+
+
+class EventBroadcaster:
+    """Fans encoded events out to every subscriber (on the event loop) without copying or re-serializing."""
+
+    def __init__(self, max_queue: int = STATE_SUBSCRIBER_QUEUE):
+        self.max_queue = max_queue
+        self._subscribers: Set[Subscription] = set()
+        self._next_id = 0
+        self._published = 0
+        self._delivered = 0
+        self._dropped_subscribers = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def encode(self, event: dict) -> EncodedEvent:
+        self._next_id += 1
+        return EncodedEvent(self._next_id, event)
+
+    def subscribe(self, devices: Optional[Set[str]] = None, initial: Sequence[dict] = ()) -> Subscription:
+        """New subscriber, optionally limited to `devices`, with `initial` events (a snapshot) already queued."""
+        subscription = Subscription(max(self.max_queue, len(initial)), devices)
+        for event in initial:
+            subscription.queue.put_nowait(self.encode(event))
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, events: Iterable[dict]):
+        for event in events:
+            encoded = self.encode(event)
+            self._published += 1
+            for subscription in list(self._subscribers):
+                if not subscription.wants(encoded.device_id):
+                    continue
+                if subscription.queue.qsize() >= subscription.queue.maxsize - 1:  # room is kept for the sentinel
+                    self._drop(subscription)
+                    continue
+                subscription.queue.put_nowait(encoded)
+                self._delivered += 1
+
+    def _drop(self, subscription: Subscription):
+        # Clear its backlog and leave only the sentinel, so the consumer ends promptly
+        self._subscribers.discard(subscription)
+        self._dropped_subscribers += 1
+        subscription.dropped = True
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    def close(self):
+        """Ends every subscription (service shutdown)."""
+        for subscription in list(self._subscribers):
+            self._subscribers.discard(subscription)
+            subscription.queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "events_published": self._published,
+            "events_delivered": self._delivered,
+            "subscribers_dropped": self._dropped_subscribers,
+            "subscriber_queue": self.max_queue,
+        }
@@ -0,0 +1,78 @@
+"""
+Cheap first stage of the inference cascade: a logistic "clearly healthy" gate
+on spectral band energies.
+
+A window's power spectrum is summed into `num_bands` equal-width bands; the
+features are the log of each band's share of the total energy plus the log
+total energy. One rFFT and a dot product cost well under a millisecond per
+window, versus tens of milliseconds for the full CNN, so windows the gate is
+confident about skip the CNN entirely. The gate is trained by
+trainingcode/data/train.py (`train_healthy_gate`) and stored as a small .npz.
+"""
+import numpy as np
+
+HEALTHY_GATE_PATH = "healthy_gate.npz"
+GATE_NUM_BANDS = 32
+
+
+def band_energy_features(windows: np.ndarray, num_bands: int = GATE_NUM_BANDS) -> np.ndarray:
+    """[B, num_samples] normalized windows -> [B, num_bands + 1] log band-energy features."""
+    windows = np.asarray(windows, dtype=np.float32)
+    if windows.ndim != 2:
+        raise ValueError(f"Expected 2D array [windows, samples], but got shape {windows.shape}")
+
+    spectrum = np.fft.rfft(windows, axis=1)
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+
+    # Equal-width bands over the non-DC bins (the DC bin is ~0 after centring)
+    edges = np.linspace(1, power.shape[1], num_bands + 1).astype(np.int64)
+    bands = np.add.reduceat(power, edges[:-1], axis=1).astype(np.float64)
+    total = bands.sum(axis=1, keepdims=True) + 1e-12
+
+    features = np.empty((len(windows), num_bands + 1), dtype=np.float64)
+    features[:, :num_bands] = np.log(bands / total + 1e-12)
+    features[:, num_bands] = np.log(total[:, 0])
+    return features
+
+
+class HealthyGate:
+    """
+    Logistic regression on standardized band-energy features giving P(healthy).
+    Windows with P(healthy) >= `threshold` are classified "healthy" without
+    running the full model.
+    """
+
+    def __init__(self, weights, bias, feature_mean, feature_std, threshold,
+                 num_bands=GATE_NUM_BANDS, healthy_label="healthy"):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.feature_mean = np.asarray(feature_mean, dtype=np.float64)
+        self.feature_std = np.asarray(feature_std, dtype=np.float64)
+        self.threshold = float(threshold)
+        self.num_bands = int(num_bands)
+        self.healthy_label = str(healthy_label)
+
+    @classmethod
+    def load(cls, path: str = HEALTHY_GATE_PATH) -> "HealthyGate":
+        with np.load(path) as data:
+            return cls(
+                data["weights"], data["bias"], data["feature_mean"], data["feature_std"],
+                data["threshold"], data["num_bands"], data["healthy_label"],
+            )
+
+    def save(self, path: str = HEALTHY_GATE_PATH):
+        np.savez(
+            path,
+            weights=self.weights, bias=self.bias,
+            feature_mean=self.feature_mean, feature_std=self.feature_std,
+            threshold=self.threshold, num_bands=self.num_bands,
+            healthy_label=self.healthy_label,
+        )
+
+    def probability_from_features(self, features: np.ndarray) -> np.ndarray:
+        z = (features - self.feature_mean) / self.feature_std
+        return 1.0 / (1.0 + np.exp(-(z @ self.weights + self.bias)))
+
+    def probability(self, windows: np.ndarray) -> np.ndarray:
+        """P(healthy) for each row of a normalized [B, num_samples] batch."""
+        return self.probability_from_features(band_energy_features(windows, self.num_bands))
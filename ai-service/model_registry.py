@@ -0,0 +1,272 @@
+"""
+Versioned model artifacts for the AI service.
+
+Every version is a directory under the registry root holding everything needed
+to serve it:
+
+    model_registry/
+        state.json                    active version + activation history
+        20261016-142501/
+            fault_detector.pt         eager weights (required)
+            class_mapping.txt         index:class_name lines (required)
+            fault_detector.torchscript.pt, fault_detector.onnx,
+            fault_detector_int8.torchscript.pt, healthy_gate.npz,
+            model_config.json                                     (optional)
+            normalization.json        input normalization the model was trained with
+            metadata.json             training metadata, file checksums, creation time
+
+Versions are immutable once published: `publish` assembles the directory under a
+temporary name and renames it into place, and `state.json` is replaced
+atomically, so a reader never sees a half-written version or state. Only the
+standard library is used, so train.py can publish without the service's
+dependencies.
+
+Command line (from the ai-service directory):
+    python model_registry.py publish ../trainingcode/data     # copy artifacts into a new version
+    python model_registry.py list
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence
+
+from normalization import NORMALIZATION_CONFIG, RATE_KEYS, normalization_config
+
+MODEL_REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", "model_registry")
+
+REQUIRED_FILES = ("fault_detector.pt", "class_mapping.txt")
+OPTIONAL_FILES = (
+    "fault_detector.torchscript.pt",
+    "fault_detector.onnx",
+    "fault_detector_int8.torchscript.pt",
+    "healthy_gate.npz",
+    "model_config.json",
+)
+NORMALIZATION_FILE = "normalization.json"
+METADATA_FILE = "metadata.json"
+STATE_FILE = "state.json"
+
+
+class ModelRegistryError(Exception):
+    """Raised for unknown versions, missing artifacts or incompatible normalization."""
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path: str, data):
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def check_normalization(model_dir: str):
+    """
+    Raises ModelRegistryError if the version was trained with a different input
+    normalization than the one this code implements (normalization.py); its
+    sample rate may differ (requests are resampled to it, see resampling.py).
+    Directories without normalization.json (pre-registry models) are accepted.
+    """
+    path = os.path.join(model_dir, NORMALIZATION_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        config = json.load(f)
+    if any(config.get(key) != value for key, value in NORMALIZATION_CONFIG.items() if key not in RATE_KEYS):
+        raise ModelRegistryError(
+            f"{model_dir} was trained with normalization {config}, "
+            f"but this service implements {NORMALIZATION_CONFIG}"
+        )
+
+
+def _model_normalization(model_dir: str) -> dict:
+    """Normalization of a model directory at the input rate its model_config.json records (if any)."""
+    path = os.path.join(model_dir, "model_config.json")
+    config = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            config = json.load(f)
+    return normalization_config(config.get("sample_rate", NORMALIZATION_CONFIG["sample_rate"]),
+                                config.get("window_samples", NORMALIZATION_CONFIG["window_samples"]))
+
+
+class ModelRegistry:
+    """Publishes, lists and activates model versions stored under `root`."""
+
+    def __init__(self, root: str = MODEL_REGISTRY_DIR):
+        self.root = root
+
+    # --- Versions ---
+    def path(self, version: str) -> str:
+        if not version or os.sep in version or version.startswith("."):
+            raise ModelRegistryError(f"Invalid model version '{version}'")
+        path = os.path.join(self.root, version)
+        if not os.path.isdir(path):
+            raise ModelRegistryError(f"Unknown model version '{version}'")
+        return path
+
+    def versions(self) -> List[str]:
+        """Published versions, oldest first (version names sort by creation time)."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith(".") and os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def metadata(self, version: str) -> dict:
+        with open(os.path.join(self.path(version), METADATA_FILE)) as f:
+            return json.load(f)
+
+    def publish(self, source_dir: str = ".", metadata: Optional[dict] = None,
+                version: Optional[str] = None, files: Optional[Sequence[str]] = None) -> str:
+        """
+        Copies the model artifacts found in `source_dir` into a new version and
+        returns its name (a creation timestamp unless `version` is given). The
+        new version is not activated.
+
+        `files`, if given, names the optional artifacts (and normalization.json)
+        to take; anything else in `source_dir`, e.g. left there by an earlier
+        training or quantize.py run, is ignored.
+        """
+        if files is not None:
+            unknown = set(files) - set(REQUIRED_FILES + OPTIONAL_FILES + (NORMALIZATION_FILE,))
+            if unknown:
+                raise ModelRegistryError(f"Unknown model artifacts: {', '.join(sorted(unknown))}")
+        optional = OPTIONAL_FILES if files is None else tuple(name for name in OPTIONAL_FILES if name in files)
+
+        missing = [name for name in REQUIRED_FILES if not os.path.exists(os.path.join(source_dir, name))]
+        if missing:
+            raise ModelRegistryError(f"{source_dir} is missing required artifacts: {', '.join(missing)}")
+
+        os.makedirs(self.root, exist_ok=True)
+        if version is None:
+            version = time.strftime("%Y%m%d-%H%M%S")
+            suffix = 1
+            while os.path.exists(os.path.join(self.root, version)):
+                suffix += 1
+                version = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+        final_path = os.path.join(self.root, version)
+        if os.path.exists(final_path):
+            raise ModelRegistryError(f"Model version '{version}' already exists")
+
+        staging = tempfile.mkdtemp(dir=self.root, prefix=f".{version}-")
+        try:
+            files = {}
+            for name in REQUIRED_FILES + optional:
+                source = os.path.join(source_dir, name)
+                if os.path.exists(source):
+                    shutil.copy2(source, os.path.join(staging, name))
+                    files[name] = {"bytes": os.path.getsize(source), "sha256": _sha256(source)}
+
+            normalization_source = os.path.join(source_dir, NORMALIZATION_FILE)
+            if os.path.exists(normalization_source) and (files is None or NORMALIZATION_FILE in files):
+                shutil.copy2(normalization_source, os.path.join(staging, NORMALIZATION_FILE))
+            else:
+                _write_json_atomic(os.path.join(staging, NORMALIZATION_FILE), _model_normalization(source_dir))
+
+            _write_json_atomic(os.path.join(staging, METADATA_FILE), {
+                "version": version,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "files": files,
+                "training": metadata or {},
+            })
+            os.rename(staging, final_path)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return version
+
+    # --- Activation state ---
+    def _state(self) -> dict:
+        try:
+            with open(os.path.join(self.root, STATE_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"active": None, "history": []}
+
+    def active_version(self) -> Optional[str]:
+        return self._state()["active"]
+
+    def history(self) -> List[Dict[str, str]]:
+        """Activations, oldest first: [{"version", "activated_at"}]."""
+        return self._state()["history"]
+
+    def previous_version(self) -> Optional[str]:
+        """The version that was active before the current one (the rollback target)."""
+        state = self._state()
+        for entry in reversed(state["history"]):
+            if entry["version"] != state["active"]:
+                return entry["version"]
+        return None
+
+    def set_active(self, version: str):
+        """Records `version` as active, so a restarted service comes back on it."""
+        self.path(version)  # must exist
+        os.makedirs(self.root, exist_ok=True)
+        state = self._state()
+        state["active"] = version
+        state["history"].append({"version": version, "activated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")})
+        _write_json_atomic(os.path.join(self.root, STATE_FILE), state)
+
+    def describe(self) -> dict:
+        state = self._state()
+        versions = []
+        for version in self.versions():
+            try:
+                meta = self.metadata(version)
+            except (OSError, ValueError):
+                meta = {}
+            versions.append({"version": version, "created_at": meta.get("created_at"),
+                             "training": meta.get("training", {})})
+        return {"root": self.root, "active": state["active"], "previous": self.previous_version(),
+                "versions": versions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish and list model versions")
+    parser.add_argument("--root", default=MODEL_REGISTRY_DIR, help="registry directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish = commands.add_parser("publish", help="copy the model artifacts in a directory into a new version")
+    publish.add_argument("source_dir", nargs="?", default=".")
+    publish.add_argument("--version", default=None, help="version name (default: creation timestamp)")
+    publish.add_argument("--activate", action="store_true",
+                         help="mark it active for the next service start (a running service: POST /models/{version}/activate)")
+    commands.add_parser("list", help="list versions")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "publish":
+        version = registry.publish(args.source_dir, version=args.version)
+        if args.activate:
+            registry.set_active(version)
+        print(f"Published '{version}' to {registry.root}" + (" (active)" if args.activate else ""))
+    else:
+        info = registry.describe()
+        for entry in info["versions"]:
+            marker = "*" if entry["version"] == info["active"] else " "
+            val_acc = entry["training"].get("final_val_acc")
+            print(f"{marker} {entry['version']}  created {entry['created_at']}"
+                  + (f"  val_acc {val_acc:.4f}" if val_acc is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
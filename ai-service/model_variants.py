@@ -0,0 +1,194 @@
+"""
+Compact fault detector architectures, shared by train.py (training and
+distillation) and ai_inference.py (eager backend).
+
+The baseline (SimpleCNN / train.py's ImprovedCNN) flattens
+AdaptiveAvgPool1d(64) x 256 channels into a 16,384-wide fc1: ~9M parameters,
+most of them in that one layer, and ~1.9 GMACs per window, most of them in
+conv2..conv4. CompactCNN removes both costs:
+
+  - a global average pooling head (AdaptiveAvgPool1d(1) -> one Linear)
+    instead of the 16,384-wide fully connected stack
+  - depthwise-separable Conv1d blocks (per-channel conv + 1x1 conv) instead
+    of full convolutions after the stem
+  - optionally fewer channels
+
+Same input ([B, 1, window_samples] normalized windows, 38,400 at the
+source rate) and output (logits) as the baseline. SpectralCNN instead takes the [B, num_bands, num_frames] log
+band-energy features of spectral.py, which ai_inference computes before the
+forward pass for models whose config says so.
+
+train.py writes the architecture, the input sample rate (see resampling.py)
+and the spectral front-end settings to model_config.json next to fault_detector.pt, and the eager backend rebuilds the
+model from it (the TorchScript/ONNX exports do not need it).
+"""
+import json
+import os
+from typing import Dict, Optional, Sequence
+
+import torch
+import torch.nn as nn
+
+from resampling import SOURCE_SAMPLE_RATE, window_samples
+from spectral import SPECTRAL_CONFIG, SpectralFrontEnd
+
+MODEL_CONFIG_FILE = "model_config.json"
+BASELINE_ARCHITECTURE = "baseline"
+SPECTRAL_ARCHITECTURE = "spectral"
+
+# name -> CompactCNN arguments. Kernel sizes and strides follow the baseline.
+MODEL_VARIANTS = {
+    "gap": {"channels": (32, 64, 128, 256), "separable": False},
+    "separable": {"channels": (32, 64, 128, 256), "separable": True},
+    "separable-small": {"channels": (16, 32, 64, 128), "separable": True},
+    "separable-tiny": {"channels": (8, 16, 32, 64), "separable": True},
+}
+ARCHITECTURES = (BASELINE_ARCHITECTURE,) + tuple(MODEL_VARIANTS) + (SPECTRAL_ARCHITECTURE,)
+
+
+def conv_block(in_channels: int, out_channels: int, kernel_size: int, stride: int, separable: bool) -> nn.Sequential:
+    """Conv1d -> BatchNorm1d -> ReLU, or depthwise + pointwise pairs of them when `separable`."""
+    padding = kernel_size // 2
+    if not separable:
+        return nn.Sequential(
+            nn.Conv1d(in_channels, out_channels, kernel_size, stride=stride, padding=padding),
+            nn.BatchNorm1d(out_channels),
+            nn.ReLU(),
+        )
+    return nn.Sequential(
+        nn.Conv1d(in_channels, in_channels, kernel_size, stride=stride, padding=padding, groups=in_channels),
+        nn.BatchNorm1d(in_channels),
+        nn.ReLU(),
+        nn.Conv1d(in_channels, out_channels, 1),
+        nn.BatchNorm1d(out_channels),
+        nn.ReLU(),
+    )
+
+
+class CompactCNN(nn.Module):
+    """
+    Baseline-shaped conv stack (kernels 64/32/16/8, stride 2) with a global
+    average pooling head. The first block is always a full convolution (one
+    input channel leaves nothing to separate).
+    """
+
+    def __init__(self, num_classes: int = 4, channels: Sequence[int] = (32, 64, 128, 256),
+                 kernel_sizes: Sequence[int] = (64, 32, 16, 8), separable: bool = True, dropout: float = 0.3):
+        super(CompactCNN, self).__init__()
+        blocks = []
+        in_channels = 1
+        for i, (out_channels, kernel_size) in enumerate(zip(channels, kernel_sizes)):
+            blocks.append(conv_block(in_channels, out_channels, kernel_size, 2, separable and i > 0))
+            in_channels = out_channels
+        self.features = nn.Sequential(*blocks)
+        self.pool = nn.AdaptiveAvgPool1d(1)
+        self.dropout = nn.Dropout(dropout)
+        self.fc = nn.Linear(in_channels, num_classes)
+
+    def forward(self, x):
+        x = self.pool(self.features(x)).flatten(1)
+        return self.fc(self.dropout(x))
+
+
+class SpectralCNN(nn.Module):
+    """
+    Small CNN over spectral.py features: the log energies of the `num_bands`
+    bands are the input channels of 1D convolutions along the frame axis,
+    followed by global average pooling. Input BatchNorm standardizes each band.
+    """
+
+    def __init__(self, num_classes: int = 4, num_bands: int = SPECTRAL_CONFIG["num_bands"], num_frames: int = 74,
+                 channels: Sequence[int] = (64, 64, 128), kernel_sizes: Sequence[int] = (5, 5, 3),
+                 dropout: float = 0.3):
+        super(SpectralCNN, self).__init__()
+        self.input_shape = (num_bands, num_frames)
+        self.input_norm = nn.BatchNorm1d(num_bands)
+        blocks = []
+        in_channels = num_bands
+        for i, (out_channels, kernel_size) in enumerate(zip(channels, kernel_sizes)):
+            blocks.append(conv_block(in_channels, out_channels, kernel_size, 1 if i == 0 else 2, separable=i > 0))
+            in_channels = out_channels
+        self.features = nn.Sequential(*blocks)
+        self.pool = nn.AdaptiveAvgPool1d(1)
+        self.dropout = nn.Dropout(dropout)
+        self.fc = nn.Linear(in_channels, num_classes)
+
+    def forward(self, x):
+        x = self.pool(self.features(self.input_norm(x))).flatten(1)
+        return self.fc(self.dropout(x))
+
+
+def build_variant(architecture: str, num_classes: int, spectral_config: Optional[Dict] = None) -> nn.Module:
+    """
+    A CompactCNN for one of MODEL_VARIANTS, or a SpectralCNN sized for
+    `spectral_config` (default spectral.SPECTRAL_CONFIG). The baseline lives with its callers.
+    """
+    if architecture == SPECTRAL_ARCHITECTURE:
+        front_end = SpectralFrontEnd.from_config(spectral_config)
+        return SpectralCNN(num_classes, num_bands=front_end.num_bands, num_frames=front_end.num_frames)
+    if architecture not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown architecture '{architecture}'. Choose from: {', '.join(ARCHITECTURES)}")
+    return CompactCNN(num_classes=num_classes, **MODEL_VARIANTS[architecture])
+
+
+def write_model_config(model_dir: str, architecture: str, **extra):
+    with open(os.path.join(model_dir, MODEL_CONFIG_FILE), "w") as f:
+        json.dump({"architecture": architecture, **extra}, f, indent=2)
+
+
+def read_model_config(model_dir: str) -> Dict:
+    """
+    model_config.json of the model in `model_dir`; models saved before it are
+    baselines, and models saved without an input rate take source-rate windows.
+    """
+    config = {"architecture": BASELINE_ARCHITECTURE, "sample_rate": SOURCE_SAMPLE_RATE,
+              "window_samples": window_samples(SOURCE_SAMPLE_RATE)}
+    path = os.path.join(model_dir, MODEL_CONFIG_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            config.update(json.load(f))
+    return config
+
+
+def read_architecture(model_dir: str) -> str:
+    return read_model_config(model_dir)["architecture"]
+
+
+# --- Cost ---
+def count_parameters(model: nn.Module) -> int:
+    return sum(p.numel() for p in model.parameters())
+
+
+def count_macs(model: nn.Module, num_samples: int = window_samples(SOURCE_SAMPLE_RATE)) -> int:
+    """
+    Multiply-accumulates of one forward pass through Conv1d and Linear layers,
+    for a [1, 1, num_samples] window or the model's `input_shape` (SpectralCNN,
+    whose spectral front end is not counted).
+    """
+    macs = 0
+
+    def conv_hook(module, inputs, output):
+        nonlocal macs
+        kernel_macs = module.in_channels // module.groups * module.kernel_size[0]
+        macs += output.numel() * kernel_macs
+
+    def linear_hook(module, inputs, output):
+        nonlocal macs
+        macs += output.numel() * module.in_features
+
+    handles = []
+    for module in model.modules():
+        if isinstance(module, nn.Conv1d):
+            handles.append(module.register_forward_hook(conv_hook))
+        elif isinstance(module, nn.Linear):
+            handles.append(module.register_forward_hook(linear_hook))
+    was_training = model.training
+    model.eval()
+    try:
+        with torch.no_grad():
+            model(torch.zeros((1,) + tuple(getattr(model, "input_shape", (1, num_samples)))))
+    finally:
+        for handle in handles:
+            handle.remove()
+        model.train(was_training)
+    return macs
@@ -1,90 +1,613 @@
+import asyncio
+import json
+import os
+import time
+
 import numpy as np
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List
-
-# Import your prediction function
-try:
-    from ai_inference import predict_fault
-    print("✅ ai_inference module loaded successfully")
-except ImportError:
-    # Dummy function for testing if file is missing
-    print("⚠️  Warning: 'ai_inference' not found. Using dummy predictor.")
-    def predict_fault(data): 
-        # Simple dummy predictor for testing
-        return "healthy_dummy"
+from collections import Counter
+from fastapi import FastAPI, Header, HTTPException, Request, Response, WebSocket
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Dict, List, Optional, Set
+
+from batching import BATCH_MAX_SIZE, BatchScheduler, QueueFullError
+from binary_codec import BinaryDecodeError, decode_window
+from device_state import STATE_HEARTBEAT_SECONDS, DeviceStateTracker, EventBroadcaster
+from metrics import CONTENT_TYPE_LATEST, REGISTRY, counter, debug_sampled, gauge, histogram
+from model_registry import ModelRegistry, ModelRegistryError
+from resampling import MAX_INPUT_SAMPLE_RATE, MIN_INPUT_SAMPLE_RATE, SOURCE_SAMPLE_RATE, window_samples
+from shadow import ShadowRunner
+from udp_ingest import UDP_INGEST_PORT, UDPIngestService
+from window_archive import RECORD_DIR, WindowRecorder
+from worker_pool import INFERENCE_WORKERS, InferenceWorkerPool
 
 app = FastAPI(title="AI Component Health Predictor (HTTP API)", version="3.0.0")
 
+# --- Model Lifecycle ---
+# ai_inference (torch + model weights) is imported, loaded and warmed up in the
+# background after the server starts: /health answers right away (liveness),
+# /ready only once predictions can be served without a cold-start penalty.
+WARMUP_BATCH_SIZES = os.environ.get("WARMUP_BATCH_SIZES", "")  # e.g. "1,8,32"; empty = powers of two up to BATCH_MAX_SIZE
+WARMUP_PASSES = int(os.environ.get("WARMUP_PASSES", "1"))       # 0 = no warm-up
+
+def warmup_batch_sizes() -> List[int]:
+    if WARMUP_BATCH_SIZES:
+        return [int(size) for size in WARMUP_BATCH_SIZES.split(",") if size.strip()]
+    sizes, size = [], 1
+    while size < BATCH_MAX_SIZE:
+        sizes.append(size)
+        size *= 2
+    return sizes + [BATCH_MAX_SIZE]
+
+class DummyInference:
+    """Stand-in for ai_inference when it (or torch) is missing, so the API can be tested."""
+    healthy_gate = None
+    StreamingPredictor = None
+
+    @staticmethod
+    def load_model():
+        pass
+
+    @staticmethod
+    def warm_up(batch_sizes, passes):
+        return 0.0
+
+    @staticmethod
+    def classify_batch(windows, timings=None):
+        return [
+            {"label": "healthy_dummy", "confidence": 0.0, "top_k": [], "probabilities": None, "stage": "full"}
+            for _ in windows
+        ]
+
+inference = None  # the ai_inference module (or DummyInference) once loaded
+readiness = {"ready": False, "stage": "starting", "error": None}
+process_started = time.perf_counter()
+
+def load_inference(warm_up: bool):
+    """Imports ai_inference, loads the model and warms it up (runs in a worker thread)."""
+    started = time.perf_counter()
+    readiness["stage"] = "importing"
+    try:
+        import ai_inference as module
+        print("✅ ai_inference module loaded successfully")
+    except ImportError as e:
+        # Dummy predictor for testing if the module or its dependencies are missing
+        print(f"⚠️  Warning: 'ai_inference' not available ({e}). Using dummy predictor.")
+        module = DummyInference
+    imported = time.perf_counter()
+
+    readiness["stage"] = "loading"
+    module.load_model()
+    loaded = time.perf_counter()
+
+    warmup_seconds = 0.0
+    if warm_up and WARMUP_PASSES > 0:
+        readiness["stage"] = "warming_up"
+        warmup_seconds = module.warm_up(warmup_batch_sizes(), WARMUP_PASSES)
+
+    readiness.update(import_s=imported - started, load_s=loaded - imported, warmup_s=warmup_seconds)
+    return module
+
+def serving_model():
+    """The model version new batches run on (None while loading or with the dummy predictor)."""
+    if inference is None or inference is DummyInference:
+        return None
+    return inference.active_model
+
+async def prepare_inference():
+    """Background startup task: model loading, warm-up and inference workers, then ready."""
+    global inference, streaming_predictor
+    loop = asyncio.get_running_loop()
+    try:
+        # With worker processes the API process only needs the model for /predict-stream,
+        # so the warm-up (at batch sizes the workers serve) happens in the workers
+        inference = await loop.run_in_executor(None, load_inference, worker_pool is None)
+        if worker_pool is not None:
+            readiness["stage"] = "starting_workers"
+            await worker_pool.start()
+        if inference.StreamingPredictor is not None:
+            streaming_predictor = inference.StreamingPredictor()
+    except Exception as e:
+        readiness.update(stage="failed", error=f"{type(e).__name__}: {e}")
+        print(f"❌ Model loading failed: {readiness['error']}")
+        return
+
+    model = serving_model()
+    version = model.version if model is not None else "dummy"
+    MODEL_VERSION.set(1, version=version)
+    readiness.update(ready=True, stage="ready", version=version,
+                     time_to_ready_s=time.perf_counter() - process_started)
+    if model is not None and model.healthy_gate is not None:
+        print(f"⚡ Cascade: windows with P(healthy) >= {model.healthy_gate.threshold:.3f} skip the full model")
+    if model is not None and model.sample_rate != SOURCE_SAMPLE_RATE:
+        print(f"〰️  Model input: {model.sample_rate:,} Hz (requests at other rates are resampled)")
+    print(f"✅ Model ready after {readiness['time_to_ready_s']:.2f}s "
+          f"(load {readiness['load_s']:.2f}s, warm-up {readiness['warmup_s']:.2f}s)")
+
+def require_ready():
+    if not readiness["ready"]:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Model is not ready ({readiness['stage']})",
+            headers={"Retry-After": "1"},
+        )
+
+# --- Metrics (Prometheus text format on /metrics, see metrics.py) ---
+STAGE_SECONDS = histogram(
+    "ai_stage_duration_seconds",
+    "Seconds per stage: decode/validate/scheduler/serialize per request, normalize/gate/forward per batch",
+    ["stage"],
+)
+REQUESTS = counter("ai_http_requests_total", "HTTP requests by path and status code", ["path", "status"])
+REQUESTS_INFLIGHT = gauge("ai_http_requests_inflight", "HTTP requests currently being handled")
+DEVICE_WINDOWS = counter("ai_device_windows_total", "Windows classified per device", ["device"])
+PREDICTIONS = counter("ai_predictions_total", "Predictions per label and cascade stage", ["label", "stage"])
+REJECTED_WINDOWS = counter(
+    "ai_rejected_windows_total",
+    "Windows rejected: not_ready, queue_full, overloaded (queue delay limit) or device_queue_full",
+    ["source", "reason"],
+)
+COALESCED_WINDOWS = counter(
+    "ai_coalesced_windows_total", "Queued windows replaced by a newer window of the same device (latest wins)",
+    ["device"],
+)
+gauge("ai_model_ready", "1 once the model is loaded and warmed up", callback=lambda: int(readiness["ready"]))
+INPUT_WINDOWS = counter(
+    "ai_input_windows_total", "Windows received per declared sample rate (resampled unless it is the model's)",
+    ["sample_rate"],
+)
+MODEL_VERSION = gauge("ai_model_version_info", "1 for the model version serving new batches", ["version"])
+MODEL_SWAPS = counter("ai_model_swaps_total", "Model version activations (deploys and rollbacks)", ["outcome"])
+SHADOW_WINDOWS = counter(
+    "ai_shadow_windows_total", "Windows scored by the shadow model, by agreement with the active model",
+    ["version", "outcome"],
+)
+STATE_CHANGES = counter(
+    "ai_device_state_changes_total", "Smoothed device state changes pushed to subscribers, by new label", ["label"],
+)
+gauge("ai_state_subscribers", "Connected /predictions/events and /predictions/ws subscribers",
+      callback=lambda: state_events.subscribers)
+gauge("ai_batch_queue_depth", "Windows waiting to be batched", callback=lambda: batch_scheduler.queue_depth)
+gauge("ai_batches_inflight", "Batches currently running", callback=lambda: batch_scheduler.inflight_batches)
+gauge("ai_devices_waiting", "Devices with windows waiting to be batched", callback=lambda: batch_scheduler.devices_waiting)
+gauge("ai_admission_estimated_wait_seconds", "Estimated queueing delay of a newly admitted window",
+      callback=lambda: batch_scheduler.estimated_wait())
+
+# Paths reported individually in ai_http_requests_total (anything else is "other")
+METRIC_PATHS = {"/predict-real-time", "/predict-real-time/binary", "/predict-stream", "/health", "/ready", "/metrics",
+                "/models"}
+
+class RequestMetricsMiddleware:
+    """Plain ASGI middleware counting requests by path/status and tracking in-flight requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_INFLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_INFLIGHT.dec()
+            path = scope["path"] if scope["path"] in METRIC_PATHS else "other"
+            REQUESTS.inc(path=path, status=str(status))
+
+app.add_middleware(RequestMetricsMiddleware)
+
+def observe_batch_timings(timings: dict):
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+def classify_batch_instrumented(windows):
+    timings = {}
+    results = inference.classify_batch(windows, timings=timings)
+    observe_batch_timings(timings)
+    return results
+
+# How many windows each cascade stage answered ("gate" = short-circuited as healthy)
+prediction_stages = Counter()
+
+def record_prediction(device_id: str, result: dict):
+    prediction_stages[result["stage"]] += 1
+    DEVICE_WINDOWS.inc(device=device_id)
+    PREDICTIONS.inc(label=result["label"], stage=result["stage"])
+
+# Candidate model scored on a sample of live traffic (POST /models/{version}/shadow)
+shadow_runner: Optional[ShadowRunner] = None
+
+# Optional archive of every classified window and its prediction (RECORD_DIR, see window_archive.py).
+# Opened in startup_event, not at import: spawned inference workers re-import this
+# module and must not recover or write the serving process's archive.
+recorder: Optional[WindowRecorder] = None
+
+# Smoothed per-device state; subscribers of /predictions/events and /predictions/ws
+# get an event only when a device's state changes (see device_state.py)
+device_states = DeviceStateTracker()
+state_events = EventBroadcaster()
+
+def on_batch_completed(windows, results, device_ids):
+    events = device_states.update_batch(results, device_ids)
+    if events:
+        for event in events:
+            STATE_CHANGES.inc(label=event["label"])
+        state_events.publish(events)
+    if shadow_runner is not None:
+        shadow_runner.offer(windows, results)
+    if recorder is not None:
+        recorder.record(windows, results, device_ids)
+
+def record_coalesced(device_id: str):
+    COALESCED_WINDOWS.inc(device=device_id)
+
+# Windows from all devices are grouped into one forward pass (see batching.py),
+# taken round-robin from bounded per-device queues (admission control).
+# With INFERENCE_WORKERS > 0 batches run in separate inference processes
+# (see worker_pool.py) and this process only does async I/O.
+def create_worker_pool(model_dir: Optional[str] = None, version: Optional[str] = None) -> InferenceWorkerPool:
+    return InferenceWorkerPool(INFERENCE_WORKERS, max_batch_size=BATCH_MAX_SIZE,
+                               on_timings=observe_batch_timings,
+                               warmup_batch_sizes=warmup_batch_sizes(), warmup_passes=WARMUP_PASSES,
+                               model_dir=model_dir, version=version)
+
+if INFERENCE_WORKERS > 0:
+    worker_pool = create_worker_pool()
+    batch_scheduler = BatchScheduler(runner=worker_pool.run_batch, max_inflight_batches=worker_pool.num_slots,
+                                     on_batch=on_batch_completed, on_coalesce=record_coalesced)
+else:
+    worker_pool = None
+    batch_scheduler = BatchScheduler(classify_batch_instrumented, on_batch=on_batch_completed,
+                                     on_coalesce=record_coalesced)
+
+# --- Model Versions: hot swap, shadow traffic and rollback (see model_registry.py) ---
+SHADOW_FRACTION = float(os.environ.get("SHADOW_FRACTION", "0.05"))  # default share of live windows shadowed
+model_registry = ModelRegistry()
+deploy_lock = asyncio.Lock()
+deployment = {"state": "idle", "version": None, "error": None}
+
+def require_registry_version(version: str) -> str:
+    if serving_model() is None:
+        raise HTTPException(status_code=503, detail="Model versions can only be managed once the model is loaded")
+    try:
+        return model_registry.path(version)
+    except ModelRegistryError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+def load_version(model_dir: str, version: str, warm_up: bool):
+    """Loads (and warms up) a model version next to the serving one without activating it (worker thread)."""
+    started = time.perf_counter()
+    model = inference.build_model(model_dir, version=version)
+    loaded = time.perf_counter()
+    warmup_seconds = 0.0
+    if warm_up and WARMUP_PASSES > 0:
+        warmup_seconds = inference.warm_up(warmup_batch_sizes(), WARMUP_PASSES, model=model)
+    return model, {"load_s": loaded - started, "warmup_s": warmup_seconds}
+
+async def deploy_version(version: str) -> dict:
+    """
+    Loads and warms up `version` while the current model keeps serving, then
+    swaps it in: batches already running finish on the old version, every new
+    batch runs on the new one, and no window is dropped. With worker processes
+    a second pool is started on the new version and the old pool is stopped
+    once its batches have drained.
+    """
+    global worker_pool
+    model_dir = require_registry_version(version)
+    if deploy_lock.locked():
+        raise HTTPException(status_code=409, detail=f"Deployment of '{deployment['version']}' in progress")
+
+    async with deploy_lock:
+        previous = serving_model().version
+        deployment.update(state="loading", version=version, error=None)
+        loop = asyncio.get_running_loop()
+        new_pool = None
+        try:
+            # With worker processes this process only needs the model for /predict-stream
+            model, timings = await loop.run_in_executor(None, load_version, model_dir, version, worker_pool is None)
+            if worker_pool is not None:
+                deployment["state"] = "starting_workers"
+                new_pool = create_worker_pool(model_dir, version)
+                await new_pool.start()
+        except Exception as e:
+            if new_pool is not None:
+                await new_pool.stop()
+            deployment.update(state="failed", error=f"{type(e).__name__}: {e}")
+            MODEL_SWAPS.inc(outcome="failed")
+            print(f"❌ Could not deploy model '{version}': {deployment['error']}")
+            raise HTTPException(status_code=500, detail=f"Could not load model '{version}': {deployment['error']}")
+
+        # The swap itself: plain reference assignments on the event loop thread
+        old_pool = worker_pool
+        if new_pool is not None:
+            worker_pool = new_pool
+            batch_scheduler.runner = new_pool.run_batch
+        inference.activate(model)
+        model_registry.set_active(version)
+
+        MODEL_VERSION.set(0, version=previous)
+        MODEL_VERSION.set(1, version=version)
+        MODEL_SWAPS.inc(outcome="success")
+        readiness["version"] = version
+        deployment.update(state="idle")
+        print(f"🔁 Model '{version}' active (was '{previous}'): "
+              f"load {timings['load_s']:.2f}s, warm-up {timings['warmup_s']:.2f}s")
+
+        if new_pool is not None:
+            await old_pool.stop()
+        return {"active": version, "previous": previous, **timings}
+
+def record_shadow(version: str):
+    def on_scored(primary: List[dict], candidate: List[dict], seconds: float):
+        STAGE_SECONDS.observe(seconds, stage="shadow")
+        for active, shadow in zip(primary, candidate):
+            SHADOW_WINDOWS.inc(version=version, outcome="agree" if active["label"] == shadow["label"] else "disagree")
+    return on_scored
+
+def stop_shadow() -> Optional[dict]:
+    global shadow_runner
+    runner, shadow_runner = shadow_runner, None
+    if runner is None:
+        return None
+    runner.stop()
+    return runner.stats()
+
+# Sliding-window inference over raw sample streams (see ai_inference.StreamingPredictor),
+# created once the model is loaded
+streaming_predictor = None
+
+# --- Native UDP Ingest (optional, enabled with UDP_INGEST_PORT) ---
+# Latest prediction per device for windows received over UDP
+udp_predictions = {}
+
+async def predict_udp_window(device_id: str, window_id: int, samples: np.ndarray):
+    if not readiness["ready"]:
+        REJECTED_WINDOWS.inc(source="udp", reason="not_ready")
+        return
+    submitted = time.perf_counter()
+    try:
+        result = await batch_scheduler.submit(samples, device_id)
+    except QueueFullError as e:
+        REJECTED_WINDOWS.inc(source="udp", reason=e.reason)
+        if debug_sampled():
+            print(f"⚠️  {e}, dropping UDP window {window_id} from {device_id}")
+        return
+    except Exception as e:
+        print(f"❌ UDP window prediction error ({device_id}, window {window_id}): {e}")
+        return
+    STAGE_SECONDS.observe(time.perf_counter() - submitted, stage="scheduler")
+    record_prediction(device_id, result)
+    udp_predictions[device_id] = {
+        "label": result["label"],
+        "confidence": result["confidence"],
+        "windowId": window_id,
+        "timestamp": time.time(),
+    }
+
+def on_udp_window(device_id: str, window_id: int, samples: np.ndarray):
+    asyncio.get_running_loop().create_task(predict_udp_window(device_id, window_id, samples))
+
+udp_ingest = UDPIngestService(on_udp_window) if UDP_INGEST_PORT else None
+
 # --- Pydantic Models for API ---
 class PredictionRequest(BaseModel):
-    samples: List[float]  # 38,400 preprocessed samples from Node.js
+    samples: List[float]  # one second of samples from Node.js: 38,400 at the default rate
     deviceId: str
+    sampleRate: int = SOURCE_SAMPLE_RATE  # Hz, see resampling.py
+
+class ClassProbability(BaseModel):
+    label: str
+    probability: float
 
 class PredictionResponse(BaseModel):
     label: str
-    confidence: float
+    confidence: float                                  # softmax probability of `label`
+    top_k: List[ClassProbability] = []                 # most likely classes, best first
+    probabilities: Optional[Dict[str, float]] = None   # every class (None when the cascade gate answered)
+    stage: str = "full"                                # cascade stage: "gate" or "full"
+
+class StreamPrediction(BaseModel):
+    sample_index: int   # stream position (in samples) the classified window ends at
+    raw_label: str      # label of this window alone
+    label: str          # smoothed label
+    confidence: float   # smoothed probability of `label`
+
+class StreamResponse(BaseModel):
+    deviceId: str
+    predictions: List[StreamPrediction]
 
 # --- FastAPI Startup Event ---
+background_tasks = set()
+
 @app.on_event("startup")
 async def startup_event():
+    global recorder
+    if RECORD_DIR:
+        recorder = WindowRecorder(RECORD_DIR)
     print("=" * 60)
     print("🚀 AI Service Starting (HTTP-only mode)")
     print("=" * 60)
     print("📡 Listening on: http://0.0.0.0:8001")
-    print("🔌 UDP handled by: Node.js UDP service (port 3000)")
-    print("📊 Expecting: 38,400 preprocessed samples per request")
+    if udp_ingest is not None:
+        print(f"🔌 UDP handled natively on port {udp_ingest.port} (windows go straight to the model)")
+    else:
+        print("🔌 UDP handled by: Node.js UDP service (port 3000)")
+    print(f"📊 Expecting: one-second windows, 38,400 samples at the default {SOURCE_SAMPLE_RATE:,} Hz "
+          f"(any rate from {MIN_INPUT_SAMPLE_RATE:,} to {MAX_INPUT_SAMPLE_RATE:,} Hz via X-Sample-Rate / sampleRate)")
     print("🎯 Data format: Normalized to [-1, 1] range (Z-score + scaling)")
+    print(f"📦 Micro-batching: up to {batch_scheduler.max_batch_size} windows, "
+          f"{batch_scheduler.max_wait * 1000:.1f} ms max wait, "
+          f"queue depth {batch_scheduler.max_queue_depth}")
+    print(f"🚦 Admission: round-robin over devices, "
+          + ("latest window per device wins" if batch_scheduler.coalesce
+             else f"{batch_scheduler.max_device_queue_depth} windows queued per device")
+          + (f", shedding beyond {batch_scheduler.max_queue_delay * 1000:.0f} ms estimated wait"
+             if batch_scheduler.max_queue_delay > 0 else ""))
+    print(f"📣 Device state changes: /predictions/events (SSE), /predictions/ws (EMA {device_states.smoothing}, "
+          f"hysteresis {device_states.hysteresis} over {device_states.confirm_windows} windows)")
+    if recorder is not None:
+        print(f"💾 Recording windows to '{recorder.writer.directory}' ({recorder.writer.codec} codec)")
+    if worker_pool is not None:
+        print(f"🧵 Inference workers: {worker_pool.num_workers} processes x "
+              f"{worker_pool.threads_per_worker} threads (shared-memory handoff)")
+    print("⏳ Loading model in the background (see /ready)")
     print("=" * 60)
+    await batch_scheduler.start()
+    if udp_ingest is not None:
+        await udp_ingest.start()
+    model_loader = asyncio.create_task(prepare_inference())
+    background_tasks.add(model_loader)
+    model_loader.add_done_callback(background_tasks.discard)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    global recorder
+    for task in list(background_tasks):
+        task.cancel()
+    state_events.close()
+    stop_shadow()
+    if udp_ingest is not None:
+        await udp_ingest.stop()
+    await batch_scheduler.stop()
+    if worker_pool is not None:
+        await worker_pool.stop()
+    if recorder is not None:
+        recorder.stop()
+        recorder = None
+
+# --- Shared Prediction Path ---
+EXPECTED_SAMPLE_RATE = SOURCE_SAMPLE_RATE  # default when a request declares no rate
+EXPECTED_SAMPLES = window_samples(EXPECTED_SAMPLE_RATE)
+
+def check_sample_rate(sample_rate: int):
+    """400 unless the declared rate is one the service resamples (MIN/MAX_INPUT_SAMPLE_RATE)."""
+    if not MIN_INPUT_SAMPLE_RATE <= sample_rate <= MAX_INPUT_SAMPLE_RATE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Sample rate must be {MIN_INPUT_SAMPLE_RATE}-{MAX_INPUT_SAMPLE_RATE} Hz, got {sample_rate} Hz"
+        )
+
+def log_window_diagnostics(samples: np.ndarray, device_id: str):
+    """Verbose per-window statistics; only computed for debug-sampled requests (DEBUG_LOG_SAMPLE_RATE)."""
+    sample_min = np.min(samples)
+    sample_max = np.max(samples)
+    # Validate preprocessing (data should be roughly in [-1, 1] range)
+    if sample_min < -2.0 or sample_max > 2.0:
+        print(f"⚠️  Warning: Data range unusual. Min: {sample_min:.3f}, Max: {sample_max:.3f}")
+    print(f"📊 Received data from {device_id}")
+    print(f"   Samples: {len(samples)}, Range: [{sample_min:.3f}, {sample_max:.3f}]")
+    print(f"   Mean: {np.mean(samples):.3f}, Std: {np.std(samples):.3f}")
+
+async def run_prediction(samples: np.ndarray, device_id: str, sample_rate: int = EXPECTED_SAMPLE_RATE) -> Response:
+    """
+    Validates one one-second window at `sample_rate` (38,400 samples at the
+    default rate) and runs it through the micro-batcher, which resamples it to
+    the model's rate. Used by both the JSON and the binary endpoints.
+    """
+    require_ready()
+    
+    # Validate input shape (one second of samples at the declared rate)
+    with STAGE_SECONDS.time(stage="validate"):
+        check_sample_rate(sample_rate)
+        expected = window_samples(sample_rate)
+        if len(samples) != expected:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Expected {expected} samples at {sample_rate} Hz, got {len(samples)}"
+            )
+    INPUT_WINDOWS.inc(sample_rate=str(sample_rate))
+    
+    debug = debug_sampled()
+    if debug:
+        log_window_diagnostics(samples, device_id)
+    
+    # Run prediction using your ai_inference module (batched with other devices)
+    submitted = time.perf_counter()
+    try:
+        result = await batch_scheduler.submit(samples, device_id)
+    except QueueFullError as e:
+        # 429 when this device is over its share, 503 when the service is; both say when to retry
+        REJECTED_WINDOWS.inc(source="http", reason=e.reason)
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    STAGE_SECONDS.observe(time.perf_counter() - submitted, stage="scheduler")
+    
+    record_prediction(device_id, result)
+    if debug:
+        print(f"🤖 Prediction: {result['label']} (confidence: {result['confidence']:.2%}, {result['stage']} stage)")
+    
+    with STAGE_SECONDS.time(stage="serialize"):
+        body = PredictionResponse(**result).model_dump_json()
+    return Response(content=body, media_type="application/json")
 
 # --- HTTP Endpoints ---
-@app.post("/predict-real-time", response_model=PredictionResponse)
-async def predict_real_time(request: PredictionRequest):
+@app.post(
+    "/predict-real-time",
+    response_model=PredictionResponse,
+    # The body is parsed in the handler (so decoding can be timed); keep the schema in the docs
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": PredictionRequest.model_json_schema()}},
+    }},
+)
+async def predict_real_time(request: Request):
     """
     Receives preprocessed data from Node.js UDP service
     Data is already normalized to [-1, 1] range (matching training)
     Returns AI prediction with confidence
     """
+    body = await request.body()
     try:
-        # Convert to numpy array
-        samples = np.array(request.samples, dtype=np.float32)
-        
-        # Validate input shape (should be 38,400 preprocessed samples)
-        if len(samples) != 38400:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Expected 38400 samples, got {len(samples)}"
-            )
-        
-        # Validate preprocessing (data should be roughly in [-1, 1] range)
-        sample_min = np.min(samples)
-        sample_max = np.max(samples)
-        if sample_min < -2.0 or sample_max > 2.0:
-            print(f"⚠️  Warning: Data range unusual. Min: {sample_min:.3f}, Max: {sample_max:.3f}")
-        
-        print(f"📊 Received data from {request.deviceId}")
-        print(f"   Samples: {len(samples)}, Range: [{sample_min:.3f}, {sample_max:.3f}]")
-        print(f"   Mean: {np.mean(samples):.3f}, Std: {np.std(samples):.3f}")
-        
-        # Run prediction using your ai_inference module
-        result = predict_fault(samples)
-        
-        # If your predict_fault returns just a label string, create a response
-        if isinstance(result, str):
-            label = result
-            confidence = 0.95  # Default confidence if not provided by model
-            print(f"🤖 Prediction: {label} (using default confidence)")
-        else:
-            # If it returns a dict with label and confidence
-            label = result.get('label', 'unknown')
-            confidence = result.get('confidence', 0.0)
-            print(f"🤖 Prediction: {label} (confidence: {confidence:.2%})")
+        with STAGE_SECONDS.time(stage="decode"):
+            payload = PredictionRequest.model_validate_json(body)
+            # Convert to numpy array
+            samples = np.array(payload.samples, dtype=np.float32)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+    
+    try:
+        return await run_prediction(samples, payload.deviceId, payload.sampleRate)
         
-        return PredictionResponse(
-            label=label,
-            confidence=confidence
-        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Prediction error: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/predict-real-time/binary", response_model=PredictionResponse)
+async def predict_real_time_binary(
+    request: Request,
+    x_device_id: str = Header(...),
+    x_sample_rate: int = Header(EXPECTED_SAMPLE_RATE),
+):
+    """
+    Binary variant of /predict-real-time.
+    Body is either raw little-endian float32 samples (application/octet-stream)
+    or a .npy file (application/x-npy). Device id and sample rate travel in the
+    X-Device-Id / X-Sample-Rate headers, and the body is wrapped with
+    np.frombuffer instead of being parsed as JSON. A device that decimates
+    before sending (e.g. X-Sample-Rate: 9600) sends a quarter of the bytes.
+    """
+    check_sample_rate(x_sample_rate)
+    
+    try:
+        body = await request.body()
+        try:
+            with STAGE_SECONDS.time(stage="decode"):
+                samples = decode_window(body, request.headers.get("content-type"))
+        except BinaryDecodeError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return await run_prediction(samples, x_device_id, x_sample_rate)
         
     except HTTPException:
         raise
@@ -94,26 +617,259 @@ async def predict_real_time(request: PredictionRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/predict-stream", response_model=StreamResponse)
+async def predict_stream(
+    request: Request,
+    x_device_id: str = Header(...),
+    x_sample_rate: int = Header(EXPECTED_SAMPLE_RATE),
+):
+    """
+    Streaming (sliding-window) inference.
+    Body is any number of *raw* (not normalized) float32 samples continuing the
+    device's stream, as application/octet-stream or application/x-npy. A window of
+    the latest second (38,400 samples at the default X-Sample-Rate) is classified
+    every STREAM_HOP_SAMPLES samples (counted at the default rate) and the
+    smoothed predictions that became due are returned (possibly none).
+    """
+    require_ready()
+    if streaming_predictor is None:
+        raise HTTPException(status_code=503, detail="Streaming inference requires the ai_inference module")
+    check_sample_rate(x_sample_rate)
+    
+    body = await request.body()
+    try:
+        with STAGE_SECONDS.time(stage="decode"):
+            samples = decode_window(body, request.headers.get("content-type"))
+    except BinaryDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        loop = asyncio.get_running_loop()
+        with STAGE_SECONDS.time(stage="stream"):
+            predictions = await loop.run_in_executor(None, streaming_predictor.push, x_device_id, samples,
+                                                     x_sample_rate)
+    except Exception as e:
+        print(f"❌ Streaming prediction error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    for prediction in predictions:
+        DEVICE_WINDOWS.inc(device=x_device_id)
+        PREDICTIONS.inc(label=prediction["label"], stage="stream")
+    return StreamResponse(deviceId=x_device_id, predictions=predictions)
+
 @app.get("/")
 async def root():
     return {
         "message": "AI Component Health Predictor",
         "version": "3.0.0",
         "status": "running",
-        "expected_input": "38400 preprocessed samples (normalized to [-1, 1])",
+        "expected_input": "one second of samples (38400 at the default 38400 Hz; declare others "
+                          "with X-Sample-Rate / sampleRate)",
         "api_endpoint": "/predict-real-time",
+        "binary_endpoint": "/predict-real-time/binary (float32 LE or .npy body)",
+        "events_endpoint": "/predictions/events (SSE) or /predictions/ws (WebSocket): device state changes",
         "architecture": "HTTP API (UDP handled by Node.js service)"
     }
 
+def parse_devices(devices: Optional[str]) -> Optional[Set[str]]:
+    """Comma-separated device ids of a `devices` query parameter (None = every device)."""
+    return {device for device in devices.split(",") if device} if devices else None
+
+@app.get("/predictions/state")
+async def prediction_state(devices: Optional[str] = None):
+    """Smoothed state of every device (or of the comma-separated `devices`) and event statistics"""
+    return {
+        **device_states.stats(),
+        **state_events.stats(),
+        "states": device_states.snapshot(parse_devices(devices)),
+    }
+
+@app.get("/predictions/events")
+async def prediction_events(devices: Optional[str] = None):
+    """
+    Server-Sent Events: one "snapshot" event per device, then a "change" event
+    whenever a device's smoothed label changes (not one per window, see
+    device_state.py). `devices` limits the stream to comma-separated ids.
+    A subscriber too far behind is disconnected; EventSource reconnects and
+    gets a fresh snapshot.
+    """
+    device_ids = parse_devices(devices)
+    subscription = state_events.subscribe(device_ids, device_states.snapshot(device_ids))
+
+    async def frames():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), STATE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"  # keeps proxies from closing an idle stream
+                    continue
+                if event is None:
+                    return
+                yield event.sse
+        finally:
+            state_events.unsubscribe(subscription)
+
+    return StreamingResponse(frames(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/predictions/ws")
+async def prediction_events_ws(websocket: WebSocket, devices: Optional[str] = None):
+    """WebSocket variant of /predictions/events: one JSON text message per event."""
+    await websocket.accept()
+    device_ids = parse_devices(devices)
+    subscription = state_events.subscribe(device_ids, device_states.snapshot(device_ids))
+
+    async def forward():
+        while (event := await subscription.queue.get()) is not None:
+            await websocket.send_text(event.text)
+
+    async def until_disconnect():
+        # Nothing is expected from the client; this only notices when it goes away
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(forward()), asyncio.create_task(until_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        state_events.unsubscribe(subscription)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)  # e.g. a send to a client that just left
+    if tasks[1].cancelled():  # the client is still connected
+        # Dropped for falling behind (1013 "try again later": reconnect for a snapshot) or shutting down
+        try:
+            await websocket.close(code=1013 if subscription.dropped else 1001)
+        except RuntimeError:
+            pass  # the connection is already gone
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: stage latency histograms, per-device/label counters, queue gauges"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/batching/stats")
+async def batching_stats():
+    """Queue depth and batch size/latency statistics of the micro-batcher"""
+    stats = batch_scheduler.stats()
+    if worker_pool is not None:
+        stats["worker_pool"] = worker_pool.stats()
+    return stats
+
+@app.get("/cascade/stats")
+async def cascade_stats():
+    """How often the healthy gate short-circuited the full model"""
+    total = sum(prediction_stages.values())
+    model = serving_model()
+    healthy_gate = model.healthy_gate if model is not None else None
+    return {
+        "enabled": healthy_gate is not None,
+        "threshold": healthy_gate.threshold if healthy_gate is not None else None,
+        "windows": total,
+        "short_circuited": prediction_stages["gate"],
+        "full_model": prediction_stages["full"],
+        "short_circuit_rate": prediction_stages["gate"] / total if total else 0.0,
+    }
+
+@app.get("/models")
+async def list_models():
+    """Registry versions, the version serving new batches, the rollback target and the shadow model"""
+    model = serving_model()
+    return {
+        **model_registry.describe(),
+        "serving": model.describe() if model is not None else None,
+        "deployment": deployment,
+        "shadow": shadow_runner.stats() if shadow_runner is not None else None,
+    }
+
+@app.post("/models/rollback")
+async def rollback_model():
+    """Re-activates the version that was active before the current one"""
+    target = model_registry.previous_version()
+    if target is None:
+        raise HTTPException(status_code=409, detail="No previous model version to roll back to")
+    return await deploy_version(target)
+
+@app.post("/models/{version}/activate")
+async def activate_model(version: str):
+    """Loads and warms up a registry version in the background, then swaps it in without downtime"""
+    return await deploy_version(version)
+
+@app.post("/models/{version}/shadow")
+async def shadow_model(version: str, fraction: float = SHADOW_FRACTION):
+    """
+    Runs `version` on a sampled `fraction` of live windows next to the active
+    model and reports how often the two agree (GET /models/shadow); clients
+    still only get the active model's predictions. Replaces any running shadow.
+    """
+    global shadow_runner
+    model_dir = require_registry_version(version)
+    if not 0 < fraction <= 1:
+        raise HTTPException(status_code=400, detail="fraction must be in (0, 1]")
+    loop = asyncio.get_running_loop()
+    try:
+        model, timings = await loop.run_in_executor(None, load_version, model_dir, version, True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not load model '{version}': {type(e).__name__}: {e}")
+
+    stop_shadow()
+    shadow_runner = ShadowRunner(
+        version,
+        lambda windows: inference.classify_batch(windows, model=model),
+        fraction,
+        on_scored=record_shadow(version),
+    )
+    print(f"👥 Shadowing model '{version}' on {fraction:.1%} of live windows")
+    return {"shadow": version, "fraction": fraction, **timings}
+
+@app.get("/models/shadow")
+async def shadow_stats():
+    """Agreement of the shadow model with the active model on the sampled windows"""
+    if shadow_runner is None:
+        return {"enabled": False}
+    return {"enabled": True, **shadow_runner.stats()}
+
+@app.delete("/models/shadow")
+async def stop_shadow_model():
+    """Stops shadow traffic and returns the final comparison"""
+    stats = stop_shadow()
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No shadow model running")
+    return stats
+
+@app.get("/udp/stats")
+async def udp_stats():
+    """Packet/window counters of the native UDP ingest and latest prediction per device"""
+    if udp_ingest is None:
+        return {"enabled": False}
+    return {"enabled": True, **udp_ingest.stats(), "predictions": udp_predictions}
+
+@app.get("/recorder/stats")
+async def recorder_stats():
+    """Recorded/dropped windows, per-segment write throughput and disk footprint of the window archive"""
+    if recorder is None:
+        return {"enabled": False}
+    return {"enabled": True, **recorder.stats()}
+
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up and serving HTTP (the model may still be loading, see /ready)"""
     return {
         "status": "healthy",
         "service": "ai-prediction",
-        "expected_sample_count": 38400,
+        "expected_sample_count": EXPECTED_SAMPLES,
+        "sample_rates": {"default": EXPECTED_SAMPLE_RATE, "min": MIN_INPUT_SAMPLE_RATE, "max": MAX_INPUT_SAMPLE_RATE},
         "port": 8001
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once the model is loaded and warmed up, 503 (with the loading stage) before"""
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content=readiness, headers={"Retry-After": "1"})
+    return readiness
+
 if __name__ == "__main__":
     print("🚀 Starting AI Service (HTTP-only mode)")
     print("📡 Node.js UDP service handles UDP reception and preprocessing")
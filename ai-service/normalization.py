@@ -0,0 +1,66 @@
+"""
+Window normalization shared by offline preprocessing (trainingcode/data) and
+online inference (ai_inference), so both produce bit-for-bit identical input.
+
+Each window is centred on its mean and scaled so its largest absolute value is 1.
+This is the same as the original "z-score, then divide by max |z|" recipe (the
+standard deviation cancels out), computed in fewer passes and without temporaries.
+Constant windows become all zeros.
+"""
+import numpy as np
+
+# Stored with every model version (model_registry.py): a model only serves
+# correctly if it was trained on windows normalized the same way. The window
+# geometry is the model's input rate (resampling.py), which the service
+# converts requests to, so only the method and dtype have to match.
+NORMALIZATION_CONFIG = {
+    "method": "center_max_abs",
+    "window_samples": 38400,
+    "sample_rate": 38400,
+    "dtype": "float32",
+}
+RATE_KEYS = ("window_samples", "sample_rate")
+
+
+def normalization_config(sample_rate: int, window_samples: int) -> dict:
+    """NORMALIZATION_CONFIG for a model whose input windows have this geometry."""
+    return {**NORMALIZATION_CONFIG, "window_samples": window_samples, "sample_rate": sample_rate}
+
+
+def normalize_windows(windows: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """
+    Normalizes a [N, num_samples] block, one window per row, in a single vectorized pass.
+
+    Input is first taken as float32 (the wire/chunk format), the mean is accumulated
+    in float64 and everything else is done in float32, so the result only depends on
+    the float32 samples of a row - not on where it came from or how many rows are
+    processed together. `out` may be a preallocated float32 array of the same shape,
+    or `windows` itself for in-place normalization.
+    """
+    windows = np.asarray(windows)
+    if windows.ndim != 2:
+        raise ValueError(f"Expected 2D array [windows, samples], but got shape {windows.shape}")
+    if windows.dtype != np.float32:
+        windows = windows.astype(np.float32)
+
+    if out is None:
+        out = np.empty(windows.shape, dtype=np.float32)
+    elif out.shape != windows.shape or out.dtype != np.float32:
+        raise ValueError(f"`out` must be float32 with shape {windows.shape}, got {out.dtype} {out.shape}")
+
+    mean = windows.mean(axis=1, dtype=np.float64).astype(np.float32)
+    np.subtract(windows, mean[:, np.newaxis], out=out)
+
+    max_abs = np.maximum(out.max(axis=1), -out.min(axis=1))[:, np.newaxis]
+    # Rows with max_abs == 0 are constant and already all zeros after centring
+    np.divide(out, max_abs, out=out, where=max_abs > 0)
+    return out
+
+
+def normalize_window(samples: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """Normalizes a single 1D window; same result as the matching row of `normalize_windows`."""
+    samples = np.asarray(samples)
+    if samples.ndim != 1:
+        raise ValueError(f"Expected 1D numpy array, but got shape {samples.shape}")
+    out_2d = None if out is None else out.reshape(1, -1)
+    return normalize_windows(samples.reshape(1, -1), out_2d).reshape(-1)
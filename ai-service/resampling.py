@@ -0,0 +1,195 @@
+"""
+Anti-aliased sample-rate conversion shared by preprocessing
+(trainingcode/data/preprocess_data.py --sample-rate), training (train.py) and
+inference (ai_inference.py), so a model trained at a lower effective rate
+(e.g. 9.6 kHz) sees exactly the input it was trained on, whatever rate a
+request declares.
+
+Windows are converted by the rational factor up/down = to_rate / from_rate
+with a polyphase FIR filter: the same Kaiser-windowed sinc low-pass as
+scipy.signal.resample_poly (cutoff at the lower of the two Nyquist
+frequencies, 10 * max(up, down) taps on each side, beta 5, zero padding at the
+window edges), so both agree to within float32 rounding. Only the outputs
+that are kept are ever computed: the input is viewed as [windows, rows, down]
+(one row per `down` input samples) and every output phase is a handful of
+matrix-vector products over that view, each covering the whole batch, without
+the zero-stuffed [windows, n * up] intermediate. Ratios whose terms exceed
+RESAMPLE_MAX_FACTOR are approximated by the nearest fraction within that
+bound (e.g. 38,401 -> 9,600 Hz becomes exactly 4:1).
+
+`to_model_rate` is the full input path: windows are normalized at their own
+rate, resampled, and normalized again at the model rate. Chunks written by
+preprocess_data.py are already normalized once, so they take the same path
+and come out bit-for-bit identical to live windows with the same samples.
+"""
+import os
+import threading
+from fractions import Fraction
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from normalization import normalize_windows
+
+SOURCE_SAMPLE_RATE = 38400   # ADC rate the sensors are configured for (Hz)
+WINDOW_SECONDS = 1           # every window, at any rate, covers one second
+MIN_INPUT_SAMPLE_RATE = int(os.environ.get("MIN_INPUT_SAMPLE_RATE", "1000"))
+MAX_INPUT_SAMPLE_RATE = int(os.environ.get("MAX_INPUT_SAMPLE_RATE", "48000"))
+RESAMPLE_MAX_FACTOR = int(os.environ.get("RESAMPLE_MAX_FACTOR", "160"))
+RESAMPLE_HALF_LEN_FACTOR = 10   # taps on each side of the filter centre per unit of max(up, down)
+RESAMPLE_KAISER_BETA = 5.0
+
+
+def window_samples(sample_rate: int) -> int:
+    """Samples in one window at `sample_rate` Hz."""
+    return int(round(sample_rate * WINDOW_SECONDS))
+
+
+def window_rate(num_samples: int) -> int:
+    """Sample rate (Hz) of a window with `num_samples` samples."""
+    return int(round(num_samples / WINDOW_SECONDS))
+
+
+def rational_factor(from_rate: float, to_rate: float, max_factor: int = RESAMPLE_MAX_FACTOR) -> Tuple[int, int]:
+    """(up, down) with up / down = to_rate / from_rate, or its closest approximation with both <= max_factor."""
+    if from_rate <= 0 or to_rate <= 0:
+        raise ValueError(f"Sample rates must be positive, got {from_rate} -> {to_rate}")
+    ratio = Fraction(to_rate) / Fraction(from_rate)
+    if max(ratio.numerator, ratio.denominator) > max_factor:
+        # limit_denominator bounds the denominator; keep the larger term in that place
+        ratio = ratio.limit_denominator(max_factor) if ratio <= 1 else 1 / (1 / ratio).limit_denominator(max_factor)
+    return ratio.numerator, ratio.denominator
+
+
+def design_filter(up: int, down: int) -> np.ndarray:
+    """Low-pass FIR taps (float64) of scipy.signal.resample_poly for these factors, scaled by `up`."""
+    max_rate = max(up, down)
+    half_len = RESAMPLE_HALF_LEN_FACTOR * max_rate
+    cutoff = 1.0 / max_rate  # fraction of the upsampled Nyquist frequency
+    offsets = np.arange(2 * half_len + 1) - half_len
+    taps = cutoff * np.sinc(cutoff * offsets) * np.kaiser(2 * half_len + 1, RESAMPLE_KAISER_BETA)
+    return taps / taps.sum() * up  # unit DC gain, times `up` for the zeros the upsampling inserts
+
+
+class Resampler:
+    """Converts [N, n] float32 windows from `from_rate` to `to_rate` (see the module docstring)."""
+
+    def __init__(self, from_rate: float, to_rate: float, max_factor: int = RESAMPLE_MAX_FACTOR):
+        self.from_rate = from_rate
+        self.to_rate = to_rate
+        self.up, self.down = rational_factor(from_rate, to_rate, max_factor)
+        self.effective_rate = from_rate * self.up / self.down
+        self.taps = design_filter(self.up, self.down)
+        self.half_len = (len(self.taps) - 1) // 2
+        self._plans: Dict[Tuple[int, int], tuple] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def config(self) -> Dict:
+        return {"from_rate": self.from_rate, "to_rate": self.to_rate, "up": self.up, "down": self.down,
+                "num_taps": len(self.taps), "kaiser_beta": RESAMPLE_KAISER_BETA}
+
+    def output_samples(self, num_samples: int) -> int:
+        return -(-num_samples * self.up // self.down)
+
+    def _plan(self, num_samples: int, out_samples: int) -> tuple:
+        """
+        Per output phase r (outputs r, r + up, ...): its first row in the padded
+        [rows, down] view and a [num_rows, down] weight block, so that
+        y[r + q * up] = sum_i rows[first + i + q] @ block[i].
+        """
+        key = (num_samples, out_samples)
+        plan = self._plans.get(key)
+        if plan is not None:
+            return plan
+
+        up, down, half_len, num_taps = self.up, self.down, self.half_len, len(self.taps)
+        max_taps = -(-num_taps // up)
+        pad_left = -(-max_taps // down) * down  # whole rows, so row boundaries stay on input phase 0
+        phases, end = [], 0
+        for r in range(min(up, out_samples)):
+            # Output r sits at position r * down + half_len of the zero-stuffed, filtered signal
+            centre = r * down + half_len
+            first_tap, base = centre % up, centre // up + pad_left
+            taps = self.taps[first_tap::up]                   # tap j multiplies input base - j
+            inputs = base - np.arange(len(taps))
+            first, last = inputs[-1] // down, inputs[0] // down
+            block = np.zeros((last - first + 1, down), dtype=np.float64)
+            np.add.at(block, (inputs // down - first, inputs % down), taps)
+            count = len(range(r, out_samples, up))
+            phases.append((r, first, block.astype(np.float32), count))
+            end = max(end, first + len(block) - 1 + count)
+        padded = -(-max(end * down, pad_left + num_samples) // down) * down
+        plan = (pad_left, padded, phases)
+        with self._lock:
+            self._plans[key] = plan
+        return plan
+
+    def __call__(self, windows: np.ndarray, out_samples: Optional[int] = None) -> np.ndarray:
+        """
+        [N, n] -> [N, out_samples] float32; `out_samples` defaults to
+        ceil(n * up / down). Extra outputs read the zero padding after the window.
+        """
+        windows = np.asarray(windows, dtype=np.float32)
+        if windows.ndim != 2:
+            raise ValueError(f"Expected 2D array [windows, samples], but got shape {windows.shape}")
+        num_windows, num_samples = windows.shape
+        if out_samples is None:
+            out_samples = self.output_samples(num_samples)
+        if self.up == self.down:
+            out = np.zeros((num_windows, out_samples), dtype=np.float32)
+            out[:, :min(num_samples, out_samples)] = windows[:, :out_samples]
+            return out
+
+        pad_left, padded, phases = self._plan(num_samples, out_samples)
+        rows = np.zeros((num_windows, padded // self.down, self.down), dtype=np.float32)
+        rows.reshape(num_windows, -1)[:, pad_left:pad_left + num_samples] = windows
+        out = np.empty((num_windows, out_samples), dtype=np.float32)
+        for r, first, block, count in phases:
+            phase = out[:, r::self.up]
+            phase[:] = rows[:, first:first + count] @ block[0]
+            for i in range(1, len(block)):
+                phase += rows[:, first + i:first + i + count] @ block[i]
+        return out
+
+
+_resamplers: Dict[Tuple[float, float], Resampler] = {}
+
+
+def get_resampler(from_rate: float, to_rate: float) -> Resampler:
+    """Shared Resampler per rate pair (filters and plans are built once)."""
+    key = (from_rate, to_rate)
+    resampler = _resamplers.get(key)
+    if resampler is None:
+        resampler = _resamplers.setdefault(key, Resampler(from_rate, to_rate))
+    return resampler
+
+
+def resample_windows(windows: np.ndarray, from_rate: float, to_rate: float,
+                     out_samples: Optional[int] = None) -> np.ndarray:
+    """[N, n] windows at `from_rate` -> [N, out_samples] at `to_rate` (one window at `to_rate` by default)."""
+    if out_samples is None:
+        out_samples = window_samples(to_rate)
+    return get_resampler(from_rate, to_rate)(windows, out_samples)
+
+
+def to_model_rate(windows: np.ndarray, to_rate: float, from_rate: Optional[float] = None,
+                  normalized: bool = False) -> np.ndarray:
+    """
+    Normalized [N, window_samples(to_rate)] model input from [N, n] windows at
+    `from_rate` (default: the rate of an n-sample window): normalize, resample,
+    normalize. Windows already at `to_rate` are only normalized. `normalized`
+    skips the first step for windows that already went through
+    normalize_windows (preprocessed chunks).
+    """
+    windows = np.asarray(windows)
+    if windows.ndim != 2:
+        raise ValueError(f"Expected 2D array [windows, samples], but got shape {windows.shape}")
+    if from_rate is None:
+        from_rate = window_rate(windows.shape[1])
+    if not normalized:
+        windows = normalize_windows(windows)
+    if from_rate == to_rate and windows.shape[1] == window_samples(to_rate):
+        return windows
+    resampled = resample_windows(windows, from_rate, to_rate)
+    return normalize_windows(resampled, out=resampled)
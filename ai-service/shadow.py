@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+SHADOW_MAX_PENDING_BATCHES = 2
+
+
+class ShadowRunner:
+    """
+    Shadow traffic for a candidate model version.
+
+    After every live batch, a `fraction` of its windows is copied and classified
+    again by the candidate (`classify_fn`) on a dedicated thread; the candidate's
+    labels are only compared with what the active model answered and never
+    returned to clients. At most `max_pending_batches` shadow batches are queued:
+    beyond that sampled windows are dropped (and counted), so a slow candidate
+    can never build up a backlog or delay live predictions.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        classify_fn: Callable[[np.ndarray], List[dict]],
+        fraction: float,
+        max_pending_batches: int = SHADOW_MAX_PENDING_BATCHES,
+        on_scored: Optional[Callable[[List[dict], List[dict], float], None]] = None,
+    ):
+        if not 0 < fraction <= 1:
+            raise ValueError("fraction must be in (0, 1]")
+        self.version = version
+        self.classify_fn = classify_fn
+        self.fraction = fraction
+        self.max_pending_batches = max_pending_batches
+        self.on_scored = on_scored
+        self.started_at = time.time()
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._sampled = 0
+        self._scored = 0
+        self._batches = 0
+        self._agreed = 0
+        self._dropped = 0
+        self._failed = 0
+        self._seconds_total = 0.0
+        self._disagreements = Counter()  # "active_label->candidate_label" -> windows
+
+    def offer(self, windows: Sequence[np.ndarray], results: Sequence[dict]):
+        """Called with every live batch and the active model's results; samples rows for the candidate."""
+        rows = [i for i in range(len(windows)) if random.random() < self.fraction]
+        if not rows:
+            return
+        with self._lock:
+            self._sampled += len(rows)
+            if self._pending >= self.max_pending_batches:
+                self._dropped += len(rows)
+                return
+            self._pending += 1
+        # Copy now: the caller may reuse the window buffers once the batch is answered
+        # (windows declared at different sample rates differ in length and stay a list)
+        if len({len(windows[i]) for i in rows}) == 1:
+            batch = np.stack([windows[i] for i in rows]).astype(np.float32, copy=False)
+        else:
+            batch = [np.array(windows[i], dtype=np.float32) for i in rows]
+        primary = [results[i] for i in rows]
+        self._executor.submit(self._score, batch, primary)
+
+    def _score(self, batch, primary: List[dict]):
+        started = time.perf_counter()
+        try:
+            candidate = self.classify_fn(batch)
+        except Exception as e:
+            with self._lock:
+                self._pending -= 1
+                self._failed += len(batch)
+            print(f"⚠️  Shadow model '{self.version}' failed: {e}")
+            return
+        seconds = time.perf_counter() - started
+
+        with self._lock:
+            self._pending -= 1
+            self._scored += len(batch)
+            self._batches += 1
+            self._seconds_total += seconds
+            for active, shadow in zip(primary, candidate):
+                if active["label"] == shadow["label"]:
+                    self._agreed += 1
+                else:
+                    self._disagreements[f"{active['label']}->{shadow['label']}"] += 1
+        if self.on_scored is not None:
+            self.on_scored(primary, candidate, seconds)
+
+    def stop(self):
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            scored = self._scored
+            return {
+                "version": self.version,
+                "fraction": self.fraction,
+                "running_s": time.time() - self.started_at,
+                "windows_sampled": self._sampled,
+                "windows_scored": scored,
+                "batches_scored": self._batches,
+                "windows_dropped": self._dropped,
+                "windows_failed": self._failed,
+                "agreement_rate": self._agreed / scored if scored else None,
+                "disagreements": dict(self._disagreements.most_common()),
+                "avg_batch_ms": self._seconds_total / self._batches * 1000.0 if self._batches else None,
+            }
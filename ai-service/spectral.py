@@ -0,0 +1,136 @@
+"""
+Spectral front end: log band-energy spectrograms of normalized windows, shared
+by preprocessing (trainingcode/data/preprocess_data.py feature cache), training
+(train.py, on the training device) and inference (ai_inference.py for models
+with a spectral input, see model_variants.SpectralCNN).
+
+Each [num_samples] window is cut into Hann-windowed frames of `n_fft` samples
+every `hop_length` samples (no padding), transformed with a real FFT, and the
+power of each frame is averaged over `num_bands` log-spaced frequency bands
+(each at least one FFT bin wide). The result is log(band power + eps) of shape
+[num_bands, num_frames]: 64 x 74 = 4,736 values for a 38,400-sample window
+with the defaults, versus 38,400 raw samples.
+
+The Hann window and band matrix are computed once per front end (and per torch
+device); FFT plans for the fixed `n_fft` are cached by scipy/numpy/torch after
+the first call, so every further block only pays for the transforms. NumPy
+and torch implementations agree to within float32 rounding. The configuration is
+stored with every spectral model (model_config.json) and feature cache, so
+features are always computed the way the model was trained.
+"""
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+SPECTRAL_CONFIG = {
+    "n_fft": 1024,
+    "hop_length": 512,
+    "num_bands": 64,
+    "window_samples": 38400,
+    "sample_rate": 38400,
+}
+SPECTRAL_EPS = 1e-10
+SPECTRAL_BLOCK_WINDOWS = 64  # windows transformed per NumPy block (bounds the [block, frames, n_fft] temporary)
+
+
+def band_edges(n_fft: int, num_bands: int) -> np.ndarray:
+    """num_bands + 1 FFT bin edges, log-spaced over bins 1..n_fft // 2 (DC excluded), each band >= 1 bin."""
+    num_bins = n_fft // 2 + 1
+    if num_bands > num_bins - 1:
+        raise ValueError(f"num_bands ({num_bands}) must be at most {num_bins - 1} for n_fft={n_fft}")
+    edges = np.round(np.geomspace(1, num_bins, num_bands + 1)).astype(np.int64)
+    edges[0] = 1
+    for i in range(1, len(edges)):
+        edges[i] = max(edges[i], edges[i - 1] + 1)
+    # Keep the top edge on the last bin: walk back down if the minimum widths pushed it past
+    edges[-1] = num_bins
+    for i in range(len(edges) - 2, 0, -1):
+        edges[i] = min(edges[i], edges[i + 1] - 1)
+    return edges
+
+
+class SpectralFrontEnd:
+    """Computes [N, num_bands, num_frames] log band-energy features from [N, window_samples] windows."""
+
+    def __init__(self, n_fft: int = SPECTRAL_CONFIG["n_fft"], hop_length: int = SPECTRAL_CONFIG["hop_length"],
+                 num_bands: int = SPECTRAL_CONFIG["num_bands"],
+                 window_samples: int = SPECTRAL_CONFIG["window_samples"],
+                 sample_rate: int = SPECTRAL_CONFIG["sample_rate"]):
+        if n_fft > window_samples:
+            raise ValueError("n_fft must not exceed window_samples")
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.num_bands = num_bands
+        self.window_samples = window_samples
+        self.sample_rate = sample_rate
+        self.num_frames = 1 + (window_samples - n_fft) // hop_length
+
+        self.window = np.hanning(n_fft + 1)[:-1].astype(np.float32)  # periodic Hann, same as torch.hann_window
+        edges = band_edges(n_fft, num_bands)
+        self.band_matrix = np.zeros((n_fft // 2 + 1, num_bands), dtype=np.float32)
+        for band, (low, high) in enumerate(zip(edges[:-1], edges[1:])):
+            self.band_matrix[low:high, band] = 1.0 / (high - low)  # mean power over the band's bins
+        self.band_frequencies = edges * sample_rate / n_fft  # Hz, for plots and reports
+        self._torch_constants = {}
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict] = None) -> "SpectralFrontEnd":
+        return cls(**{**SPECTRAL_CONFIG, **(config or {})})
+
+    @property
+    def config(self) -> Dict:
+        return {"n_fft": self.n_fft, "hop_length": self.hop_length, "num_bands": self.num_bands,
+                "window_samples": self.window_samples, "sample_rate": self.sample_rate}
+
+    @property
+    def feature_shape(self):
+        return self.num_bands, self.num_frames
+
+    # --- NumPy ---
+    def features(self, windows: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """[N, window_samples] float32 -> [N, num_bands, num_frames] float32, in blocks of SPECTRAL_BLOCK_WINDOWS."""
+        windows = np.asarray(windows, dtype=np.float32)
+        if windows.ndim != 2 or windows.shape[1] != self.window_samples:
+            raise ValueError(f"Expected [windows, {self.window_samples}] array, but got shape {windows.shape}")
+        if out is None:
+            out = np.empty((len(windows),) + self.feature_shape, dtype=np.float32)
+
+        rfft, fft_options = _rfft()
+        for start in range(0, len(windows), SPECTRAL_BLOCK_WINDOWS):
+            block = windows[start:start + SPECTRAL_BLOCK_WINDOWS]
+            frames = np.lib.stride_tricks.sliding_window_view(block, self.n_fft, axis=1)[:, ::self.hop_length]
+            spectrum = rfft(frames * self.window, axis=-1, **fft_options)   # [B, frames, bins] complex
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+            bands = power @ self.band_matrix                                # [B, frames, bands]
+            np.log(bands + SPECTRAL_EPS, out=bands)
+            out[start:start + len(block)] = bands.transpose(0, 2, 1)
+        return out
+
+    # --- torch ---
+    def torch_features(self, windows):
+        """Same features for a [N, window_samples] tensor, computed on its device."""
+        import torch
+
+        key = (windows.device, windows.dtype)
+        if key not in self._torch_constants:
+            self._torch_constants[key] = (
+                torch.from_numpy(self.window).to(windows.device, windows.dtype),
+                torch.from_numpy(self.band_matrix).to(windows.device, windows.dtype),
+            )
+        window, band_matrix = self._torch_constants[key]
+        spectrum = torch.stft(windows, self.n_fft, self.hop_length, window=window, center=False,
+                              return_complex=True)                          # [N, bins, frames]
+        power = spectrum.real.square() + spectrum.imag.square()
+        bands = torch.einsum("nbf,bk->nkf", power, band_matrix)
+        return torch.log(bands + SPECTRAL_EPS)
+
+
+def _rfft():
+    """scipy.fft's rfft using every core when available (optional dependency), else NumPy's."""
+    try:
+        import scipy.fft
+
+        return scipy.fft.rfft, {"workers": os.cpu_count() or 1}
+    except ImportError:
+        return np.fft.rfft, {}
@@ -0,0 +1,133 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from batching import BatchScheduler, DeviceQueueFullError, QueueFullError
+
+
+class GatedRunner:
+    """Records every batch and holds it until `release` is set; each window's result is its first sample."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.batches = []
+
+    async def __call__(self, windows):
+        self.batches.append([float(w[0]) for w in windows])
+        await self.release.wait()
+        return [float(w[0]) for w in windows]
+
+
+def window(value: float) -> np.ndarray:
+    return np.full(8, value, dtype=np.float32)
+
+
+async def busy_scheduler(**kwargs):
+    """A started scheduler whose only batch slot is taken by a blocked window, so new windows stay queued."""
+    runner = GatedRunner()
+    scheduler = BatchScheduler(runner=runner, max_wait_ms=0, **kwargs)
+    await scheduler.start()
+    blocker = asyncio.create_task(scheduler.submit(window(0), "warm"))
+    while not runner.batches:
+        await asyncio.sleep(0)
+    return scheduler, runner, blocker
+
+
+async def queue(scheduler, submissions):
+    tasks = [asyncio.create_task(scheduler.submit(window(value), device_id)) for device_id, value in submissions]
+    await asyncio.sleep(0)
+    return tasks
+
+
+async def finish(scheduler, runner, tasks):
+    runner.release.set()
+    results = await asyncio.gather(*tasks)
+    await scheduler.stop()
+    return results
+
+
+def test_device_queue_full_is_429():
+    async def scenario():
+        scheduler, runner, blocker = await busy_scheduler(coalesce=False, max_device_queue_depth=2)
+        tasks = await queue(scheduler, [("a", 1), ("a", 2)])
+        with pytest.raises(DeviceQueueFullError) as raised:
+            await scheduler.submit(window(3), "a")
+        # Other devices are still admitted
+        tasks += await queue(scheduler, [("b", 4)])
+        assert scheduler.queue_depth == 3
+        stats = scheduler.stats()
+        await finish(scheduler, runner, [blocker] + tasks)
+        return raised.value, stats
+
+    error, stats = asyncio.run(scenario())
+    assert error.status_code == 429
+    assert error.reason == "device_queue_full"
+    assert error.retry_after == 1  # no batch has finished yet, so there is no cost estimate
+    assert stats["rejected_by_reason"]["device_queue_full"] == 1
+
+
+def test_global_queue_full_is_503():
+    async def scenario():
+        scheduler, runner, blocker = await busy_scheduler(coalesce=False, max_queue_depth=2)
+        tasks = await queue(scheduler, [("a", 1), ("b", 2)])
+        with pytest.raises(QueueFullError) as raised:
+            await scheduler.submit(window(3), "c")
+        await finish(scheduler, runner, [blocker] + tasks)
+        return raised.value
+
+    error = asyncio.run(scenario())
+    assert type(error) is QueueFullError
+    assert error.status_code == 503
+    assert error.reason == "queue_full"
+
+
+def test_overloaded_is_503_with_retry_after():
+    async def scenario():
+        scheduler, runner, blocker = await busy_scheduler(coalesce=False, max_queue_delay_ms=1000)
+        scheduler._window_seconds = 0.5  # as if recent batches cost 0.5 s per window
+        # 1 window running + 1 queued = 1.0 s, which is still within the limit
+        tasks = await queue(scheduler, [("a", 1), ("b", 2)])
+        assert scheduler.estimated_wait() == pytest.approx(1.5)
+        with pytest.raises(QueueFullError) as raised:
+            await scheduler.submit(window(3), "c")
+        stats = scheduler.stats()
+        await finish(scheduler, runner, [blocker] + tasks)
+        return raised.value, stats
+
+    error, stats = asyncio.run(scenario())
+    assert error.status_code == 503
+    assert error.reason == "overloaded"
+    assert error.retry_after == 2  # ceil(1.5 s)
+    assert stats["rejected_by_reason"] == {"queue_full": 0, "overloaded": 1, "device_queue_full": 0}
+
+
+def test_latest_window_wins():
+    async def scenario():
+        coalesced = []
+        scheduler, runner, blocker = await busy_scheduler(coalesce=True, on_coalesce=coalesced.append)
+        tasks = await queue(scheduler, [("a", 1), ("b", 2), ("a", 3), ("a", 4)])
+        assert scheduler.queue_depth == 2
+        results = await finish(scheduler, runner, [blocker] + tasks)
+        return runner.batches, results, coalesced, scheduler.stats()
+
+    batches, results, coalesced, stats = asyncio.run(scenario())
+    # The replaced window keeps its place ahead of "b" but runs on the newest samples
+    assert batches[1] == [4.0, 2.0]
+    assert results == [0.0, 4.0, 2.0, 4.0, 4.0]
+    assert coalesced == ["a", "a"]
+    assert stats["coalesced"] == 2
+    assert stats["completed"] == 5
+
+
+def test_batches_are_round_robin_across_devices():
+    async def scenario():
+        scheduler, runner, blocker = await busy_scheduler(coalesce=False, max_device_queue_depth=8, max_batch_size=4)
+        flood = [("flood", 10 + i) for i in range(6)]
+        tasks = await queue(scheduler, flood + [("quiet", 20)])
+        await finish(scheduler, runner, [blocker] + tasks)
+        return runner.batches
+
+    batches = asyncio.run(scenario())
+    # The quiet device's window goes out with the first batch instead of waiting behind the flood
+    assert batches[1:] == [[10.0, 20.0, 11.0, 12.0], [13.0, 14.0, 15.0]]
@@ -0,0 +1,58 @@
+import io
+
+import numpy as np
+import pytest
+
+from binary_codec import (CONTENT_TYPE_NPY, CONTENT_TYPE_RAW, BinaryDecodeError, decode_npy, decode_raw_float32,
+                          decode_window)
+
+
+def npy_bytes(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+def test_raw_float32_round_trip():
+    samples = np.linspace(-1, 1, 1000, dtype=np.float32)
+    np.testing.assert_array_equal(decode_raw_float32(samples.tobytes()), samples)
+    with pytest.raises(BinaryDecodeError):
+        decode_raw_float32(b"\x00" * 7)
+
+
+@pytest.mark.parametrize("dtype", ["<f4", ">f4", "<f8", "<i2", "<u2"])
+def test_npy_numeric_dtypes_become_float32(dtype):
+    samples = np.arange(100).astype(dtype)
+    decoded = decode_npy(npy_bytes(samples))
+    assert decoded.dtype == np.dtype("<f4")
+    np.testing.assert_array_equal(decoded, np.arange(100, dtype=np.float32))
+
+
+@pytest.mark.parametrize("array", [
+    np.array(["a", "b"]),
+    np.array([True, False]),
+    np.array([1 + 2j, 3j]),
+    np.zeros(3, dtype=[("x", "<f4"), ("y", "<f4")]),
+    np.zeros((2, 3), dtype=np.float32),
+])
+def test_npy_non_sample_arrays_rejected(array):
+    with pytest.raises(BinaryDecodeError):
+        decode_npy(npy_bytes(array))
+
+
+def test_npy_object_and_truncated_rejected():
+    with pytest.raises(BinaryDecodeError):
+        decode_npy(npy_bytes(np.array([1, "a"], dtype=object)))
+    with pytest.raises(BinaryDecodeError):
+        decode_npy(npy_bytes(np.zeros(100, dtype=np.float32))[:-4])
+    with pytest.raises(BinaryDecodeError):
+        decode_npy(b"not an npy file")
+
+
+def test_decode_window_content_types():
+    samples = np.ones(10, dtype=np.float32)
+    np.testing.assert_array_equal(decode_window(samples.tobytes(), None), samples)
+    np.testing.assert_array_equal(decode_window(npy_bytes(samples), CONTENT_TYPE_NPY + "; charset=binary"), samples)
+    np.testing.assert_array_equal(decode_window(samples.tobytes(), CONTENT_TYPE_RAW), samples)
+    with pytest.raises(BinaryDecodeError):
+        decode_window(samples.tobytes(), "application/json")
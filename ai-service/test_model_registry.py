@@ -0,0 +1,50 @@
+import json
+import os
+
+import pytest
+
+from model_registry import ModelRegistry, ModelRegistryError
+
+
+def write(path, content="x"):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def training_dir(root):
+    os.makedirs(root)
+    for name in ("fault_detector.pt", "class_mapping.txt", "fault_detector.torchscript.pt"):
+        write(os.path.join(root, name))
+    write(os.path.join(root, "model_config.json"), json.dumps({"architecture": "baseline"}))
+    # Left behind by an earlier training / quantize.py run in the same directory
+    for name in ("fault_detector_int8.torchscript.pt", "healthy_gate.npz", "fault_detector.onnx"):
+        write(os.path.join(root, name), "stale")
+    return root
+
+
+def test_publish_takes_only_listed_artifacts(tmp_path):
+    source = training_dir(str(tmp_path / "train"))
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    version = registry.publish(source, files=["model_config.json", "fault_detector.torchscript.pt"])
+    assert sorted(os.listdir(registry.path(version))) == [
+        "class_mapping.txt", "fault_detector.pt", "fault_detector.torchscript.pt",
+        "metadata.json", "model_config.json", "normalization.json",
+    ]
+    assert set(registry.metadata(version)["files"]) == {
+        "class_mapping.txt", "fault_detector.pt", "fault_detector.torchscript.pt", "model_config.json",
+    }
+
+
+def test_publish_without_files_takes_everything(tmp_path):
+    source = training_dir(str(tmp_path / "train"))
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    version = registry.publish(source)
+    assert "healthy_gate.npz" in os.listdir(registry.path(version))
+
+
+def test_publish_rejects_unknown_artifacts(tmp_path):
+    source = training_dir(str(tmp_path / "train"))
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    with pytest.raises(ModelRegistryError):
+        registry.publish(source, files=["weights.bin"])
+    assert registry.versions() == []
@@ -0,0 +1,24 @@
+import time
+
+import numpy as np
+
+from shadow import ShadowRunner
+
+
+def test_avg_batch_ms_is_per_batch():
+    def classify(batch):
+        time.sleep(0.02)
+        return [{"label": "healthy"}] * len(batch)
+
+    runner = ShadowRunner("candidate", classify, fraction=1.0)
+    runner.offer([np.zeros(16, dtype=np.float32)] * 8, [{"label": "healthy"}] * 8)
+    deadline = time.monotonic() + 5.0
+    while runner.stats()["windows_scored"] < 8 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    runner.stop()
+
+    stats = runner.stats()
+    assert stats["windows_scored"] == 8
+    assert stats["batches_scored"] == 1
+    assert stats["agreement_rate"] == 1.0
+    assert stats["avg_batch_ms"] >= 20.0  # one 20 ms batch, not 20 ms spread over 8 windows
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from ai_inference import _DeviceStream
+from normalization import normalize_window
+
+
+def ordered_window(stream: _DeviceStream) -> np.ndarray:
+    """Valid ring contents, oldest sample first."""
+    if stream.filled < len(stream.ring):
+        return stream.ring[:stream.filled].astype(np.float64)
+    return np.roll(stream.ring, -stream.pos).astype(np.float64)
+
+
+def assert_running_stats(stream: _DeviceStream):
+    values = ordered_window(stream)
+    mean = stream.sum / len(values)
+    std = np.sqrt(max(stream.sumsq / len(values) - mean * mean, 0.0))
+    assert mean == pytest.approx(values.mean(), abs=1e-6)
+    assert std == pytest.approx(values.std(), abs=1e-6)
+
+
+@pytest.mark.parametrize("size, chunk_sizes", [
+    (1000, [300]),                  # hop does not divide the window: writes wrap before the ring is full
+    (9600, [7000, 5000, 9600]),     # a device at 9.6 kHz: the second write wraps while filling
+    (1000, [1, 999, 1000, 17, 983]),
+])
+def test_running_sums_match_recompute(size, chunk_sizes):
+    rng = np.random.default_rng(0)
+    stream = _DeviceStream(size, size)
+    for i in range(40):
+        n = chunk_sizes[i % len(chunk_sizes)]
+        stream.write((5.0 + rng.standard_normal(n)).astype(np.float32))  # mean 5, like an unnormalized sensor
+        assert_running_stats(stream)
+
+
+def test_partial_writes_before_full():
+    stream = _DeviceStream(1000, 250)
+    for n in (10, 200, 390):
+        stream.write(np.full(n, 2.0, dtype=np.float32))
+        assert_running_stats(stream)
+    assert stream.filled == 600
+
+
+def test_snapshot_matches_normalize_window():
+    rng = np.random.default_rng(1)
+    stream = _DeviceStream(1000, 300)
+    for _ in range(7):
+        stream.write((5.0 + rng.standard_normal(300)).astype(np.float32))
+    out = np.empty(1000, dtype=np.float32)
+    stream.snapshot_normalized(out)
+    expected = normalize_window(ordered_window(stream).astype(np.float32))
+    np.testing.assert_allclose(out, expected, atol=1e-4)
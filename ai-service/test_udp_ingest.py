@@ -0,0 +1,53 @@
+import numpy as np
+
+from udp_ingest import FLOAT32_LE, HEADER, PACKETS_PER_WINDOW, SAMPLES_PER_PACKET, WINDOW_SAMPLES, WindowAssembler
+
+
+def packet(window_id: int, slot: int, samples: np.ndarray, chunk_length=None) -> bytes:
+    length = len(samples) if chunk_length is None else chunk_length
+    return HEADER.pack(window_id, slot, slot * SAMPLES_PER_PACKET, length) + samples.astype(FLOAT32_LE).tobytes()
+
+
+def collect():
+    windows = []
+    return windows, WindowAssembler(lambda device_id, window_id, samples: windows.append(samples.copy()))
+
+
+def test_window_reassembled_out_of_order_with_duplicates():
+    windows, assembler = collect()
+    signal = np.arange(WINDOW_SAMPLES, dtype=np.float32)
+    for slot in reversed(range(PACKETS_PER_WINDOW)):
+        chunk = signal[slot * SAMPLES_PER_PACKET:(slot + 1) * SAMPLES_PER_PACKET]
+        assembler.add_packet("pi-1", packet(7, slot, chunk), now=0.0)
+        if slot == 60:
+            assembler.add_packet("pi-1", packet(7, slot, chunk), now=0.0)
+    assert len(windows) == 1
+    np.testing.assert_array_equal(windows[0], signal)
+    assert assembler.packets_duplicate == 1
+
+
+def test_short_packet_does_not_fill_its_slot():
+    windows, assembler = collect()
+    full = np.ones(SAMPLES_PER_PACKET, dtype=np.float32)
+    assembler.add_packet("pi-1", packet(1, 0, full[:10]), now=0.0)  # 10 of 320 samples
+    for slot in range(1, PACKETS_PER_WINDOW):
+        assembler.add_packet("pi-1", packet(1, slot, full), now=0.0)
+    assert windows == []
+    assert assembler.packets_malformed == 1
+
+    # The retransmitted full packet completes the window, with no uninitialized samples
+    assembler.add_packet("pi-1", packet(1, 0, full), now=0.0)
+    assert len(windows) == 1
+    np.testing.assert_array_equal(windows[0], np.ones(WINDOW_SAMPLES, dtype=np.float32))
+
+
+def test_malformed_packets_rejected():
+    windows, assembler = collect()
+    full = np.ones(SAMPLES_PER_PACKET, dtype=np.float32)
+    assembler.add_packet("pi-1", b"\x00" * 8, now=0.0)                                  # truncated header
+    assembler.add_packet("pi-1", packet(1, 0, full)[:-4], now=0.0)                       # truncated payload
+    assembler.add_packet("pi-1", packet(1, PACKETS_PER_WINDOW, full), now=0.0)           # past the window
+    assembler.add_packet("pi-1", packet(1, 0, full, chunk_length=0), now=0.0)
+    assembler.add_packet("pi-1", HEADER.pack(1, 0, 5, 320) + full.tobytes(), now=0.0)    # unaligned
+    assert assembler.packets_malformed == 5
+    assert windows == []
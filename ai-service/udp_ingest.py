@@ -0,0 +1,234 @@
+import asyncio
+import os
+import socket
+import struct
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+# --- Raspberry Pi Packet Protocol ---
+# [windowId (4B)][packetSeqId (4B)][chunkStartIndex (4B)][chunkLength (4B)][320 x float32LE samples]
+# Same format as server/udp/listener.js
+HEADER = struct.Struct("<4I")
+WINDOW_SAMPLES = 38400
+SAMPLES_PER_PACKET = 320
+PACKETS_PER_WINDOW = WINDOW_SAMPLES // SAMPLES_PER_PACKET  # 120 packets per 1-second window
+FLOAT32_LE = np.dtype("<f4")
+
+# --- Ingest Configuration (override with environment variables) ---
+UDP_INGEST_HOST = os.environ.get("UDP_INGEST_HOST", "0.0.0.0")
+UDP_INGEST_PORT = int(os.environ.get("UDP_INGEST_PORT", "0"))  # 0 = disabled
+UDP_WINDOW_TIMEOUT_S = float(os.environ.get("UDP_WINDOW_TIMEOUT_S", "2.0"))
+UDP_MAX_OPEN_WINDOWS = int(os.environ.get("UDP_MAX_OPEN_WINDOWS", "4"))  # per device
+UDP_RECV_BUFFER_BYTES = int(os.environ.get("UDP_RECV_BUFFER_BYTES", str(8 * 1024 * 1024)))
+
+# How many closed window ids per device are remembered to recognise late packets
+_CLOSED_HISTORY = 64
+
+
+class _WindowBuffer:
+    __slots__ = ("samples", "received", "packet_count", "opened_at")
+
+    def __init__(self, now: float):
+        self.samples = np.empty(WINDOW_SAMPLES, dtype=np.float32)
+        self.received = bytearray(PACKETS_PER_WINDOW)  # 1 = packet slot filled
+        self.packet_count = 0
+        self.opened_at = now
+
+
+class _DeviceState:
+    __slots__ = ("windows", "closed", "closed_order")
+
+    def __init__(self):
+        self.windows: Dict[int, _WindowBuffer] = {}
+        self.closed = set()
+        self.closed_order = deque()
+
+    def close(self, window_id: int):
+        self.windows.pop(window_id, None)
+        self.closed.add(window_id)
+        self.closed_order.append(window_id)
+        if len(self.closed_order) > _CLOSED_HISTORY:
+            self.closed.discard(self.closed_order.popleft())
+
+
+class WindowAssembler:
+    """
+    Reassembles 1-second windows from Raspberry Pi UDP packets.
+
+    Every packet is decoded with np.frombuffer and copied straight into a
+    preallocated float32 buffer for its (device, window). A per-window slot map
+    tracks which packets arrived, so duplicates and packets for windows that were
+    already completed or evicted ("late") are counted and ignored. Completed
+    windows are passed to `on_window(device_id, window_id, samples)`.
+    """
+
+    def __init__(
+        self,
+        on_window: Callable[[str, int, np.ndarray], None],
+        window_timeout_s: float = UDP_WINDOW_TIMEOUT_S,
+        max_open_windows: int = UDP_MAX_OPEN_WINDOWS,
+    ):
+        self.on_window = on_window
+        self.window_timeout_s = window_timeout_s
+        self.max_open_windows = max_open_windows
+        self.devices: Dict[str, _DeviceState] = {}
+
+        # Counters
+        self.packets_received = 0
+        self.packets_malformed = 0
+        self.packets_duplicate = 0
+        self.packets_late = 0
+        self.packets_dropped = 0  # missing from windows evicted before completion
+        self.windows_completed = 0
+        self.windows_evicted = 0
+
+    def add_packet(self, device_id: str, data: bytes, now: Optional[float] = None):
+        self.packets_received += 1
+
+        if len(data) < HEADER.size:
+            self.packets_malformed += 1
+            return
+        window_id, _seq_id, start_index, chunk_length = HEADER.unpack_from(data)
+
+        # Validate against the protocol: aligned, in range, full payload present. A
+        # packet must fill its whole slot (only the window's last one may be shorter),
+        # otherwise a "complete" window would carry uninitialized samples.
+        if (
+            start_index % SAMPLES_PER_PACKET != 0
+            or start_index >= WINDOW_SAMPLES
+            or chunk_length != min(SAMPLES_PER_PACKET, WINDOW_SAMPLES - start_index)
+            or len(data) < HEADER.size + chunk_length * FLOAT32_LE.itemsize
+        ):
+            self.packets_malformed += 1
+            return
+
+        device = self.devices.get(device_id)
+        if device is None:
+            device = self.devices[device_id] = _DeviceState()
+
+        window = device.windows.get(window_id)
+        if window is None:
+            if window_id in device.closed:
+                self.packets_late += 1
+                return
+            if now is None:
+                now = time.monotonic()
+            if len(device.windows) >= self.max_open_windows:
+                oldest_id = min(device.windows, key=lambda wid: device.windows[wid].opened_at)
+                self._evict(device, oldest_id)
+            window = device.windows[window_id] = _WindowBuffer(now)
+
+        slot = start_index // SAMPLES_PER_PACKET
+        if window.received[slot]:
+            self.packets_duplicate += 1
+            return
+
+        window.samples[start_index:start_index + chunk_length] = np.frombuffer(
+            data, dtype=FLOAT32_LE, count=chunk_length, offset=HEADER.size
+        )
+        window.received[slot] = 1
+        window.packet_count += 1
+
+        if window.packet_count == PACKETS_PER_WINDOW:
+            device.close(window_id)
+            self.windows_completed += 1
+            self.on_window(device_id, window_id, window.samples)
+
+    def evict_stale(self, now: Optional[float] = None):
+        """Drops incomplete windows that have been open longer than the timeout."""
+        if now is None:
+            now = time.monotonic()
+        cutoff = now - self.window_timeout_s
+        for device in self.devices.values():
+            stale = [wid for wid, w in device.windows.items() if w.opened_at < cutoff]
+            for window_id in stale:
+                self._evict(device, window_id)
+
+    def _evict(self, device: _DeviceState, window_id: int):
+        window = device.windows[window_id]
+        self.packets_dropped += PACKETS_PER_WINDOW - window.packet_count
+        self.windows_evicted += 1
+        device.close(window_id)
+
+    def stats(self) -> dict:
+        return {
+            "devices": len(self.devices),
+            "open_windows": sum(len(d.windows) for d in self.devices.values()),
+            "packets_received": self.packets_received,
+            "packets_malformed": self.packets_malformed,
+            "packets_duplicate": self.packets_duplicate,
+            "packets_late": self.packets_late,
+            "packets_dropped": self.packets_dropped,
+            "windows_completed": self.windows_completed,
+            "windows_evicted": self.windows_evicted,
+        }
+
+
+class UDPIngestProtocol(asyncio.DatagramProtocol):
+    """asyncio datagram protocol feeding packets into a WindowAssembler (device id = source IP)."""
+
+    def __init__(self, assembler: WindowAssembler):
+        self.assembler = assembler
+
+    def datagram_received(self, data: bytes, addr):
+        self.assembler.add_packet(addr[0], data)
+
+    def error_received(self, exc):
+        print(f"❌ UDP ingest socket error: {exc}")
+
+
+class UDPIngestService:
+    """
+    Native UDP ingest: receives Pi packets, reassembles windows and hands
+    completed ones to `on_window` without any HTTP hop.
+    """
+
+    def __init__(
+        self,
+        on_window: Callable[[str, int, np.ndarray], None],
+        host: str = UDP_INGEST_HOST,
+        port: int = UDP_INGEST_PORT,
+        window_timeout_s: float = UDP_WINDOW_TIMEOUT_S,
+    ):
+        self.host = host
+        self.port = port
+        self.assembler = WindowAssembler(on_window, window_timeout_s=window_timeout_s)
+        self._transport = None
+        self._evict_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # A large kernel buffer absorbs bursts while the event loop is busy
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECV_BUFFER_BYTES)
+        sock.bind((self.host, self.port))
+        sock.setblocking(False)
+
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: UDPIngestProtocol(self.assembler), sock=sock
+        )
+        self._evict_task = asyncio.create_task(self._evict_loop())
+
+    async def stop(self):
+        if self._evict_task is not None:
+            self._evict_task.cancel()
+            try:
+                await self._evict_task
+            except asyncio.CancelledError:
+                pass
+            self._evict_task = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def _evict_loop(self):
+        interval = max(self.assembler.window_timeout_s / 4, 0.05)
+        while True:
+            await asyncio.sleep(interval)
+            self.assembler.evict_stale()
+
+    def stats(self) -> dict:
+        return {"host": self.host, "port": self.port, **self.assembler.stats()}
@@ -0,0 +1,510 @@
+"""
+Append-only archive of live windows and their predictions (optional, enabled
+with RECORD_DIR), so recorded traffic can become training data or be replayed
+against the service without capturing CSVs and re-running preprocess_data.py.
+
+Layout of an archive directory:
+  segment-000001.wseg        records, appended in arrival order
+  segment-000001.index.npz   per-window index of a closed segment
+  archive.json               closed segments: codec, window count, time range,
+                             devices, label counts, raw/stored bytes, write time
+
+Each record is RECORD_HEADER (magic, metadata length, payload length, CRC32 of
+the payload), a JSON metadata object (device, timestamp, label, confidence,
+samples) and the encoded samples, so an index can always be rebuilt by
+scanning a segment: that is how a segment left open by a crash is recovered
+(a torn last record is cut off) and how readers see the open segment.
+
+Codecs (RECORD_CODEC, stored per segment):
+  float16  float16, byte-shuffled, zlib level 1: ~2.4x smaller than float32,
+           max abs error ~2.4e-4 on normalized [-1, 1] windows
+  delta    lossless: differences of consecutive float32 bit patterns,
+           byte-shuffled, zlib level 1 (~1.2x on normalized windows)
+
+WindowRecorder encodes and writes on a background thread behind a bounded
+queue; when the disk cannot keep up windows are dropped (and counted) instead
+of delaying predictions. ArchiveReader selects windows by device, time range
+and label and decodes them from memory-mapped segments (train.py
+--archive-root, benchmarks/replay_archive.py).
+"""
+import glob
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# --- Recorder Configuration (override with environment variables) ---
+RECORD_DIR = os.environ.get("RECORD_DIR", "")                                   # empty = recorder off
+RECORD_CODEC = os.environ.get("RECORD_CODEC", "float16")                        # float16 or delta (lossless)
+RECORD_SEGMENT_MB = float(os.environ.get("RECORD_SEGMENT_MB", "256"))           # segment size before rolling over
+RECORD_SEGMENT_SECONDS = float(os.environ.get("RECORD_SEGMENT_SECONDS", "3600"))  # segment age before rolling over
+RECORD_QUEUE_WINDOWS = int(os.environ.get("RECORD_QUEUE_WINDOWS", "256"))       # windows waiting for the writer
+
+CODECS = ("float16", "delta")
+ZLIB_LEVEL = 1  # level 6 is ~2x slower for <2% smaller files on vibration windows
+ARCHIVE_MANIFEST = "archive.json"
+SEGMENT_SUFFIX = ".wseg"
+INDEX_SUFFIX = ".index.npz"
+RECORD_MAGIC = b"WREC"
+RECORD_HEADER = struct.Struct("<4sIII")  # magic, metadata bytes, payload bytes, CRC32 of the payload
+
+# One row per window, for closed and open segments alike
+WINDOW_DTYPE = np.dtype([
+    ("segment", np.int32),     # position in ArchiveReader.segments
+    ("offset", np.uint64),     # payload offset in the segment file
+    ("length", np.uint32),     # payload bytes
+    ("crc", np.uint32),
+    ("samples", np.uint32),
+    ("timestamp", np.float64),  # seconds since the epoch, when the prediction was made
+    ("device", np.int32),      # index into ArchiveReader.devices
+    ("label", np.int32),       # index into ArchiveReader.labels
+    ("confidence", np.float32),
+])
+
+
+class ArchiveError(Exception):
+    pass
+
+
+# --- Codecs ---
+def _shuffle(data: np.ndarray) -> bytes:
+    """Byte planes (all first bytes, then all second bytes, ...), so zlib sees similar bytes together."""
+    return np.ascontiguousarray(data.view(np.uint8).reshape(-1, data.itemsize).T).tobytes()
+
+
+def _unshuffle(buffer: bytes, dtype) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    planes = np.frombuffer(buffer, dtype=np.uint8).reshape(dtype.itemsize, -1)
+    return np.ascontiguousarray(planes.T).view(dtype).reshape(-1)
+
+
+def encode_samples(samples: np.ndarray, codec: str) -> bytes:
+    samples = np.ascontiguousarray(samples, dtype="<f4")
+    if codec == "float16":
+        data = samples.astype("<f2")
+    elif codec == "delta":
+        # int32 differences wrap around on overflow; the cumulative sum in decode_samples undoes that exactly
+        data = np.diff(samples.view("<i4"), prepend=np.int32(0)).astype("<i4", copy=False)
+    else:
+        raise ValueError(f"Unknown codec '{codec}'. Choose from: {', '.join(CODECS)}")
+    return zlib.compress(_shuffle(data), ZLIB_LEVEL)
+
+
+def decode_samples(payload, codec: str, out: Optional[np.ndarray] = None) -> np.ndarray:
+    if codec == "float16":
+        data = _unshuffle(zlib.decompress(payload), "<f2")
+    elif codec == "delta":
+        data = np.cumsum(_unshuffle(zlib.decompress(payload), "<i4"), dtype="<i4").view("<f4")
+    else:
+        raise ArchiveError(f"Unknown codec '{codec}'")
+    if out is None:
+        return data.astype(np.float32)
+    out[...] = data
+    return out
+
+
+# --- Manifest and segment indexes ---
+def load_manifest(directory: str) -> dict:
+    path = os.path.join(directory, ARCHIVE_MANIFEST)
+    if not os.path.exists(path):
+        return {"segments": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(directory: str, manifest: dict):
+    path = os.path.join(directory, ARCHIVE_MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+class _SegmentIndex:
+    """Index rows of one segment while it is written (or scanned), saved as <segment>.index.npz when closed."""
+
+    def __init__(self, codec: str):
+        self.codec = codec
+        self.offsets, self.lengths, self.crcs, self.samples = [], [], [], []
+        self.timestamps, self.confidences, self.devices, self.labels = [], [], [], []
+        self.raw_bytes = 0
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def add(self, offset: int, length: int, crc: int, meta: dict):
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.crcs.append(crc)
+        self.samples.append(meta["samples"])
+        self.timestamps.append(meta["timestamp"])
+        self.confidences.append(meta["confidence"])
+        self.devices.append(meta["device"])
+        self.labels.append(meta["label"])
+        self.raw_bytes += meta["samples"] * 4
+
+    def save(self, path: str):
+        device_names, device_codes = np.unique(np.array(self.devices, dtype=str), return_inverse=True)
+        label_names, label_codes = np.unique(np.array(self.labels, dtype=str), return_inverse=True)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, offset=np.array(self.offsets, dtype=np.uint64), length=np.array(self.lengths, dtype=np.uint32),
+                     crc=np.array(self.crcs, dtype=np.uint32), samples=np.array(self.samples, dtype=np.uint32),
+                     timestamp=np.array(self.timestamps, dtype=np.float64),
+                     confidence=np.array(self.confidences, dtype=np.float32),
+                     device=device_codes.astype(np.int32), device_names=device_names,
+                     label=label_codes.astype(np.int32), label_names=label_names, codec=np.array(self.codec))
+        os.replace(path + ".tmp", path)
+
+    def summary(self, name: str, stored_bytes: int, write_seconds: float) -> dict:
+        labels: Dict[str, int] = {}
+        for label in self.labels:
+            labels[label] = labels.get(label, 0) + 1
+        return {
+            "file": name + SEGMENT_SUFFIX,
+            "index": name + INDEX_SUFFIX,
+            "codec": self.codec,
+            "windows": len(self),
+            "start": min(self.timestamps) if self.timestamps else None,
+            "end": max(self.timestamps) if self.timestamps else None,
+            "devices": sorted(set(self.devices)),
+            "labels": labels,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": stored_bytes,
+            "compression_ratio": self.raw_bytes / stored_bytes if stored_bytes else None,
+            "write_s": write_seconds,
+            "write_mb_s": self.raw_bytes / write_seconds / 1e6 if write_seconds > 0 else None,
+        }
+
+
+def scan_segment(path: str) -> Tuple[_SegmentIndex, int]:
+    """Indexes a segment from its record headers. Returns the index and the end of the last complete record."""
+    index = None
+    end = 0
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        while end + RECORD_HEADER.size <= size:
+            f.seek(end)
+            magic, meta_len, payload_len, crc = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+            record_end = end + RECORD_HEADER.size + meta_len + payload_len
+            if magic != RECORD_MAGIC or record_end > size:
+                break
+            try:
+                meta = json.loads(f.read(meta_len))
+            except ValueError:
+                break
+            if index is None:
+                index = _SegmentIndex(meta["codec"])
+            index.add(end + RECORD_HEADER.size + meta_len, payload_len, crc, meta)
+            end = record_end
+    return index or _SegmentIndex(RECORD_CODEC), end
+
+
+# --- Writing ---
+class ArchiveWriter:
+    """
+    Appends windows to the current segment of `directory` (synchronously; see
+    WindowRecorder for the background writer). A segment is closed - index
+    written, summary added to archive.json - once it exceeds `segment_mb` or
+    `segment_seconds`, and on close(). Segments another writer left open are
+    recovered on start.
+    """
+
+    def __init__(self, directory: str, codec: str = RECORD_CODEC, segment_mb: float = RECORD_SEGMENT_MB,
+                 segment_seconds: float = RECORD_SEGMENT_SECONDS):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}'. Choose from: {', '.join(CODECS)}")
+        self.directory = directory
+        self.codec = codec
+        self.segment_bytes = int(segment_mb * 1e6)
+        self.segment_seconds = segment_seconds
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = load_manifest(directory)
+        self._recover()
+
+        self._file = None
+        self._name = None
+        self._index: Optional[_SegmentIndex] = None
+        self._opened_at = 0.0
+        self._write_seconds = 0.0
+
+    def _segment_names(self) -> List[str]:
+        return sorted(os.path.basename(p)[:-len(SEGMENT_SUFFIX)]
+                      for p in glob.glob(os.path.join(self.directory, "segment-*" + SEGMENT_SUFFIX)))
+
+    def _recover(self):
+        closed = {segment["file"] for segment in self.manifest["segments"]}
+        for name in self._segment_names():
+            if name + SEGMENT_SUFFIX in closed:
+                continue
+            path = os.path.join(self.directory, name + SEGMENT_SUFFIX)
+            index, end = scan_segment(path)
+            if not len(index):
+                os.remove(path)
+                continue
+            if end < os.path.getsize(path):
+                print(f"⚠️  Recorder: cutting a torn record off {name}{SEGMENT_SUFFIX}")
+                os.truncate(path, end)
+            index.save(os.path.join(self.directory, name + INDEX_SUFFIX))
+            self.manifest["segments"].append(index.summary(name, end, 0.0))
+            print(f"♻️  Recorder: recovered {len(index)} windows from {name}{SEGMENT_SUFFIX}")
+        save_manifest(self.directory, self.manifest)
+
+    def _open_segment(self):
+        names = self._segment_names()
+        number = int(names[-1].split("-")[1]) + 1 if names else 1
+        self._name = f"segment-{number:06d}"
+        self._file = open(os.path.join(self.directory, self._name + SEGMENT_SUFFIX), "ab")
+        self._index = _SegmentIndex(self.codec)
+        self._opened_at = time.time()
+        self._write_seconds = 0.0
+
+    def _close_segment(self) -> Optional[dict]:
+        if self._file is None:
+            return None
+        self._file.close()
+        stored = os.path.getsize(os.path.join(self.directory, self._name + SEGMENT_SUFFIX))
+        self._index.save(os.path.join(self.directory, self._name + INDEX_SUFFIX))
+        summary = self._index.summary(self._name, stored, self._write_seconds)
+        self.manifest["segments"].append(summary)
+        save_manifest(self.directory, self.manifest)
+        self._file = None
+        return summary
+
+    def append(self, samples: np.ndarray, device_id: str, timestamp: float, label: str, confidence: float):
+        started = time.perf_counter()
+        if self._file is not None and (self._file.tell() >= self.segment_bytes
+                                       or time.time() - self._opened_at >= self.segment_seconds):
+            self._close_segment()
+        if self._file is None:
+            self._open_segment()
+
+        payload = encode_samples(samples, self.codec)
+        crc = zlib.crc32(payload)
+        meta = {"device": device_id, "timestamp": timestamp, "label": label, "confidence": float(confidence),
+                "samples": int(len(samples)), "codec": self.codec}
+        meta_bytes = json.dumps(meta, separators=(",", ":")).encode()
+        offset = self._file.tell()
+        self._file.write(RECORD_HEADER.pack(RECORD_MAGIC, len(meta_bytes), len(payload), crc) + meta_bytes + payload)
+        self._index.add(offset + RECORD_HEADER.size + len(meta_bytes), len(payload), crc, meta)
+        self._write_seconds += time.perf_counter() - started
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> Optional[dict]:
+        """Closes the open segment; returns its summary (None if nothing was written)."""
+        return self._close_segment()
+
+    def open_segment_stats(self) -> Optional[dict]:
+        if self._file is None:
+            return None
+        return self._index.summary(self._name, self._file.tell(), self._write_seconds)
+
+
+class WindowRecorder:
+    """
+    Records predicted windows to an ArchiveWriter on a background thread.
+    `record` only copies the windows into a bounded queue, so the event loop
+    never waits for compression or the disk; windows that do not fit are
+    dropped and counted.
+    """
+
+    def __init__(self, directory: str = RECORD_DIR, codec: str = RECORD_CODEC, segment_mb: float = RECORD_SEGMENT_MB,
+                 segment_seconds: float = RECORD_SEGMENT_SECONDS, max_pending: int = RECORD_QUEUE_WINDOWS):
+        self.writer = ArchiveWriter(directory, codec, segment_mb, segment_seconds)
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._recorded = 0
+        self._dropped = 0
+        self._failed = 0
+        self._thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+        self._thread.start()
+
+    def record(self, windows: Sequence[np.ndarray], results: Sequence[dict], device_ids: Sequence[str]):
+        """Queues one completed batch (called on the event loop with every batch)."""
+        timestamp = time.time()
+        for samples, result, device_id in zip(windows, results, device_ids):
+            try:
+                # Copy now: the caller may reuse the window buffers once the batch is answered
+                self._queue.put_nowait((np.array(samples, dtype=np.float32), device_id, timestamp,
+                                        result["label"], result["confidence"]))
+            except queue.Full:
+                with self._lock:
+                    self._dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self.writer.append(*item)
+                with self._lock:
+                    self._recorded += 1
+            except Exception as e:
+                with self._lock:
+                    self._failed += 1
+                print(f"❌ Recorder write failed: {e}")
+            if self._queue.empty():
+                self.writer.flush()  # readers see the open segment once the burst is written
+        self.writer.close()
+
+    def stop(self, timeout: float = 10.0):
+        """Writes what is queued, closes the open segment and stops the writer thread."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {"windows_recorded": self._recorded, "windows_dropped": self._dropped,
+                      "windows_failed": self._failed}
+        segments = list(self.writer.manifest["segments"])
+        stored = sum(segment["stored_bytes"] for segment in segments)
+        raw = sum(segment["raw_bytes"] for segment in segments)
+        return {
+            "directory": self.writer.directory,
+            "codec": self.writer.codec,
+            "queue_depth": self._queue.qsize(),
+            **counts,
+            "closed_segments": segments,
+            "open_segment": self.writer.open_segment_stats(),
+            "disk_bytes": stored,
+            "compression_ratio": raw / stored if stored else None,
+        }
+
+
+# --- Reading ---
+class ArchiveReader:
+    """
+    Index of every window in an archive (closed segments from their .index.npz
+    files, segments still open - or left open by a crash - by scanning), with
+    selection by device, time range and label, and decoding from memory-mapped
+    segment files.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.manifest = load_manifest(directory)
+        if not self.manifest["segments"] and not glob.glob(os.path.join(directory, "*" + SEGMENT_SUFFIX)):
+            raise ArchiveError(f"No recorded segments in '{directory}'")
+        self.segments: List[dict] = []
+        self.devices: List[str] = []
+        self.labels: List[str] = []
+        self._maps: Dict[int, np.memmap] = {}
+
+        closed = {segment["file"] for segment in self.manifest["segments"]}
+        tables = []
+        for segment in self.manifest["segments"]:
+            with np.load(os.path.join(directory, segment["index"])) as index:
+                arrays = {name: index[name] for name in index.files}
+            tables.append(self._table(segment, arrays))
+        for path in sorted(glob.glob(os.path.join(directory, "segment-*" + SEGMENT_SUFFIX))):
+            name = os.path.basename(path)
+            if name not in closed:
+                index, _ = scan_segment(path)
+                if len(index):
+                    tables.append(self._table({"file": name, "codec": index.codec, "open": True}, {
+                        "offset": np.array(index.offsets, dtype=np.uint64), "length": index.lengths,
+                        "crc": index.crcs, "samples": index.samples, "timestamp": index.timestamps,
+                        "confidence": index.confidences,
+                        "device": np.arange(len(index)), "device_names": np.array(index.devices, dtype=str),
+                        "label": np.arange(len(index)), "label_names": np.array(index.labels, dtype=str),
+                    }))
+        self.windows = np.concatenate(tables) if tables else np.empty(0, dtype=WINDOW_DTYPE)
+
+    def _code(self, names: List[str], values: Iterable[str]) -> np.ndarray:
+        """Maps per-segment names onto archive-wide codes (extending `names`)."""
+        lookup = {name: i for i, name in enumerate(names)}
+        codes = []
+        for value in values:
+            if value not in lookup:
+                lookup[value] = len(names)
+                names.append(value)
+            codes.append(lookup[value])
+        return np.array(codes, dtype=np.int32)
+
+    def _table(self, segment: dict, arrays: dict) -> np.ndarray:
+        table = np.empty(len(arrays["offset"]), dtype=WINDOW_DTYPE)
+        table["segment"] = len(self.segments)
+        for field in ("offset", "length", "crc", "samples", "timestamp", "confidence"):
+            table[field] = arrays[field]
+        table["device"] = self._code(self.devices, arrays["device_names"].tolist())[arrays["device"]]
+        table["label"] = self._code(self.labels, arrays["label_names"].tolist())[arrays["label"]]
+        self.segments.append(segment)
+        return table
+
+    def __getstate__(self):
+        # Memory maps are reopened in each DataLoader worker instead of being pickled as copies
+        return {**self.__dict__, "_maps": {}}
+
+    def __len__(self):
+        return len(self.windows)
+
+    def select(self, devices: Optional[Sequence[str]] = None, labels: Optional[Sequence[str]] = None,
+               start: Optional[float] = None, end: Optional[float] = None) -> np.ndarray:
+        """Index rows (WINDOW_DTYPE) of the windows matching every given filter, in recording order."""
+        mask = np.ones(len(self.windows), dtype=bool)
+        if devices is not None:
+            mask &= np.isin(self.windows["device"], [self.devices.index(d) for d in devices if d in self.devices])
+        if labels is not None:
+            mask &= np.isin(self.windows["label"], [self.labels.index(l) for l in labels if l in self.labels])
+        if start is not None:
+            mask &= self.windows["timestamp"] >= start
+        if end is not None:
+            mask &= self.windows["timestamp"] < end
+        return self.windows[mask]
+
+    def _segment_map(self, segment: int) -> np.memmap:
+        if segment not in self._maps:
+            path = os.path.join(self.directory, self.segments[segment]["file"])
+            self._maps[segment] = np.memmap(path, dtype=np.uint8, mode="r")
+        return self._maps[segment]
+
+    def read_window(self, row, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Decodes one index row into a float32 window (CRC checked)."""
+        start = int(row["offset"])
+        payload = self._segment_map(int(row["segment"]))[start:start + int(row["length"])]
+        if zlib.crc32(payload) != int(row["crc"]):
+            raise ArchiveError(f"CRC mismatch in {self.segments[int(row['segment'])]['file']} at offset {start}")
+        return decode_samples(payload, self.segments[int(row["segment"])]["codec"], out)
+
+    def read(self, rows: np.ndarray) -> np.ndarray:
+        """[len(rows), samples] float32 (all rows must have the same number of samples)."""
+        out = np.empty((len(rows), int(rows["samples"][0]) if len(rows) else 0), dtype=np.float32)
+        for i, row in enumerate(rows):
+            self.read_window(row, out[i])
+        return out
+
+    def iter_batches(self, rows: np.ndarray, batch_size: int = 64) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """(windows, index rows) batches of `rows`, decoded one batch at a time."""
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            yield self.read(batch), batch
+
+    def device_of(self, row) -> str:
+        return self.devices[int(row["device"])]
+
+    def label_of(self, row) -> str:
+        return self.labels[int(row["label"])]
+
+    def describe(self) -> dict:
+        """Per-segment footprint and write throughput, as recorded in archive.json."""
+        segments = self.manifest["segments"]
+        raw = sum(segment["raw_bytes"] for segment in segments)
+        stored = sum(segment["stored_bytes"] for segment in segments)
+        return {
+            "windows": len(self),
+            "devices": list(self.devices),
+            "labels": {label: int(np.sum(self.windows["label"] == i)) for i, label in enumerate(self.labels)},
+            "segments": segments,
+            "open_segments": [segment["file"] for segment in self.segments if segment.get("open")],
+            "raw_bytes": raw,
+            "disk_bytes": stored,
+            "compression_ratio": raw / stored if stored else None,
+        }
@@ -0,0 +1,392 @@
+import asyncio
+import multiprocessing as mp
+import os
+import queue
+import threading
+import traceback
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from resampling import MAX_INPUT_SAMPLE_RATE, window_samples as rate_window_samples
+
+# --- Worker Pool Configuration (override with environment variables) ---
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "0"))  # 0 = run in-process
+INFERENCE_THREADS_PER_WORKER = int(os.environ.get("INFERENCE_THREADS_PER_WORKER", "0"))  # 0 = cores / workers
+WINDOW_SAMPLES = rate_window_samples(MAX_INPUT_SAMPLE_RATE)  # longest window the service accepts
+WORKER_CHECK_INTERVAL_S = 0.5  # how often the result reader checks that every worker is still alive
+
+_READY = "ready"
+_FAILED = "failed"
+
+
+def _worker_main(worker_id, shm_name, slot_shape, num_threads, model_dir, version,
+                 warmup_batch_sizes, warmup_passes, tasks, results):
+    """
+    Inference process: owns its own copy of the model and a fixed intra-op thread
+    budget, and reads input batches straight out of the shared-memory slots.
+    It only reports ready once the model is loaded and warmed up.
+    """
+    import torch
+    torch.set_num_threads(num_threads)
+    torch.set_num_interop_threads(1)
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = None
+    try:
+        slots = np.ndarray(slot_shape, dtype=np.float32, buffer=shm.buf)
+        try:
+            import ai_inference
+            ai_inference.load_model(model_dir=model_dir, version=version)
+            ai_inference.warm_up(warmup_batch_sizes, warmup_passes)
+        except Exception as e:
+            results.put((_FAILED, worker_id, f"{type(e).__name__}: {e}"))
+            return
+        results.put((_READY, worker_id, None))
+
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            task_id, slot, lengths = task
+            try:
+                timings = {}
+                if len(set(lengths)) == 1:
+                    windows = slots[slot, :len(lengths), :lengths[0]]
+                else:
+                    # Windows at different rates: classify_batch resamples each length group
+                    windows = [slots[slot, i, :length] for i, length in enumerate(lengths)]
+                predictions = ai_inference.classify_batch(windows, timings=timings)
+                results.put((task_id, slot, (predictions, timings)))
+            except Exception as e:
+                results.put((task_id, slot, RuntimeError(f"worker {worker_id}: {e}\n{traceback.format_exc()}")))
+    finally:
+        del slots
+        shm.close()
+
+
+class InferenceWorkerPool:
+    """
+    Runs inference in `num_workers` separate processes, each with its own model
+    copy and `threads_per_worker` torch threads, so throughput scales with cores
+    and a slow forward pass never blocks the API process's event loop.
+
+    Batches are handed over through preallocated shared-memory slots (one
+    [max_batch_size, window_samples] float32 buffer per slot, wide enough for
+    the longest window the service accepts, see resampling.MAX_INPUT_SAMPLE_RATE):
+    the API process copies the windows into a free slot and only sends (task id,
+    slot, window lengths) through the queue - no pickling of sample data. Only the small per-window result dicts
+    come back pickled. Use `run_batch` as the BatchScheduler runner.
+
+    Each worker owns `slots_per_worker` slots and has its own task queue, so
+    the pool knows which batches a worker holds. If a worker process dies, its
+    pending batches fail (the request path answers them with an error) and it
+    is respawned; its slots are handed out again once the new process is ready.
+
+    Every worker serves the model in `model_dir` (default: the registry's active
+    version, see ai_inference.load_model). To deploy another version, start a
+    second pool on it and swap the scheduler's runner; `stop` lets batches that
+    are already running on the old pool finish first.
+    """
+
+    def __init__(
+        self,
+        num_workers: int = INFERENCE_WORKERS,
+        threads_per_worker: int = INFERENCE_THREADS_PER_WORKER,
+        max_batch_size: int = 32,
+        slots_per_worker: int = 2,
+        window_samples: int = WINDOW_SAMPLES,
+        on_timings: Optional[Callable[[dict], None]] = None,
+        warmup_batch_sizes: Sequence[int] = (1,),
+        warmup_passes: int = 1,
+        model_dir: Optional[str] = None,
+        version: Optional[str] = None,
+    ):
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+        self.max_batch_size = max_batch_size
+        self.slots_per_worker = slots_per_worker
+        self.num_slots = num_workers * slots_per_worker
+        self.slot_shape = (self.num_slots, max_batch_size, window_samples)
+        self.on_timings = on_timings
+        self.warmup_batch_sizes = tuple(warmup_batch_sizes)
+        self.warmup_passes = warmup_passes
+        self.model_dir = model_dir
+        self.version = version
+
+        self._ctx = mp.get_context("spawn")  # fresh interpreters: no forked torch/thread state
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._slots: Optional[np.ndarray] = None
+        self._tasks: List = []  # one task queue per worker
+        self._results = None
+        self._processes: List[mp.Process] = []
+        self._free_slots: Optional[asyncio.Queue] = None
+        self._pending: Dict[int, Tuple[asyncio.Future, int]] = {}  # task id -> (future, slot)
+        self._up: Set[int] = set()                # workers ready to take batches
+        self._parked: Dict[int, List[int]] = {}   # slots of workers being respawned
+        self._load_failed: Set[int] = set()       # respawned workers that could not load the model
+        self._stopping = False
+        self._worker_deaths = 0
+        self._next_task_id = 0
+        self._active_calls = 0  # run_batch calls not finished yet (including those waiting for a slot)
+        self._reader: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # --- Lifecycle ---
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        nbytes = int(np.prod(self.slot_shape)) * np.dtype(np.float32).itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        try:
+            self._slots = np.ndarray(self.slot_shape, dtype=np.float32, buffer=self._shm.buf)
+            self._results = self._ctx.Queue()
+            self._tasks = [None] * self.num_workers
+            self._processes = [None] * self.num_workers
+            for worker_id in range(self.num_workers):
+                self._spawn(worker_id)
+            # Wait (off the event loop) until every worker has loaded and warmed up its model
+            await self._loop.run_in_executor(None, self._wait_until_ready)
+        except BaseException:
+            self._abort_start()
+            raise
+
+        self._up = set(range(self.num_workers))
+        self._free_slots = asyncio.Queue()
+        for slot in range(self.num_slots):
+            self._free_slots.put_nowait(slot)
+        self._reader = threading.Thread(target=self._read_results, name="inference-results", daemon=True)
+        self._reader.start()
+
+    def _spawn(self, worker_id: int):
+        """Starts the process of `worker_id` with a fresh task queue (a dead worker's may hold stale tasks)."""
+        tasks = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._shm.name, self.slot_shape, self.threads_per_worker,
+                  self.model_dir, self.version, self.warmup_batch_sizes, self.warmup_passes,
+                  tasks, self._results),
+            name=f"inference-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        self._tasks[worker_id] = tasks
+        self._processes[worker_id] = process
+
+    def _abort_start(self):
+        """Undoes a failed start(): terminates the workers spawned so far and releases queues and shared memory."""
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self._processes:
+            if process is not None:
+                process.join(timeout=10)
+        self._processes = []
+        for q in [*self._tasks, self._results]:
+            if q is not None:
+                q.close()
+                q.cancel_join_thread()
+        self._tasks = []
+        self._results = None
+        self._slots = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def _wait_until_ready(self, timeout: float = 300.0):
+        ready = 0
+        waited = 0.0
+        while ready < self.num_workers:
+            try:
+                kind, worker_id, error = self._results.get(timeout=WORKER_CHECK_INTERVAL_S)
+            except queue.Empty:
+                waited += WORKER_CHECK_INTERVAL_S
+                for process in self._processes:
+                    if not process.is_alive():
+                        raise RuntimeError(f"Inference worker {process.name} exited with code {process.exitcode} "
+                                           "while loading the model")
+                if waited >= timeout:
+                    raise RuntimeError("Inference workers did not become ready in time")
+                continue
+            if kind == _FAILED:
+                raise RuntimeError(f"Inference worker {worker_id} could not load the model: {error}")
+            if kind == _READY:
+                ready += 1
+                print(f"✅ Inference worker {worker_id} ready ({self.threads_per_worker} threads)")
+
+    async def stop(self, drain_timeout: float = 30.0):
+        if not self._processes:
+            return
+        self._stopping = True
+        # Let batches that were handed to this pool finish (e.g. after a model swap)
+        deadline = self._loop.time() + drain_timeout
+        while self._active_calls and self._loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        for tasks in self._tasks:
+            tasks.put(None)
+        self._results.put(None)  # wakes the reader thread
+        await self._loop.run_in_executor(None, self._join_processes)
+
+        for future, _ in self._pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError("Inference worker pool stopped"))
+        self._pending.clear()
+
+        self._slots = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def _join_processes(self):
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        if self._reader is not None:
+            self._reader.join(timeout=10)
+        # Release the queues' pipes and semaphores (pools are replaced on model swaps)
+        for q in [*self._tasks, self._results]:
+            q.close()
+            q.join_thread()
+
+    # --- Public API ---
+    async def run_batch(self, windows: Sequence[np.ndarray]) -> List[dict]:
+        """Copies up to `max_batch_size` windows into a free shared-memory slot and waits for their results."""
+        count = len(windows)
+        if count > self.max_batch_size:
+            raise ValueError(f"Batch of {count} windows exceeds slot size {self.max_batch_size}")
+        lengths = tuple(len(window) for window in windows)
+        if max(lengths, default=0) > self.slot_shape[2]:
+            raise ValueError(f"Window of {max(lengths)} samples exceeds slot width {self.slot_shape[2]}")
+
+        self._active_calls += 1
+        try:
+            slot = await self._acquire_slot()
+            try:
+                for i, window in enumerate(windows):
+                    self._slots[slot, i, :len(window)] = window
+                task_id = self._next_task_id
+                self._next_task_id += 1
+                future = self._loop.create_future()
+                self._pending[task_id] = (future, slot)
+                self._tasks[slot // self.slots_per_worker].put((task_id, slot, lengths))
+            except Exception:
+                self._release_slot(slot)
+                raise
+            # The slot is returned by _complete once the worker is done with it
+            return await future
+        finally:
+            self._active_calls -= 1
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "workers": self.num_workers,
+            "alive_workers": sum(p.is_alive() for p in self._processes),
+            "serving_workers": len(self._up),
+            "worker_deaths": self._worker_deaths,
+            "threads_per_worker": self.threads_per_worker,
+            "slots": self.num_slots,
+            "free_slots": self._free_slots.qsize() if self._free_slots is not None else 0,
+            "pending_batches": len(self._pending),
+        }
+
+    # --- Internals ---
+    async def _acquire_slot(self) -> int:
+        """A free slot of a worker that is up; slots of workers being respawned are set aside."""
+        while True:
+            if not self._up:
+                raise RuntimeError("No inference worker is running")
+            slot = await self._free_slots.get()
+            worker_id = slot // self.slots_per_worker
+            if worker_id in self._up:
+                return slot
+            if not self._up:
+                self._free_slots.put_nowait(slot)  # lets the other waiting calls fail as well
+                raise RuntimeError("No inference worker is running")
+            self._parked.setdefault(worker_id, []).append(slot)
+
+    def _release_slot(self, slot: int):
+        worker_id = slot // self.slots_per_worker
+        if worker_id in self._up or not self._up:
+            # (with no worker up at all, calls waiting for a slot must wake up and fail)
+            self._free_slots.put_nowait(slot)
+        else:
+            self._parked.setdefault(worker_id, []).append(slot)
+
+    def _read_results(self):
+        """Background thread: forwards worker results to the event loop and notices workers that died."""
+        reported = set()
+        while True:
+            try:
+                message = self._results.get(timeout=WORKER_CHECK_INTERVAL_S)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                return
+            if message:
+                handler = self._worker_started if message[0] in (_READY, _FAILED) else self._complete
+                self._loop.call_soon_threadsafe(handler, *message)
+            for worker_id, process in enumerate(list(self._processes)):
+                if process not in reported and not process.is_alive():
+                    reported.add(process)
+                    self._loop.call_soon_threadsafe(self._worker_died, worker_id, process)
+
+    def _complete(self, task_id, slot, result):
+        entry = self._pending.pop(task_id, None)
+        if entry is None:
+            return  # already failed because its worker died; the slot was handled then
+        future, _ = entry
+        self._release_slot(slot)
+        if future.done():
+            return
+        if isinstance(result, Exception):
+            future.set_exception(result)
+            return
+        predictions, timings = result
+        if self.on_timings is not None:
+            self.on_timings(timings)
+        future.set_result(predictions)
+
+    def _worker_died(self, worker_id: int, process: mp.Process):
+        """Fails the batches a dead worker held and respawns it (its slots stay parked until it is ready)."""
+        if self._stopping or process is not self._processes[worker_id]:
+            return
+        self._up.discard(worker_id)
+        self._worker_deaths += 1
+        error = RuntimeError(f"Inference worker {worker_id} exited with code {process.exitcode} during the batch")
+        for task_id, (future, slot) in list(self._pending.items()):
+            if slot // self.slots_per_worker == worker_id:
+                del self._pending[task_id]
+                self._release_slot(slot)
+                if not future.done():
+                    future.set_exception(error)
+        if worker_id in self._load_failed:
+            print(f"❌ Inference worker {worker_id} exited (code {process.exitcode}); not respawned, "
+                  "it could not load the model")
+            return
+
+        print(f"⚠️  Inference worker {worker_id} exited (code {process.exitcode}), respawning")
+        old_tasks = self._tasks[worker_id]
+        try:
+            self._spawn(worker_id)
+        except Exception as e:
+            print(f"❌ Could not respawn inference worker {worker_id}: {type(e).__name__}: {e}")
+            return
+        old_tasks.close()
+        old_tasks.cancel_join_thread()
+
+    def _worker_started(self, kind: str, worker_id: int, error: Optional[str]):
+        """A respawned worker finished loading: its parked slots are handed out again."""
+        if kind == _FAILED:
+            self._load_failed.add(worker_id)
+            print(f"❌ Respawned inference worker {worker_id} could not load the model: {error}")
+            return
+        self._load_failed.discard(worker_id)
+        self._up.add(worker_id)
+        for slot in self._parked.pop(worker_id, []):
+            self._free_slots.put_nowait(slot)
+        print(f"✅ Inference worker {worker_id} respawned ({self.threads_per_worker} threads)")
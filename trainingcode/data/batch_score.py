@@ -0,0 +1,399 @@
+"""
+Offline batch scoring: runs a trained model over archives of recordings and
+writes one row per window to a columnar file, plus a confusion matrix and
+per-class precision/recall for the windows whose class is known.
+
+Inputs (any mix, scanned recursively):
+  - chunk folders like secdatachunks/<class>/*.npy (one window per file)
+  - packed datasets (a folder with manifest.json, see preprocess_data.pack_chunks),
+    read through np.memmap
+  - .npy arrays of shape [num_samples] or [num_windows, num_samples]
+  - long CSV recordings, streamed in blocks and cut into consecutive windows
+    (same column rules as preprocess_data.py)
+
+Every window covers one second, so its length is its sample rate: chunks
+resampled by preprocess_data.py --sample-rate, packed datasets built from them
+and .npy windows at any supported rate are scored as they are, each batch
+holding windows of one length, and resampled to the model's rate like live
+requests (ai_inference.prepare_windows). CSV recordings are at the source rate.
+
+The class of a window is the folder it sits in (when that folder is named after
+a class, as in secdatachunks/ or the healthy/*.csv recordings), the packed
+manifest's label, or --label. Windows are read on a background thread while the
+model runs large batched forward passes on all cores (torch intra-op threads),
+and Parquet output is written in row groups as it goes, so memory stays bounded
+however much data is scored.
+
+Output columns: source, offset (first sample of the window in its source),
+label (-1 if unknown), predicted, confidence, p_<class> for every class.
+Written as Parquet when pyarrow is installed, otherwise as a compressed .npz
+with the same columns (see ColumnarWriter). Metrics go to <output>.metrics.json.
+
+Usage:
+    python batch_score.py secdatachunks --output scores.parquet
+    python batch_score.py /archive/2026-09 /archive/2026-10 --model-dir ../../ai-service \\
+        --backend onnxruntime --batch-size 128 --output sept_oct.parquet
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ai-service"))
+import ai_inference  # noqa: E402
+from preprocess_data import PACKED_MANIFEST, iter_chunks, iter_signal_blocks  # noqa: E402
+from resampling import (MAX_INPUT_SAMPLE_RATE, MIN_INPUT_SAMPLE_RATE, SOURCE_SAMPLE_RATE,  # noqa: E402
+                        window_rate, window_samples)
+
+DEFAULT_BATCH_SIZE = 64
+PREFETCH_BATCHES = 4
+ROW_GROUP_WINDOWS = 65536
+UNKNOWN_LABEL = -1
+CSV_WINDOW_SAMPLES = window_samples(SOURCE_SAMPLE_RATE)  # CSV recordings are at the sensors' rate
+
+
+# --- Window sources ---
+def _label_from_path(path, class_to_idx, default=UNKNOWN_LABEL):
+    """Class index of the folder a file sits in, if that folder is named after a class."""
+    return class_to_idx.get(os.path.basename(os.path.dirname(os.path.abspath(path))), default)
+
+def _check_window_samples(path, num_samples):
+    """ValueError unless `num_samples`-sample (one-second) windows are at a rate the model input can be resampled from."""
+    rate = window_rate(num_samples)
+    if not MIN_INPUT_SAMPLE_RATE <= rate <= MAX_INPUT_SAMPLE_RATE:
+        raise ValueError(f"{path}: windows of {num_samples} samples ({rate} Hz) are outside the supported "
+                         f"{MIN_INPUT_SAMPLE_RATE}-{MAX_INPUT_SAMPLE_RATE} Hz")
+
+def iter_npy_windows(path, label):
+    array = np.load(path, mmap_mode="r")
+    if array.ndim == 1:
+        array = array[np.newaxis, :]
+    if array.ndim != 2:
+        raise ValueError(f"{path}: expected [num_samples] or [N, num_samples] windows, got {array.shape}")
+    num_samples = array.shape[1]
+    _check_window_samples(path, num_samples)
+    for row in range(len(array)):
+        yield path, row * num_samples, label, array[row]
+
+def iter_csv_windows(path, label, num_samples=CSV_WINDOW_SAMPLES):
+    for index, window in enumerate(iter_chunks(iter_signal_blocks(path), num_samples)):
+        yield path, index * num_samples, label, window
+
+def iter_packed_windows(root, class_to_idx):
+    """Every split of a packed dataset; labels are mapped to the model's classes by name."""
+    with open(os.path.join(root, PACKED_MANIFEST)) as f:
+        manifest = json.load(f)
+    num_samples = manifest["window_samples"]
+    _check_window_samples(root, num_samples)
+    names = manifest["class_mapping"]
+    for split in manifest["splits"].values():
+        for shard in split["shards"]:
+            data = np.memmap(os.path.join(root, shard["data"]), dtype=np.float32, mode="r",
+                             shape=(shard["num_windows"], num_samples))
+            labels = np.load(os.path.join(root, shard["labels"]))
+            for row, window in enumerate(shard["windows"]):
+                label = class_to_idx.get(names[str(int(labels[row]))], UNKNOWN_LABEL)
+                yield window["source"], 0, label, data[row]
+
+def find_inputs(paths):
+    """Expands the command line into (kind, path) pairs in a stable order."""
+    for path in paths:
+        if os.path.isdir(path):
+            if os.path.exists(os.path.join(path, PACKED_MANIFEST)):
+                yield "packed", path
+                continue
+            for directory, subdirs, files in os.walk(path):
+                subdirs.sort()
+                if PACKED_MANIFEST in files:
+                    subdirs.clear()
+                    yield "packed", directory
+                    continue
+                for name in sorted(files):
+                    kind = os.path.splitext(name)[1].lower().lstrip(".")
+                    if kind in ("npy", "csv"):
+                        yield kind, os.path.join(directory, name)
+        else:
+            yield os.path.splitext(path)[1].lower().lstrip("."), path
+
+def iter_windows(paths, class_to_idx, label=None):
+    """(source, offset, label, window) for every window of every input."""
+    fixed_label = class_to_idx[label] if label is not None else None
+    for kind, path in find_inputs(paths):
+        if kind == "packed":
+            yield from iter_packed_windows(path, class_to_idx)
+            continue
+        path_label = fixed_label if fixed_label is not None else _label_from_path(path, class_to_idx)
+        try:
+            if kind == "npy":
+                yield from iter_npy_windows(path, path_label)
+            elif kind == "csv":
+                yield from iter_csv_windows(path, path_label)
+            else:
+                print(f"  Skipping {path}: unsupported file type")
+        except (OSError, ValueError) as e:
+            print(f"  Skipping {path}: {e}")
+
+class _PendingBatch:
+    __slots__ = ("sources", "offsets", "labels", "batch")
+
+    def __init__(self, batch_size, num_samples):
+        self.sources, self.offsets, self.labels = [], [], []
+        self.batch = np.empty((batch_size, num_samples), dtype=np.float32)
+
+    def add(self, source, offset, label, window):
+        self.batch[len(self.sources)] = window
+        self.sources.append(source)
+        self.offsets.append(offset)
+        self.labels.append(label)
+
+    def columns(self):
+        return (self.sources, np.array(self.offsets, dtype=np.int64), np.array(self.labels, dtype=np.int16),
+                self.batch[:len(self.sources)])
+
+def iter_batches(windows, batch_size):
+    """
+    Groups windows into ([B] sources, [B] offsets, [B] labels, [B, L] float32
+    batch); every batch holds windows of one length L (one sample rate).
+    """
+    pending = {}  # window length -> batch being filled
+    for source, offset, label, window in windows:
+        current = pending.get(len(window))
+        if current is None:
+            current = pending[len(window)] = _PendingBatch(batch_size, len(window))
+        current.add(source, offset, label, window)
+        if len(current.sources) == batch_size:
+            yield current.columns()
+            del pending[len(window)]
+    for current in pending.values():
+        yield current.columns()
+
+def prefetch(iterator, depth=PREFETCH_BATCHES):
+    """Runs `iterator` on a background thread, keeping up to `depth` items ready."""
+    items = queue.Queue(maxsize=depth)
+    done = object()
+    failure = []
+
+    def produce():
+        try:
+            for item in iterator:
+                items.put(item)
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            items.put(done)
+
+    threading.Thread(target=produce, name="batch-score-reader", daemon=True).start()
+    while True:
+        item = items.get()
+        if item is done:
+            if failure:
+                raise failure[0]
+            return
+        yield item
+
+
+# --- Output ---
+class ColumnarWriter:
+    """
+    Appends column batches to a Parquet file (one row group per
+    ROW_GROUP_WINDOWS rows) or, without pyarrow, collects them for a compressed
+    .npz written on close. In the .npz the source column is stored as
+    `source` (int32 index per row) plus a `sources` table of paths, so the
+    rows held until close stay a few dozen bytes each.
+    """
+
+    def __init__(self, path, class_names):
+        self.class_names = class_names
+        self.rows = 0
+        self._pending = []
+        self._pending_rows = 0
+        self._parquet = None
+        self._source_ids = {}
+        if path.endswith(".parquet"):
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                path = os.path.splitext(path)[0] + ".npz"
+                print(f"pyarrow is not installed; writing {path} instead")
+        self.path = path
+        self.format = "parquet" if path.endswith(".parquet") else "npz"
+
+    def write(self, sources, offsets, labels, probabilities):
+        if self.format == "npz":
+            source = np.array([self._source_ids.setdefault(name, len(self._source_ids)) for name in sources],
+                              dtype=np.int32)
+        else:
+            source = np.array(sources)
+        columns = {
+            "source": source,
+            "offset": offsets,
+            "label": labels,
+            "predicted": probabilities.argmax(axis=1).astype(np.int16),
+            "confidence": probabilities.max(axis=1),
+        }
+        for i, name in enumerate(self.class_names):
+            columns[f"p_{name}"] = probabilities[:, i]
+        self._pending.append(columns)
+        self._pending_rows += len(offsets)
+        self.rows += len(offsets)
+        if self.format == "parquet" and self._pending_rows >= ROW_GROUP_WINDOWS:
+            self._flush_row_group()
+
+    def _merged(self):
+        return {name: np.concatenate([part[name] for part in self._pending]) for name in self._pending[0]}
+
+    def _flush_row_group(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self._pending:
+            return
+        table = pa.table(self._merged())
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(self.path, table.schema, compression="zstd")
+        self._parquet.write_table(table)
+        self._pending, self._pending_rows = [], 0
+
+    def close(self):
+        if self.format == "parquet":
+            self._flush_row_group()
+            if self._parquet is not None:
+                self._parquet.close()
+        elif self._pending:
+            np.savez_compressed(self.path, sources=np.array(list(self._source_ids)), **self._merged())
+        self._pending = []
+
+
+# --- Metrics ---
+def classification_report(confusion, class_names):
+    """Accuracy and per-class precision/recall/F1/support from a [true, predicted] confusion matrix."""
+    true_positive = np.diag(confusion).astype(np.float64)
+    predicted = confusion.sum(axis=0)
+    support = confusion.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, true_positive / predicted, np.nan)
+        recall = np.where(support > 0, true_positive / support, np.nan)
+        f1 = 2 * precision * recall / (precision + recall)
+    total = int(confusion.sum())
+    return {
+        "labeled_windows": total,
+        "accuracy": float(true_positive.sum() / total) if total else None,
+        "classes": class_names,
+        "confusion_matrix": confusion.tolist(),  # rows: true class, columns: predicted class
+        "per_class": {
+            name: {
+                "precision": None if np.isnan(precision[i]) else float(precision[i]),
+                "recall": None if np.isnan(recall[i]) else float(recall[i]),
+                "f1": None if np.isnan(f1[i]) else float(f1[i]),
+                "support": int(support[i]),
+            }
+            for i, name in enumerate(class_names)
+        },
+    }
+
+def print_report(report):
+    names = report["classes"]
+    if not report["labeled_windows"]:
+        print("No labeled windows: confusion matrix and precision/recall skipped")
+        return
+    width = max(10, max(len(name) for name in names) + 2)
+    print(f"\nConfusion matrix ({report['labeled_windows']} labeled windows, rows = true class):")
+    print(" " * width + "".join(f"{name:>{width}}" for name in names))
+    for name, row in zip(names, report["confusion_matrix"]):
+        print(f"{name:<{width}}" + "".join(f"{count:>{width}}" for count in row))
+
+    def fmt(value):
+        return f"{value:>10.4f}" if value is not None else f"{'-':>10}"
+
+    print(f"\n{'class':<{width}}{'precision':>10}{'recall':>10}{'f1':>10}{'support':>10}")
+    for name in names:
+        stats = report["per_class"][name]
+        print(f"{name:<{width}}{fmt(stats['precision'])}{fmt(stats['recall'])}{fmt(stats['f1'])}"
+              f"{stats['support']:>10}")
+    print(f"\nAccuracy: {report['accuracy']:.4f}")
+
+
+# --- Scoring ---
+def score(paths, output, model_dir=".", backend=ai_inference.INFERENCE_BACKEND, batch_size=DEFAULT_BATCH_SIZE,
+          label=None, threads=None):
+    """Scores every window under `paths` and returns the metrics report (also saved next to `output`)."""
+    if threads:
+        torch.set_num_threads(threads)
+    model = ai_inference.build_model(model_dir, backend, cascade=False)
+    class_names = [model.class_mapping[i] for i in sorted(model.class_mapping)]
+    class_to_idx = {name: i for i, name in enumerate(class_names)}
+    if label is not None and label not in class_to_idx:
+        raise ValueError(f"--label must be one of {class_names}")
+    print(f"Scoring with '{model.backend.name}' model from {model_dir} ({len(class_names)} classes, "
+          f"{model.sample_rate} Hz input), batch size {batch_size}, {torch.get_num_threads()} threads")
+
+    writer = ColumnarWriter(output, class_names)
+    confusion = np.zeros((len(class_names), len(class_names)), dtype=np.int64)
+    started = time.perf_counter()
+    forward_seconds = 0.0
+    last_report = started
+
+    batches = iter_batches(iter_windows(paths, class_to_idx, label), batch_size)
+    try:
+        for sources, offsets, labels, batch in prefetch(batches):
+            forward_start = time.perf_counter()
+            probabilities = ai_inference.predict_probabilities(batch, model)
+            forward_seconds += time.perf_counter() - forward_start
+
+            writer.write(sources, offsets, labels, probabilities)
+            known = labels != UNKNOWN_LABEL
+            if known.any():
+                predicted = probabilities[known].argmax(axis=1)
+                confusion += np.bincount(labels[known].astype(np.int64) * len(class_names) + predicted,
+                                         minlength=confusion.size).reshape(confusion.shape)
+
+            now = time.perf_counter()
+            if now - last_report >= 10:
+                print(f"  {writer.rows:,} windows, {writer.rows / (now - started):.1f} windows/s")
+                last_report = now
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    report = classification_report(confusion, class_names)
+    report.update({
+        "model_dir": os.path.abspath(model_dir),
+        "backend": model.backend.name,
+        "windows": writer.rows,
+        "seconds": elapsed,
+        "windows_per_second": writer.rows / elapsed if elapsed else None,
+        "forward_seconds": forward_seconds,
+        "output": writer.path,
+    })
+    with open(writer.path + ".metrics.json", "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nScored {writer.rows:,} windows in {elapsed:.1f}s ({report['windows_per_second'] or 0:.1f} windows/s, "
+          f"{forward_seconds:.1f}s in the model) -> {writer.path}")
+    print_report(report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="chunk folders, packed datasets, .npy or .csv files")
+    parser.add_argument("--output", default="scores.parquet", help=".parquet (needs pyarrow) or .npz")
+    parser.add_argument("--model-dir", default=".", help="folder with fault_detector.pt and class_mapping.txt "
+                                                         "(e.g. a model registry version)")
+    parser.add_argument("--backend", default=ai_inference.INFERENCE_BACKEND, choices=sorted(ai_inference.BACKENDS))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--label", default=None, help="class of every input window (overrides folder names)")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads (default: one per physical core)")
+    args = parser.parse_args()
+
+    score(args.inputs, args.output, args.model_dir, args.backend, args.batch_size, args.label, args.threads)
+
+
+if __name__ == "__main__":
+    main()
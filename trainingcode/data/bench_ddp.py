@@ -0,0 +1,75 @@
+"""
+Data-parallel training scaling benchmark: seconds per epoch of train_model with
+1, 2, 4 and 8 processes (torchrun, gloo, cores split evenly between processes).
+
+Each configuration is a separate torchrun launch of this script in --worker
+mode; rank 0 writes the epoch history to a JSON file that the parent collects.
+The batch size is per process, so N processes take N times fewer optimizer
+steps per epoch. The first epoch includes the process-group and cache setup
+and is reported separately.
+
+Usage:
+    python bench_ddp.py --epochs 3
+    python bench_ddp.py --processes 1 2 4 --data-root secdatachunks --epochs 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+
+def worker(args):
+    from train import train_model
+
+    history = train_model(data_root=args.data_root, epochs=args.epochs, batch_size=args.batch_size,
+                          num_workers=0, export=False)
+    if int(os.environ.get("RANK", "0")) == 0:
+        with open(args.output, "w") as f:
+            json.dump(history, f)
+
+
+def launch(processes, args, output):
+    command = [sys.executable, "-m", "torch.distributed.run", "--standalone", f"--nproc_per_node={processes}",
+               os.path.abspath(__file__), "--worker", "--output", output, "--data-root", args.data_root,
+               "--epochs", str(args.epochs), "--batch-size", str(args.batch_size)]
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL,
+                   env=dict(os.environ, OMP_NUM_THREADS=str(max(1, (os.cpu_count() or 1) // processes))))
+    with open(output) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-root", default="secdatachunks")
+    parser.add_argument("--processes", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=16, help="per process")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker(args)
+
+    cores = os.cpu_count() or 1
+    print(f"\n{cores} cores, batch size {args.batch_size} per process, {args.epochs} epochs")
+    print(f"{'processes':>9} {'threads/proc':>13} {'1st epoch s':>12} {'epoch s (rest)':>15} "
+          f"{'val acc':>8} {'speedup':>8} {'efficiency':>11}")
+
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for processes in args.processes:
+            history = launch(processes, args, os.path.join(tmp, f"history_{processes}.json"))
+            seconds = [epoch["seconds"] for epoch in history]
+            steady = float(np.mean(seconds[1:])) if len(seconds) > 1 else seconds[0]
+            baseline = baseline or steady  # speedup is relative to the first configuration
+            speedup = baseline / steady
+            print(f"{processes:>9} {max(1, cores // processes):>13} {seconds[0]:>12.2f} {steady:>15.2f} "
+                  f"{history[-1]['val_acc']:>8.4f} {speedup:>7.2f}x {speedup * args.processes[0] / processes:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Training input benchmark: per-file VibrationDataset (np.load per sample)
+versus PackedVibrationDataset (np.memmap'ed shards).
+
+Usage:
+    python preprocess_data.py --pack-only      # once, writes packed/
+    python bench_loader.py --epochs 3
+Numbers are with a warm page cache; drop caches first for a cold-read comparison.
+"""
+import argparse
+import time
+
+import torch
+from torch.utils.data import ConcatDataset, DataLoader
+
+from train import PackedVibrationDataset, VibrationDataset
+
+
+def samples_per_second(dataset, epochs, batch_size=None):
+    """Reads every sample `epochs` times, directly or through a shuffling DataLoader."""
+    start = time.perf_counter()
+    count = 0
+    for _ in range(epochs):
+        if batch_size is None:
+            for i in range(len(dataset)):
+                dataset[i]
+                count += 1
+        else:
+            loader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
+            for signals, _ in loader:
+                count += signals.size(0)
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-root", default="secdatachunks")
+    parser.add_argument("--packed-root", default="packed")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    per_file = VibrationDataset(args.data_root)
+    packed = ConcatDataset([
+        PackedVibrationDataset(args.packed_root, split="train"),
+        PackedVibrationDataset(args.packed_root, split="val"),
+    ])
+    assert len(per_file) == len(packed), "packed/ is out of date, re-run preprocess_data.py --pack-only"
+
+    torch.manual_seed(0)
+    print(f"\n{len(per_file)} windows, {args.epochs} epochs")
+    print(f"{'loader':<22} {'__getitem__ samples/s':>22} {'DataLoader samples/s':>22}")
+    for name, dataset in (("per-file np.load", per_file), ("packed np.memmap", packed)):
+        direct = samples_per_second(dataset, args.epochs)
+        batched = samples_per_second(dataset, args.epochs, args.batch_size)
+        print(f"{name:<22} {direct:>22,.0f} {batched:>22,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Training input pipeline benchmark: time per epoch with the original loader
+(DataLoader over VibrationDataset, no workers) versus input_pipeline.py's
+streaming DataLoader (workers + prefetch), in-memory cache, and cache with
+batched augmentation.
+
+By default an epoch only draws every batch (input pipeline cost alone); with
+--train each batch also runs a forward/backward/optimizer step of ImprovedCNN,
+which is what train_model's epochs actually cost.
+
+Usage:
+    python bench_pipeline.py --epochs 3
+    python bench_pipeline.py --epochs 2 --train --workers 4
+"""
+import argparse
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader
+
+from input_pipeline import DEFAULT_NUM_WORKERS, BatchAugment, make_loader
+from train import ImprovedCNN, VibrationDataset
+
+PIPELINES = ("current", "stream", "cache", "cache+augment")
+
+
+def build_loader(name, dataset, batch_size, workers):
+    if name == "current":
+        return DataLoader(dataset, batch_size=batch_size, shuffle=True)
+    return make_loader(dataset, batch_size, shuffle=True, cache=name != "stream", num_workers=workers)
+
+
+def run_epochs(loader, epochs, augment=None, model=None):
+    """Seconds per epoch (and seconds spent waiting for batches) over `epochs` passes."""
+    if model is not None:
+        criterion = nn.CrossEntropyLoss()
+        optimizer = torch.optim.Adam(model.parameters(), lr=0.0005)
+        model.train()
+    epoch_times, data_times = [], []
+    for _ in range(epochs):
+        start = fetch_start = time.perf_counter()
+        data_time = 0.0
+        for signals, labels in loader:
+            if augment is not None:
+                signals = augment(signals)
+            data_time += time.perf_counter() - fetch_start
+            if model is not None:
+                optimizer.zero_grad()
+                loss = criterion(model(signals), labels)
+                loss.backward()
+                optimizer.step()
+            fetch_start = time.perf_counter()
+        epoch_times.append(time.perf_counter() - start)
+        data_times.append(data_time)
+    return epoch_times, data_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-root", default="secdatachunks")
+    parser.add_argument("--pipelines", nargs="+", choices=PIPELINES, default=list(PIPELINES))
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=DEFAULT_NUM_WORKERS)
+    parser.add_argument("--train", action="store_true", help="include a training step per batch")
+    args = parser.parse_args()
+
+    dataset = VibrationDataset(args.data_root)
+    print(f"\n{len(dataset)} windows, batch size {args.batch_size}, {args.epochs} epochs, "
+          f"{args.workers} workers, {'training step per batch' if args.train else 'input pipeline only'}")
+    print(f"{'pipeline':<15} {'setup s':>8} {'1st epoch s':>12} {'epoch s (rest)':>15} "
+          f"{'waiting for data s':>19} {'speedup':>8}")
+
+    baseline = None
+    for name in args.pipelines:
+        torch.manual_seed(0)
+        setup_start = time.perf_counter()
+        loader = build_loader(name, dataset, args.batch_size, args.workers)
+        setup = time.perf_counter() - setup_start
+        augment = BatchAugment() if name.endswith("augment") else None
+        model = ImprovedCNN(num_classes=len(dataset.class_to_idx)) if args.train else None
+
+        epoch_times, data_times = run_epochs(loader, args.epochs, augment, model)
+        steady = float(np.mean(epoch_times[1:])) if len(epoch_times) > 1 else epoch_times[0]
+        baseline = baseline or steady
+        print(f"{name:<15} {setup:>8.2f} {epoch_times[0]:>12.2f} {steady:>15.2f} "
+              f"{np.mean(data_times):>19.2f} {baseline / steady:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
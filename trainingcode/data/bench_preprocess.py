@@ -0,0 +1,115 @@
+"""
+Preprocessing benchmark on a synthetic multi-GB ADC capture.
+
+Writes a CSV with the Pi logger's columns (Sample, Time_ms, Voltage_V), then
+slices it in a fresh subprocess per mode and reports wall time, throughput and
+peak RSS. Streaming mode should keep peak RSS roughly constant as --size-gb
+grows; the in-memory mode grows with the file (and may not fit at all).
+
+Usage:
+    python bench_preprocess.py --size-gb 2
+    python bench_preprocess.py --size-gb 2 --modes streaming in-memory
+"""
+import argparse
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import preprocess_data
+
+SCRIPT = os.path.abspath(__file__)
+BLOCK_ROWS_TEMPLATE = 1_000_000  # rows formatted once and repeated to reach the target size
+
+
+def write_synthetic_csv(path, size_bytes, sample_rate=preprocess_data.SAMPLE_RATE):
+    """Writes a CSV of roughly `size_bytes`; one formatted block of rows is repeated."""
+    rng = np.random.default_rng(0)
+    n = np.arange(BLOCK_ROWS_TEMPLATE)
+    t = n / sample_rate
+    voltage = 1.75 + 0.1 * np.sin(2 * np.pi * 50 * t) + 0.01 * rng.standard_normal(len(n))
+    block = "".join(
+        f"{i},{ms:.4f},{v:.6f}\n" for i, ms, v in zip(n, t * 1000.0, voltage)
+    ).encode()
+
+    written = 0
+    with open(path, "wb") as f:
+        f.write(b"Sample,Time_ms,Voltage_V\n")
+        while written < size_bytes:
+            f.write(block)
+            written += len(block)
+    return os.path.getsize(path)
+
+
+def run_worker(mode, csv_path, output_dir, block_rows):
+    """Runs one preprocessing mode in this process and prints its stats."""
+    preprocess_data.SOURCE_FILES = {"synthetic": csv_path}
+    preprocess_data.OUTPUT_DIRECTORY = output_dir
+
+    start = time.perf_counter()
+    if mode == "streaming":
+        preprocess_data.slice_and_save_streaming(block_rows)
+    else:
+        preprocess_data.slice_and_save_data()
+    elapsed = time.perf_counter() - start
+
+    chunks = len(os.listdir(os.path.join(output_dir, "synthetic")))
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KB on Linux
+    print(f"RESULT {elapsed:.3f} {chunks} {peak_rss_mb:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-gb", type=float, default=2.0)
+    parser.add_argument("--block-rows", type=int, default=preprocess_data.STREAM_BLOCK_ROWS)
+    parser.add_argument("--modes", nargs="+", choices=["streaming", "in-memory"], default=["streaming"])
+    parser.add_argument("--workdir", default=None, help="where to put the CSV (default: a temp dir)")
+    parser.add_argument("--worker", nargs=3, metavar=("MODE", "CSV", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(*args.worker, args.block_rows)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench_preprocess_", dir=args.workdir)
+    try:
+        csv_path = os.path.join(workdir, "capture.csv")
+        print(f"Writing synthetic CSV ({args.size_gb:.1f} GB)...")
+        size = write_synthetic_csv(csv_path, int(args.size_gb * 1e9))
+
+        results = []
+        for mode in args.modes:
+            output_dir = os.path.join(workdir, f"out_{mode}")
+            proc = subprocess.run(
+                [sys.executable, SCRIPT, "--block-rows", str(args.block_rows),
+                 "--worker", mode, csv_path, output_dir],
+                capture_output=True, text=True,
+            )
+            line = next((l for l in proc.stdout.splitlines() if l.startswith("RESULT ")), None)
+            if proc.returncode != 0 or line is None:
+                results.append((mode, None))
+                print(f"  {mode}: failed (exit code {proc.returncode}) {proc.stderr.strip()[-200:]}")
+                continue
+            elapsed, chunks, rss = line.split()[1:]
+            results.append((mode, (float(elapsed), int(chunks), float(rss))))
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+        print(f"\nCSV size: {size / 1e9:.2f} GB, block size: {args.block_rows:,} rows")
+        print(f"{'mode':<12} {'seconds':>9} {'MB/s':>8} {'chunks':>8} {'peak RSS MB':>12}")
+        for mode, r in results:
+            if r is None:
+                print(f"{mode:<12} {'failed':>9}")
+                continue
+            elapsed, chunks, rss = r
+            print(f"{mode:<12} {elapsed:>9.1f} {size / 1e6 / elapsed:>8.1f} {chunks:>8} {rss:>12.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
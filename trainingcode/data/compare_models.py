@@ -0,0 +1,111 @@
+"""
+Compares the baseline fault detector with the compact variants of
+ai-service/model_variants.py: parameters, MACs per window, serialized size,
+CPU latency (batch 1 p50/p99) and throughput (windows/s at --batch-size) of the
+BatchNorm-folded TorchScript module the service would load (for the spectral
+model including its front end; MACs exclude the FFTs), and, with
+--epochs > 0, validation accuracy after training each variant with train_model
+(compact variants distilled from --teacher when given).
+
+At one window per device per second, windows/s is also the number of devices
+one inference process can keep up with.
+
+Usage:
+    python compare_models.py                                    # cost only
+    python compare_models.py --epochs 10 --teacher ../../ai-service/model_registry/<version>
+"""
+import argparse
+import io
+import time
+
+import torch
+
+from train import build_network, fold_batchnorm, train_model
+from model_variants import (ARCHITECTURES, BASELINE_ARCHITECTURE, SPECTRAL_ARCHITECTURE,  # ai-service/, via train
+                            count_macs, count_parameters)
+from spectral import SpectralFrontEnd
+from quantize import WINDOW_SAMPLES, latency_ms
+
+
+def serving_module(model, num_samples=WINDOW_SAMPLES):
+    """Traced + frozen TorchScript of the BatchNorm-folded model, as train.py exports it."""
+    fused = fold_batchnorm(model)
+    example = torch.zeros((1,) + tuple(getattr(model, "input_shape", (1, num_samples))))
+    with torch.no_grad():
+        return torch.jit.freeze(torch.jit.trace(fused, example))
+
+class WithFrontEnd:
+    """[B, 1, L] windows -> spectral features -> module, the way ai_inference runs spectral models."""
+
+    def __init__(self, front_end, module):
+        self.front_end = front_end
+        self.module = module
+
+    def __call__(self, x):
+        return self.module(self.front_end.torch_features(x[:, 0]))
+
+def serialized_size_mb(module):
+    buffer = io.BytesIO()
+    torch.jit.save(module, buffer)
+    return buffer.getbuffer().nbytes / 1e6
+
+def throughput(module, batch_size, repeats=5, num_samples=WINDOW_SAMPLES):
+    x = torch.randn(batch_size, 1, num_samples)
+    with torch.no_grad():
+        module(x)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            module(x)
+    return batch_size * repeats / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--architectures", nargs="+", choices=ARCHITECTURES, default=list(ARCHITECTURES))
+    parser.add_argument("--num-classes", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32, help="batch size of the throughput measurement")
+    parser.add_argument("--latency-repeats", type=int, default=50)
+    parser.add_argument("--data-root", default="secdatachunks")
+    parser.add_argument("--epochs", type=int, default=0, help="train each variant this long (0 = cost only)")
+    parser.add_argument("--train-batch-size", type=int, default=16)
+    parser.add_argument("--teacher", default=None, help="distill the compact variants from this trained model")
+    args = parser.parse_args()
+
+    rows = []
+    for architecture in args.architectures:
+        torch.manual_seed(0)
+        model = build_network(architecture, args.num_classes).eval()
+        module = serving_module(model)
+        pipeline = WithFrontEnd(SpectralFrontEnd(), module) if architecture == SPECTRAL_ARCHITECTURE else module
+        p50, p99 = latency_ms(pipeline, batch_size=1, repeats=args.latency_repeats)
+        row = {
+            "architecture": architecture,
+            "parameters": count_parameters(model),
+            "macs": count_macs(model),
+            "size_mb": serialized_size_mb(module),
+            "p50": p50,
+            "p99": p99,
+            "windows_s": throughput(pipeline, args.batch_size),
+            "val_acc": None,
+        }
+        if args.epochs > 0:
+            teacher = args.teacher if architecture != BASELINE_ARCHITECTURE else None
+            print(f"\nTraining {architecture}" + (f" (distilled from {teacher})" if teacher else "") + "...")
+            history = train_model(args.data_root, epochs=args.epochs, batch_size=args.train_batch_size,
+                                  architecture=architecture, teacher_dir=teacher, export=False)
+            row["val_acc"] = history[-1]["val_acc"]
+        rows.append(row)
+
+    baseline = rows[0]
+    print(f"\n{torch.get_num_threads()} threads, latency at batch size 1, throughput at batch size {args.batch_size}")
+    print(f"{'architecture':<16} {'params':>10} {'MMACs':>8} {'size MB':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'windows/s':>10} {'speedup':>8} {'val acc':>8}")
+    for row in rows:
+        val_acc = f"{row['val_acc']:>8.4f}" if row["val_acc"] is not None else f"{'-':>8}"
+        print(f"{row['architecture']:<16} {row['parameters']:>10,} {row['macs'] / 1e6:>8.0f} {row['size_mb']:>8.2f} "
+              f"{row['p50']:>8.2f} {row['p99']:>8.2f} {row['windows_s']:>10.1f} "
+              f"{row['windows_s'] / baseline['windows_s']:>7.1f}x {val_acc}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Multi-process (torch.distributed, gloo) training support and resumable checkpoints for train.py.
+
+Launch train.py with torchrun to train data-parallel across the cores of one
+machine or several:
+
+    torchrun --standalone --nproc_per_node=4 train.py --checkpoint-dir checkpoints
+    torchrun --nnodes=2 --node_rank=0 --nproc_per_node=8 \
+             --master_addr=10.0.0.1 --master_port=29500 train.py ...   # on each machine
+
+Every process holds a model replica and trains on its own DistributedSampler
+shard; gradients are averaged with all-reduce (DistributedDataParallel). The
+cores of a machine are split evenly between its processes so they do not
+oversubscribe. Without torchrun everything runs in a single process as before.
+
+Checkpoints hold the model, optimizer, StepLR scheduler, completed epoch,
+metric history and the RNG state of every process (torch, numpy, random), so a
+resumed run continues exactly where the interrupted one stopped.
+"""
+import os
+import random
+import time
+from typing import Optional
+
+import numpy as np
+import torch
+import torch.distributed as dist
+
+CHECKPOINT_FILE = "checkpoint.pt"
+
+
+class DistributedContext:
+    """Rank/world size of this process (rank 0 of a world of 1 when not distributed)."""
+
+    def __init__(self, rank: int = 0, world_size: int = 1, local_world_size: int = 1):
+        self.rank = rank
+        self.world_size = world_size
+        self.local_world_size = local_world_size
+
+    @property
+    def distributed(self) -> bool:
+        return self.world_size > 1
+
+    @property
+    def is_main(self) -> bool:
+        return self.rank == 0
+
+    def barrier(self):
+        if self.distributed:
+            dist.barrier()
+
+    def all_reduce_sum(self, *values: float) -> list:
+        """Sums scalars across processes (e.g. loss sums, correct and total counts)."""
+        if not self.distributed:
+            return list(values)
+        tensor = torch.tensor(values, dtype=torch.float64)
+        dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+        return tensor.tolist()
+
+    def all_gather_object(self, obj) -> list:
+        if not self.distributed:
+            return [obj]
+        gathered = [None] * self.world_size
+        dist.all_gather_object(gathered, obj)
+        return gathered
+
+    def shutdown(self):
+        if self.distributed and dist.is_initialized():
+            dist.destroy_process_group()
+
+
+def setup_distributed(threads_per_process: Optional[int] = None) -> DistributedContext:
+    """
+    Joins the process group when launched by torchrun (WORLD_SIZE > 1) and
+    gives each process its share of this machine's cores.
+    """
+    world_size = int(os.environ.get("WORLD_SIZE", "1"))
+    if world_size <= 1:
+        return DistributedContext()
+
+    local_world_size = int(os.environ.get("LOCAL_WORLD_SIZE", str(world_size)))
+    torch.set_num_threads(threads_per_process or max(1, (os.cpu_count() or 1) // local_world_size))
+    dist.init_process_group(backend="gloo")
+    return DistributedContext(dist.get_rank(), dist.get_world_size(), local_world_size)
+
+
+# --- RNG state ---
+def rng_state() -> dict:
+    state = {
+        "torch": torch.get_rng_state(),
+        "numpy": np.random.get_state(),
+        "python": random.getstate(),
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state: dict):
+    torch.set_rng_state(state["torch"])
+    np.random.set_state(state["numpy"])
+    random.setstate(state["python"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+
+def seed_everything(seed: int):
+    torch.manual_seed(seed)
+    np.random.seed(seed)
+    random.seed(seed)
+
+
+# --- Checkpoints ---
+def save_checkpoint(context: DistributedContext, checkpoint_dir: str, epoch: int, model, optimizer,
+                    scheduler, history: list):
+    """
+    Writes checkpoint_dir/checkpoint.pt after `epoch` completed epochs. Must be
+    called by every process (RNG states are gathered); only rank 0 writes, to a
+    temporary file renamed into place, so a crash mid-write keeps the previous
+    checkpoint intact.
+    """
+    rng_states = context.all_gather_object(rng_state())
+    if context.is_main:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        path = os.path.join(checkpoint_dir, CHECKPOINT_FILE)
+        tmp_path = path + ".tmp"
+        torch.save({
+            "epoch": epoch,
+            "world_size": context.world_size,
+            "model": model.state_dict(),
+            "optimizer": optimizer.state_dict(),
+            "scheduler": scheduler.state_dict(),
+            "history": history,
+            "rng_states": rng_states,
+            "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        }, tmp_path)
+        os.replace(tmp_path, path)
+    context.barrier()
+
+
+def load_checkpoint(context: DistributedContext, checkpoint_dir: str, model, optimizer, scheduler):
+    """
+    Restores a checkpoint written by save_checkpoint into the given objects and
+    returns (completed epochs, history), or (0, []) if there is none. RNG
+    streams are restored per process when the world size matches; otherwise
+    training continues correctly but not bit-for-bit.
+    """
+    path = os.path.join(checkpoint_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return 0, []
+    checkpoint = torch.load(path, map_location="cpu", weights_only=False)
+    model.load_state_dict(checkpoint["model"])
+    optimizer.load_state_dict(checkpoint["optimizer"])
+    scheduler.load_state_dict(checkpoint["scheduler"])
+
+    if checkpoint["world_size"] == context.world_size:
+        set_rng_state(checkpoint["rng_states"][context.rank])
+    elif context.is_main:
+        print(f"Warning: checkpoint was written by {checkpoint['world_size']} processes, "
+              f"resuming with {context.world_size}; RNG streams are not restored")
+    return checkpoint["epoch"], checkpoint["history"]
@@ -0,0 +1,197 @@
+"""
+Training input pipeline for train.py.
+
+Two ways to feed windows to the model, chosen per dataset by `make_loader`:
+
+  - cache: the whole split is decoded once into a single preallocated
+    [N, window_samples] float32 tensor and every batch is one index_select on
+    it - no per-sample Python, file access or collate in the training loop.
+    Used when the split fits comfortably in RAM (the current data set does).
+  - stream: a regular DataLoader over the on-disk dataset with worker
+    processes, prefetching, persistent workers and pinned memory (CUDA), for
+    data sets that do not fit.
+
+Augmentations (`BatchAugment`) run on whole batches after they reach the
+training device, so they cost a few tensor ops per batch whichever path is used.
+"""
+import math
+import os
+from typing import Optional
+
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+# A split is cached if it takes at most this fraction of the currently available RAM
+CACHE_MAX_MEMORY_FRACTION = 0.5
+DEFAULT_NUM_WORKERS = min(4, max(0, (os.cpu_count() or 1) - 1))
+DEFAULT_PREFETCH_FACTOR = 4
+
+
+def available_memory_bytes() -> Optional[int]:
+    """MemAvailable from /proc/meminfo (None where that is not available)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def fits_in_memory(dataset: Dataset, copies: int = 1) -> bool:
+    """True if `copies` caches of `dataset` (one per training process on this machine) fit."""
+    window_samples = dataset[0][0].shape[-1] if len(dataset) else 0
+    needed = len(dataset) * window_samples * 4 * copies
+    available = available_memory_bytes()
+    return available is not None and needed <= CACHE_MAX_MEMORY_FRACTION * available
+
+
+class CachedVibrationDataset(Dataset):
+    """
+    Every window of `source` (any dataset returning ([1, L] signal, label), e.g.
+    a VibrationDataset, a random_split Subset or a PackedVibrationDataset)
+    decoded once into one preallocated [N, L] tensor plus an [N] label tensor.
+    The fill itself reads through a DataLoader, so `num_workers` processes
+    decode files in parallel.
+    """
+
+    def __init__(self, source: Dataset, num_workers: int = DEFAULT_NUM_WORKERS, batch_size: int = 64):
+        count = len(source)
+        window_samples = source[0][0].shape[-1] if count else 0
+        self.signals = torch.empty((count, window_samples), dtype=torch.float32)
+        self.labels = torch.empty(count, dtype=torch.long)
+
+        loader = DataLoader(source, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+        position = 0
+        for signals, labels in loader:
+            end = position + signals.size(0)
+            self.signals[position:end].copy_(signals.reshape(signals.size(0), -1))
+            self.labels[position:end].copy_(labels)
+            position = end
+
+    @property
+    def nbytes(self) -> int:
+        return self.signals.numel() * self.signals.element_size()
+
+    def __len__(self):
+        return self.signals.size(0)
+
+    def __getitem__(self, idx):
+        # Shape for signal: [1, L] (channels, signal_length), like the other datasets
+        return self.signals[idx].unsqueeze(0), self.labels[idx]
+
+
+class TensorBatchLoader:
+    """
+    DataLoader replacement for a CachedVibrationDataset: each batch is a single
+    index_select of the cached tensor (a plain slice when not shuffling),
+    returned as ([B, 1, L] signals, [B] labels). A `sampler` (e.g. a
+    DistributedSampler) decides the order and subset instead of `shuffle`.
+    """
+
+    def __init__(self, dataset: CachedVibrationDataset, batch_size: int, shuffle: bool = False,
+                 drop_last: bool = False, generator: Optional[torch.Generator] = None, sampler=None):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+        self.sampler = sampler
+
+    def __len__(self):
+        count = len(self.sampler) if self.sampler is not None else len(self.dataset)
+        return count // self.batch_size if self.drop_last else math.ceil(count / self.batch_size)
+
+    def __iter__(self):
+        signals, labels = self.dataset.signals, self.dataset.labels
+        if self.sampler is not None:
+            order = torch.as_tensor(list(self.sampler), dtype=torch.long)
+        elif self.shuffle:
+            order = torch.randperm(len(self.dataset), generator=self.generator)
+        else:
+            order = None
+        count = len(order) if order is not None else len(self.dataset)
+        for start in range(0, count, self.batch_size):
+            end = min(start + self.batch_size, count)
+            if self.drop_last and end - start < self.batch_size:
+                break
+            if order is None:
+                yield signals[start:end].unsqueeze(1), labels[start:end]
+            else:
+                idx = order[start:end]
+                yield signals.index_select(0, idx).unsqueeze(1), labels.index_select(0, idx)
+
+
+def make_loader(dataset: Dataset, batch_size: int, shuffle: bool, cache="auto",
+                num_workers: int = DEFAULT_NUM_WORKERS, pin_memory: bool = False,
+                prefetch_factor: int = DEFAULT_PREFETCH_FACTOR, sampler=None, cache_copies: int = 1,
+                generator: Optional[torch.Generator] = None):
+    """
+    Batches of ([B, 1, L] signals, [B] labels) for `dataset`. `cache` is True
+    (cache in RAM), False (stream from disk) or "auto" (cache if `cache_copies`
+    copies of the split take at most CACHE_MAX_MEMORY_FRACTION of the available
+    memory). `sampler` replaces `shuffle`; `generator` keeps the loader's own
+    random draws (shuffle order, worker seeds) off the global RNG.
+    """
+    if cache == "auto":
+        cache = fits_in_memory(dataset, cache_copies)
+    if cache:
+        return TensorBatchLoader(CachedVibrationDataset(dataset, num_workers=num_workers), batch_size, shuffle,
+                                 generator=generator, sampler=sampler)
+
+    options = {}
+    if num_workers > 0:
+        options.update(persistent_workers=True, prefetch_factor=prefetch_factor)
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle and sampler is None, sampler=sampler,
+                      num_workers=num_workers, pin_memory=pin_memory, generator=generator, **options)
+
+
+class BatchAugment:
+    """
+    On-the-fly augmentation of a whole [B, C, L] batch on its own device:
+
+      - random circular time shift of each window by up to `max_shift` of its
+        length (a random crop that wraps around, so the length stays L)
+      - random gain, uniform in `gain_range`, per window
+      - additive Gaussian noise with standard deviation `noise_std`
+      - with `renormalize`, each window is re-centred and rescaled to max |x| = 1,
+        the invariant normalization.normalize_windows guarantees for served
+        windows (so gain only matters with renormalize=False)
+
+    Each step is one vectorized op over the batch (a gather, a multiply, an add),
+    with no per-sample Python. The defaults keep augmented windows within the
+    distribution the service sees.
+    """
+
+    def __init__(self, max_shift: float = 0.25, gain_range=(1.0, 1.0), noise_std: float = 0.01,
+                 renormalize: bool = True):
+        if not 0 <= max_shift <= 1:
+            raise ValueError("max_shift must be in [0, 1]")
+        self.max_shift = max_shift
+        self.gain_range = gain_range
+        self.noise_std = noise_std
+        self.renormalize = renormalize
+
+    def __call__(self, signals: torch.Tensor) -> torch.Tensor:
+        batch, channels, length = signals.shape
+        device = signals.device
+
+        out = signals
+        max_shift = int(self.max_shift * length)
+        if max_shift > 0:
+            shifts = torch.randint(0, max_shift + 1, (batch, 1, 1), device=device)
+            index = (torch.arange(length, device=device) + shifts) % length
+            out = torch.gather(out, 2, index.expand(batch, channels, length))
+
+        low, high = self.gain_range
+        if (low, high) != (1.0, 1.0):
+            out = out * torch.empty(batch, 1, 1, device=device).uniform_(low, high)
+
+        if self.noise_std > 0:
+            out = out + self.noise_std * torch.randn(out.shape, device=device)
+
+        if self.renormalize:
+            out = out - out.mean(dim=2, keepdim=True)
+            out = out / out.abs().amax(dim=2, keepdim=True).clamp_min(1e-12)
+        return out
@@ -1,4 +1,8 @@
 import os
+import sys
+import argparse
+import hashlib
+import json
 import numpy as np
 import glob
 try:
@@ -6,6 +10,13 @@ try:
 except ModuleNotFoundError:
     pd = None
 
+# Normalization is shared with the AI service so offline chunks and online
+# inference inputs are bit-for-bit identical (ai-service/normalization.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ai-service"))
+from normalization import normalize_window, normalize_windows
+from resampling import get_resampler, to_model_rate, window_rate, window_samples
+from spectral import SpectralFrontEnd
+
 # --- CONFIGURE THIS ---
 SOURCE_FILES = {
     "healthy": "healthy/*.csv",
@@ -19,6 +30,29 @@ SAMPLE_RATE = 38400  # 38k samples/sec
 CHUNK_SIZE_SECONDS = 1
 CHUNK_SAMPLES = SAMPLE_RATE * CHUNK_SIZE_SECONDS  # 38,400 samples
 
+# Packed dataset (see pack_chunks): contiguous float32 shards + labels + manifest
+PACKED_DIRECTORY = "packed"
+PACKED_MANIFEST = "manifest.json"
+VAL_FRACTION = 0.2
+SPLIT_SEED = 42
+MAX_SHARD_WINDOWS = 4096  # ~630 MB of float32 per shard file
+
+# Spectral feature cache (see cache_spectral_features), next to OUTPUT_DIRECTORY
+SPECTRAL_DIRECTORY = "secdataspectral"
+SPECTRAL_CACHE_CONFIG = "spectral_config.json"
+SPECTRAL_BATCH_WINDOWS = 256
+
+# Chunks resampled to a lower model rate (see cache_resampled_chunks), e.g. secdatachunks-9600hz
+RESAMPLE_CACHE_CONFIG = "resample_config.json"
+RESAMPLE_BATCH_WINDOWS = 256
+
+# Streaming mode (see slice_and_save_streaming): rows read per CSV block
+STREAM_BLOCK_ROWS = 1_000_000  # ~4 MB of float32 voltage samples per block
+
+def normalize_chunk(chunk):
+    """Z-score normalization then scale to [-1, 1] (shared with ai_inference, see normalization.py)."""
+    return normalize_window(chunk)
+
 def slice_and_save_data():
     print("Starting data preprocessing...")
     
@@ -85,33 +119,14 @@ def slice_and_save_data():
                 num_chunks = len(signal) // CHUNK_SAMPLES
                 print(f"    Can extract {num_chunks} chunks of {CHUNK_SAMPLES} samples each")
                 
+                # Normalize every chunk to [-1, 1] range in one vectorized pass
+                chunks = normalize_windows(signal[:num_chunks * CHUNK_SAMPLES].reshape(num_chunks, CHUNK_SAMPLES))
+                
                 for i in range(num_chunks):
-                    start_index = i * CHUNK_SAMPLES
-                    end_index = start_index + CHUNK_SAMPLES
-                    
-                    # Get the 1-second chunk
-                    chunk = signal[start_index:end_index]
-                    
-                    # Normalize the chunk to [-1, 1] range
-                    chunk_mean = np.mean(chunk)
-                    chunk_std = np.std(chunk)
-                    
-                    if chunk_std > 0:
-                        # Z-score normalization then scale to [-1, 1]
-                        chunk_normalized = (chunk - chunk_mean) / chunk_std
-                        chunk_max = np.max(np.abs(chunk_normalized))
-                        if chunk_max > 0:
-                            chunk_final = chunk_normalized / chunk_max
-                        else:
-                            chunk_final = chunk_normalized
-                    else:
-                        # If std is 0 (constant signal), just center around 0
-                        chunk_final = np.zeros_like(chunk)
-                    
                     # Save the chunk
                     chunk_filename = f"chunk_{chunk_counter:05d}.npy"
                     chunk_path = os.path.join(output_class_path, chunk_filename)
-                    np.save(chunk_path, chunk_final.astype(np.float32))
+                    np.save(chunk_path, chunks[i])
                     
                     chunk_counter += 1
                 
@@ -122,5 +137,502 @@ def slice_and_save_data():
                 
     print(f"\nPreprocessing complete. Data saved in '{OUTPUT_DIRECTORY}' directory.")
 
+def find_signal_column(filepath):
+    """
+    Picks the voltage column from the CSV header using the same rules as
+    slice_and_save_data: 'Voltage_V', then 'voltage', then the first numeric
+    column that is not a sample/time/index column.
+    Returns (column name, column position).
+    """
+    if pd is not None:
+        head = pd.read_csv(filepath, nrows=100)
+        columns = list(head.columns)
+        numeric_cols = head.select_dtypes(include=[np.number]).columns.tolist()
+    else:
+        with open(filepath) as f:
+            columns = [c.strip() for c in f.readline().split(",")]
+        numeric_cols = columns
+
+    for name in ("Voltage_V", "voltage"):
+        if name in columns:
+            return name, columns.index(name)
+    signal_cols = [col for col in numeric_cols if not any(x in col.lower() for x in ['sample', 'time', 'index'])]
+    if not signal_cols:
+        raise ValueError("No suitable signal column found")
+    return signal_cols[0], columns.index(signal_cols[0])
+
+def iter_signal_blocks(filepath, block_rows=STREAM_BLOCK_ROWS):
+    """
+    Yields the voltage column of a CSV as float32 arrays of at most `block_rows`
+    samples. Only that one column is parsed, so memory depends on the block size,
+    not on the file length.
+    """
+    column, position = find_signal_column(filepath)
+    print(f"    Streaming column '{column}' in blocks of {block_rows:,} rows")
+
+    if pd is not None:
+        reader = pd.read_csv(filepath, usecols=[column], dtype={column: np.float32}, chunksize=block_rows)
+        for block in reader:
+            yield block[column].to_numpy(dtype=np.float32)
+        return
+
+    # Numpy fallback - parse the column from a bounded number of lines at a time
+    with open(filepath) as f:
+        f.readline()  # skip header
+        while True:
+            lines = [line for _, line in zip(range(block_rows), f)]
+            if not lines:
+                return
+            yield np.array([line.split(",")[position] for line in lines], dtype=np.float32)
+
+def iter_chunks(blocks, chunk_samples=CHUNK_SAMPLES):
+    """
+    Regroups a stream of sample blocks into consecutive chunks of exactly
+    `chunk_samples`, carrying leftover samples across block boundaries.
+    A trailing partial chunk is dropped, like the in-memory path does.
+    """
+    remainder = np.empty(0, dtype=np.float32)
+    for block in blocks:
+        if len(remainder):
+            block = np.concatenate([remainder, block])
+        num_chunks = len(block) // chunk_samples
+        for i in range(num_chunks):
+            yield block[i * chunk_samples:(i + 1) * chunk_samples]
+        remainder = block[num_chunks * chunk_samples:].copy()
+
+def process_file_streaming(filepath, output_class_path, first_chunk_index=0, block_rows=STREAM_BLOCK_ROWS,
+                           chunk_prefix=None):
+    """
+    Streams one CSV, normalizes each chunk as it completes and saves it.
+    Returns the number of chunks written. Signal stats are accumulated on the fly.
+    Chunks are named chunk_<index>.npy, or <chunk_prefix>_<sample offset>.npy
+    when `chunk_prefix` is given (deterministic names for parallel runs).
+    """
+    num_chunks = 0
+    total, total_sq, count = 0.0, 0.0, 0
+    for chunk in iter_chunks(iter_signal_blocks(filepath, block_rows)):
+        chunk64 = chunk.astype(np.float64)
+        total += chunk64.sum()
+        total_sq += np.dot(chunk64, chunk64)
+        count += len(chunk64)
+
+        chunk_final = normalize_chunk(chunk)
+        if chunk_prefix is None:
+            chunk_filename = f"chunk_{first_chunk_index + num_chunks:05d}.npy"
+        else:
+            chunk_filename = f"{chunk_prefix}_{num_chunks * CHUNK_SAMPLES:012d}.npy"
+        np.save(os.path.join(output_class_path, chunk_filename), chunk_final.astype(np.float32))
+        num_chunks += 1
+
+    if count:
+        mean = total / count
+        std = np.sqrt(max(total_sq / count - mean * mean, 0.0))
+        print(f"    Signal stats (chunked part): samples={count}, mean={mean:.4f}, std={std:.4f}")
+    return num_chunks
+
+def slice_and_save_streaming(block_rows=STREAM_BLOCK_ROWS):
+    """
+    Same output as slice_and_save_data, but each CSV is read in fixed-size blocks
+    of just the voltage column (float32) and chunks are written as they complete,
+    so multi-hour captures never have to fit in RAM.
+    """
+    print(f"Starting streaming data preprocessing (block size {block_rows:,} rows)...")
+    
+    for class_name, file_pattern in SOURCE_FILES.items():
+        print(f"Processing class: {class_name}")
+        
+        output_class_path = os.path.join(OUTPUT_DIRECTORY, class_name)
+        os.makedirs(output_class_path, exist_ok=True)
+        
+        chunk_counter = 0
+        
+        for filepath in glob.glob(file_pattern):
+            print(f"  Streaming file: {filepath}")
+            try:
+                num_chunks = process_file_streaming(filepath, output_class_path, chunk_counter, block_rows)
+                chunk_counter += num_chunks
+                print(f"    Extracted {num_chunks} chunks from {os.path.basename(filepath)}")
+            except Exception as e:
+                print(f"    Failed to process {filepath}: {e}")
+                
+    print(f"\nPreprocessing complete. Data saved in '{OUTPUT_DIRECTORY}' directory.")
+
+# --- Parallel, resumable preprocessing ---
+PREPROCESS_MANIFEST = "preprocess_manifest.json"  # stored inside OUTPUT_DIRECTORY, next to the class folders
+HASH_BLOCK_BYTES = 8 * 1024 * 1024
+
+def file_sha256(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_prefix_for(filepath):
+    """Deterministic chunk name prefix: file stem + short hash of its path (stems may repeat across folders)."""
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    path_hash = hashlib.sha1(os.path.normpath(filepath).encode()).hexdigest()[:8]
+    return f"{stem}_{path_hash}"
+
+def load_preprocess_manifest(output_dir=OUTPUT_DIRECTORY):
+    path = os.path.join(output_dir, PREPROCESS_MANIFEST)
+    if not os.path.exists(path):
+        return {"chunk_samples": CHUNK_SAMPLES, "sources": {}}
+    with open(path) as f:
+        return json.load(f)
+
+def save_preprocess_manifest(manifest, output_dir=OUTPUT_DIRECTORY):
+    """Writes the manifest atomically so an interrupted run never leaves it half-written."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, PREPROCESS_MANIFEST)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def class_directories(chunk_root):
+    """
+    Sorted class folder names of a chunk root. Files stored next to them
+    (preprocess_manifest.json, resample_config.json, ...) are not classes.
+    """
+    return sorted(d for d in os.listdir(chunk_root) if os.path.isdir(os.path.join(chunk_root, d)))
+
+def _preprocess_file_job(class_name, filepath, output_class_path, block_rows, sha256=None):
+    """Process-pool worker: (re)slices one source file into deterministically named chunks."""
+    stat = os.stat(filepath)
+    sha256 = sha256 or file_sha256(filepath)
+    prefix = chunk_prefix_for(filepath)
+
+    # Remove chunks from an earlier version of this file before writing the new ones
+    for old_chunk in glob.glob(os.path.join(output_class_path, f"{prefix}_*.npy")):
+        os.remove(old_chunk)
+
+    num_chunks = process_file_streaming(filepath, output_class_path, block_rows=block_rows, chunk_prefix=prefix)
+    return {
+        "class": class_name,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha256,
+        "chunk_prefix": prefix,
+        "chunk_dir": os.path.relpath(output_class_path, OUTPUT_DIRECTORY).replace(os.sep, "/"),
+        "first_offset": 0,
+        "num_chunks": num_chunks,
+    }
+
+def slice_and_save_parallel(workers=None, block_rows=STREAM_BLOCK_ROWS):
+    """
+    Preprocesses source files concurrently in a process pool.
+
+    Every source file is one job, streamed like slice_and_save_streaming, and its
+    chunks are named <file stem>_<path hash>_<sample offset>.npy, so concurrent
+    workers never collide and re-runs overwrite exactly what they produced.
+    A manifest in OUTPUT_DIRECTORY records each source's size/mtime/SHA-256, class
+    and chunk range; on re-runs, files whose size and mtime (or, failing that,
+    content hash) are unchanged are skipped. The manifest is saved after every
+    finished file, so an interrupted run resumes where it stopped.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    print(f"Starting parallel data preprocessing ({workers or os.cpu_count()} workers)...")
+    manifest = load_preprocess_manifest()
+
+    jobs = []
+    skipped = 0
+    seen = set()
+    for class_name, file_pattern in SOURCE_FILES.items():
+        output_class_path = os.path.join(OUTPUT_DIRECTORY, class_name)
+        os.makedirs(output_class_path, exist_ok=True)
+
+        for filepath in sorted(glob.glob(file_pattern)):
+            key = os.path.normpath(filepath).replace(os.sep, "/")
+            seen.add(key)
+            stat = os.stat(filepath)
+            entry = manifest["sources"].get(key)
+            sha256 = None
+
+            if entry is not None and entry["class"] != class_name:
+                # Source moved to another class: drop its chunks from the old class folder
+                old_dir = os.path.join(OUTPUT_DIRECTORY, entry["chunk_dir"])
+                for old_chunk in glob.glob(os.path.join(old_dir, f"{entry['chunk_prefix']}_*.npy")):
+                    os.remove(old_chunk)
+            elif entry is not None:
+                if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                    skipped += 1
+                    continue
+                # Touched but maybe not modified: compare content before redoing the work
+                sha256 = file_sha256(filepath)
+                if sha256 == entry["sha256"]:
+                    entry["mtime_ns"] = stat.st_mtime_ns
+                    skipped += 1
+                    continue
+
+            jobs.append((class_name, filepath, output_class_path, block_rows, sha256))
+
+    print(f"  {len(jobs)} file(s) to process, {skipped} unchanged file(s) skipped")
+    missing = sorted(set(manifest["sources"]) - seen)
+    for key in missing:
+        print(f"  ⚠️  Source no longer present (chunks kept): {key}")
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_preprocess_file_job, *job): job[1] for job in jobs}
+        for future in as_completed(futures):
+            filepath = futures[future]
+            key = os.path.normpath(filepath).replace(os.sep, "/")
+            try:
+                entry = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"    Failed to process {filepath}: {e}")
+                continue
+            manifest["sources"][key] = entry
+            save_preprocess_manifest(manifest)
+            print(f"    Extracted {entry['num_chunks']} chunks from {filepath}")
+
+    save_preprocess_manifest(manifest)
+    print(f"\nPreprocessing complete ({failed} failed). Data saved in '{OUTPUT_DIRECTORY}' directory.")
+
+def pack_chunks(chunk_root=OUTPUT_DIRECTORY, output_dir=PACKED_DIRECTORY,
+                val_fraction=VAL_FRACTION, seed=SPLIT_SEED, max_shard_windows=MAX_SHARD_WINDOWS):
+    """
+    Packs the per-chunk .npy files into a few contiguous float32 files per split,
+    so training can np.memmap them instead of opening one file per sample.
+
+    Writes into `output_dir`:
+      <split>-<n>.f32         raw float32, shape [num_windows, window samples], C order
+                              (CHUNK_SAMPLES, or one second at the rate of resampled chunks)
+      <split>-<n>.labels.npy  int64 class index per window
+      manifest.json           class mapping, shard list, and per-window source file + offset
+    Class indices follow sorted class folder names, same as VibrationDataset.
+    """
+    print(f"Packing chunks from '{chunk_root}' into '{output_dir}'...")
+    os.makedirs(output_dir, exist_ok=True)
+    chunk_samples = window_samples(data_sample_rate(chunk_root))
+
+    class_names = class_directories(chunk_root)
+    class_to_idx = {name: i for i, name in enumerate(class_names)}
+
+    entries = []
+    for class_name in class_names:
+        class_path = os.path.join(chunk_root, class_name)
+        for fname in sorted(os.listdir(class_path)):
+            if fname.endswith(".npy"):
+                entries.append((os.path.join(class_name, fname), class_to_idx[class_name]))
+
+    # Deterministic train/val split
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(entries))
+    num_val = int(round(len(entries) * val_fraction))
+    splits = {"train": sorted(order[num_val:]), "val": sorted(order[:num_val])}
+
+    manifest = {
+        "window_samples": chunk_samples,
+        "dtype": "float32",
+        "class_mapping": {str(i): name for name, i in class_to_idx.items()},
+        "val_fraction": val_fraction,
+        "seed": seed,
+        "splits": {},
+    }
+
+    for split, indices in splits.items():
+        shards = []
+        for shard_idx, start in enumerate(range(0, len(indices), max_shard_windows)):
+            shard_entries = [entries[i] for i in indices[start:start + max_shard_windows]]
+            data_file = f"{split}-{shard_idx:05d}.f32"
+            labels_file = f"{split}-{shard_idx:05d}.labels.npy"
+
+            shard = np.memmap(os.path.join(output_dir, data_file), dtype=np.float32, mode="w+",
+                              shape=(len(shard_entries), chunk_samples))
+            labels = np.empty(len(shard_entries), dtype=np.int64)
+            sources = []
+            for row, (rel_path, label) in enumerate(shard_entries):
+                chunk = np.load(os.path.join(chunk_root, rel_path))
+                if chunk.shape != (chunk_samples,):
+                    raise ValueError(f"{rel_path}: expected shape ({chunk_samples},), got {chunk.shape}")
+                shard[row] = chunk
+                labels[row] = label
+                sources.append({"source": rel_path.replace(os.sep, "/"), "offset": row})
+            shard.flush()
+            del shard
+            np.save(os.path.join(output_dir, labels_file), labels)
+
+            shards.append({
+                "data": data_file,
+                "labels": labels_file,
+                "num_windows": len(shard_entries),
+                "windows": sources,
+            })
+            print(f"  {split}: wrote {data_file} ({len(shard_entries)} windows)")
+        manifest["splits"][split] = {"num_windows": len(indices), "shards": shards}
+
+    with open(os.path.join(output_dir, PACKED_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1)
+    print(f"Packing complete. Manifest saved to '{os.path.join(output_dir, PACKED_MANIFEST)}'")
+
+def cache_spectral_features(chunk_root=OUTPUT_DIRECTORY, output_dir=SPECTRAL_DIRECTORY,
+                            batch_windows=SPECTRAL_BATCH_WINDOWS):
+    """
+    Computes the spectral front end's log band-energy features (ai-service/spectral.py)
+    of every chunk, SPECTRAL_BATCH_WINDOWS chunks per batched FFT, and saves
+    them as <output_dir>/<class>/<chunk name>.npy - same layout as the chunks,
+    each file one flattened [num_bands * num_frames] float32 array, so train.py
+    --architecture spectral --spectral-root <output_dir> reads them like chunks.
+
+    Features newer than their chunk are kept; if the front-end settings
+    changed (spectral_config.json), everything is recomputed. Resampled chunks
+    (cache_resampled_chunks) get a front end at their rate.
+    """
+    sample_rate = data_sample_rate(chunk_root)
+    front_end = SpectralFrontEnd.from_config({"window_samples": window_samples(sample_rate),
+                                              "sample_rate": sample_rate})
+    config_path = os.path.join(output_dir, SPECTRAL_CACHE_CONFIG)
+    recompute = True
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            recompute = json.load(f) != front_end.config
+    print(f"Caching spectral features of '{chunk_root}' in '{output_dir}' "
+          f"({front_end.num_bands} bands x {front_end.num_frames} frames per window)...")
+
+    computed = skipped = 0
+    for class_name in class_directories(chunk_root):
+        class_path = os.path.join(chunk_root, class_name)
+        output_class_path = os.path.join(output_dir, class_name)
+        os.makedirs(output_class_path, exist_ok=True)
+
+        pending = []
+        for fname in sorted(os.listdir(class_path)):
+            if not fname.endswith(".npy"):
+                continue
+            source = os.path.join(class_path, fname)
+            target = os.path.join(output_class_path, fname)
+            if not recompute and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                skipped += 1
+                continue
+            pending.append((source, target))
+
+        for start in range(0, len(pending), batch_windows):
+            batch = pending[start:start + batch_windows]
+            features = front_end.features(np.stack([np.load(source) for source, _ in batch]))
+            for (_, target), row in zip(batch, features):
+                np.save(target, row.reshape(-1))
+            computed += len(batch)
+        print(f"  {class_name}: {len(pending)} computed")
+
+    # Written last: an interrupted run with new settings recomputes everything next time
+    with open(config_path, "w") as f:
+        json.dump(front_end.config, f, indent=1)
+    print(f"Spectral features: {computed} computed, {skipped} up to date")
+
+def rate_directory(directory, sample_rate):
+    """`directory` for source-rate data, `<directory>-<rate>hz` for data resampled to `sample_rate`."""
+    return directory if sample_rate == SAMPLE_RATE else f"{directory}-{sample_rate}hz"
+
+def data_sample_rate(chunk_root):
+    """Sample rate (Hz) of the chunks in `chunk_root`: SAMPLE_RATE unless written by cache_resampled_chunks."""
+    config_path = os.path.join(chunk_root, RESAMPLE_CACHE_CONFIG)
+    if not os.path.exists(config_path):
+        return SAMPLE_RATE
+    with open(config_path) as f:
+        return json.load(f)["to_rate"]
+
+def cache_resampled_chunks(sample_rate, chunk_root=OUTPUT_DIRECTORY, output_dir=None,
+                           batch_windows=RESAMPLE_BATCH_WINDOWS):
+    """
+    Resamples every chunk to `sample_rate` Hz with the AI service's anti-aliasing
+    polyphase filter (ai-service/resampling.py), RESAMPLE_BATCH_WINDOWS chunks
+    per vectorized pass, renormalizes it and saves it as
+    <output_dir>/<class>/<chunk name>.npy (default output_dir:
+    <chunk_root>-<rate>hz) - same layout as the chunks, so train.py
+    --data-root <output_dir> trains a model at that rate. The service converts
+    requests the same way, so training and serving inputs are identical.
+
+    Chunks newer than their source are kept; if the filter changed
+    (resample_config.json), everything is recomputed.
+    """
+    from_rate = data_sample_rate(chunk_root)
+    output_dir = output_dir or rate_directory(chunk_root, sample_rate)
+    config = {**get_resampler(from_rate, sample_rate).config, "window_samples": window_samples(sample_rate)}
+    config_path = os.path.join(output_dir, RESAMPLE_CACHE_CONFIG)
+    recompute = True
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            recompute = json.load(f) != config
+    print(f"Resampling '{chunk_root}' ({from_rate} Hz) into '{output_dir}' ({sample_rate} Hz, "
+          f"{config['up']}/{config['down']} polyphase, {config['num_taps']} taps)...")
+
+    computed = skipped = 0
+    for class_name in class_directories(chunk_root):
+        class_path = os.path.join(chunk_root, class_name)
+        output_class_path = os.path.join(output_dir, class_name)
+        os.makedirs(output_class_path, exist_ok=True)
+
+        pending = []
+        for fname in sorted(os.listdir(class_path)):
+            if not fname.endswith(".npy"):
+                continue
+            source = os.path.join(class_path, fname)
+            target = os.path.join(output_class_path, fname)
+            if not recompute and os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                skipped += 1
+                continue
+            pending.append((source, target))
+
+        for start in range(0, len(pending), batch_windows):
+            batch = pending[start:start + batch_windows]
+            chunks = np.stack([np.load(source) for source, _ in batch])
+            if window_rate(chunks.shape[1]) != from_rate:
+                raise ValueError(f"{class_path}: chunks of {chunks.shape[1]} samples are not one second "
+                                 f"at {from_rate} Hz")
+            # Chunks are already normalized, exactly as the service normalizes a raw window first
+            for (_, target), row in zip(batch, to_model_rate(chunks, sample_rate, from_rate, normalized=True)):
+                np.save(target, row)
+            computed += len(batch)
+        print(f"  {class_name}: {len(pending)} resampled")
+
+    # Written last: an interrupted run with other settings recomputes everything next time
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=1)
+    print(f"Resampled chunks: {computed} computed, {skipped} up to date")
+    return output_dir
+
+
 if __name__ == "__main__":
-    slice_and_save_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Slice raw CSV recordings into normalized 1-second chunks")
+    parser.add_argument("--streaming", action="store_true",
+                        help="read CSVs in fixed-size blocks (bounded memory, for long captures)")
+    parser.add_argument("--block-rows", type=int, default=STREAM_BLOCK_ROWS,
+                        help="rows per block in --streaming mode")
+    parser.add_argument("--parallel", action="store_true",
+                        help="process source files concurrently, skipping unchanged ones (resumable)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="process count for --parallel (default: all cores)")
+    parser.add_argument("--pack", action="store_true",
+                        help="also pack the chunks into memory-mappable shards (see pack_chunks)")
+    parser.add_argument("--pack-only", action="store_true",
+                        help="skip slicing and only pack existing chunks")
+    parser.add_argument("--spectral", action="store_true",
+                        help="also cache spectral features of the chunks (see cache_spectral_features)")
+    parser.add_argument("--spectral-only", action="store_true",
+                        help="skip slicing and only cache spectral features of existing chunks")
+    parser.add_argument("--sample-rate", type=int, default=SAMPLE_RATE,
+                        help="also resample the chunks to this rate in Hz (see cache_resampled_chunks); "
+                             "--pack and --spectral then work on the resampled chunks")
+    parser.add_argument("--resample-only", action="store_true",
+                        help="skip slicing and only resample existing chunks to --sample-rate")
+    args = parser.parse_args()
+
+    if args.pack_only or args.spectral_only or args.resample_only:
+        pass
+    elif args.parallel:
+        slice_and_save_parallel(args.workers, args.block_rows)
+    elif args.streaming:
+        slice_and_save_streaming(args.block_rows)
+    else:
+        slice_and_save_data()
+    chunk_root = OUTPUT_DIRECTORY
+    if args.sample_rate != SAMPLE_RATE:
+        chunk_root = cache_resampled_chunks(args.sample_rate)
+    if args.pack or args.pack_only:
+        pack_chunks(chunk_root, rate_directory(PACKED_DIRECTORY, args.sample_rate))
+    if args.spectral or args.spectral_only:
+        cache_spectral_features(chunk_root, rate_directory(SPECTRAL_DIRECTORY, args.sample_rate))
\ No newline at end of file
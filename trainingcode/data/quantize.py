@@ -0,0 +1,199 @@
+import argparse
+import copy
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.ao.quantization import (
+    DeQuantStub,
+    QuantStub,
+    convert,
+    fuse_modules,
+    get_default_qconfig,
+    prepare,
+    quantize_dynamic,
+)
+from torch.utils.data import DataLoader
+
+from train import ImprovedCNN, VibrationDataset
+from model_variants import BASELINE_ARCHITECTURE, read_model_config  # ai-service/, on sys.path via train
+
+# --- INT8 quantization of the fault detector ---
+# dynamic: fc1/fc2/fc3 weights stored as int8, activations quantized on the fly
+# static:  conv/bn/relu stack fused and quantized with calibrated activation
+#          ranges (calibration on secdatachunks), plus dynamic int8 Linear layers
+QUANTIZED_MODEL_PATH = "fault_detector_int8.torchscript.pt"
+WINDOW_SAMPLES = 38400  # source rate; models trained at a lower rate take fewer (model_config.json)
+
+
+# 1) Quantization-friendly wrapper
+class QuantizableCNN(nn.Module):
+    """
+    Same layers and weights as ImprovedCNN, arranged for eager-mode quantization:
+    the conv stack sits between Quant/DeQuant stubs as a fusable Sequential, and
+    the classifier head stays float so it can be dynamically quantized.
+    """
+    def __init__(self, model):
+        super(QuantizableCNN, self).__init__()
+        self.quant = QuantStub()
+        self.features = nn.Sequential(
+            model.conv1, model.bn1, nn.ReLU(),
+            model.conv2, model.bn2, nn.ReLU(),
+            model.conv3, model.bn3, nn.ReLU(),
+            model.conv4, model.bn4, nn.ReLU(),
+            model.pool,
+        )
+        self.dequant = DeQuantStub()
+        self.fc1 = model.fc1
+        self.fc2 = model.fc2
+        self.fc3 = model.fc3
+
+    def forward(self, x):
+        x = self.dequant(self.features(self.quant(x)))
+        # reshape, not view: quantized pooling output is not contiguous in this layout
+        x = x.reshape(x.size(0), -1)
+        x = F.relu(self.fc1(x))   # dropout is a no-op at inference
+        x = F.relu(self.fc2(x))
+        return self.fc3(x)
+
+def quantize_dynamic_model(model):
+    """Dynamic quantization: int8 Linear weights, everything else fp32."""
+    return quantize_dynamic(copy.deepcopy(model).eval(), {nn.Linear}, dtype=torch.qint8)
+
+def quantize_static_model(model, calibration_loader, num_batches=32, engine=None):
+    """
+    Static quantization of the Conv1d/BatchNorm/ReLU stack (fused, int8 activations
+    calibrated on `calibration_loader`) combined with dynamic int8 Linear layers.
+    """
+    engine = engine or torch.backends.quantized.engine
+    torch.backends.quantized.engine = engine
+
+    qmodel = QuantizableCNN(copy.deepcopy(model).cpu()).eval()
+    fuse_modules(
+        qmodel.features,
+        [["0", "1", "2"], ["3", "4", "5"], ["6", "7", "8"], ["9", "10", "11"]],
+        inplace=True,
+    )
+    qmodel.qconfig = get_default_qconfig(engine)
+    for name in ("fc1", "fc2", "fc3"):
+        getattr(qmodel, name).qconfig = None  # handled by dynamic quantization below
+    prepare(qmodel, inplace=True)
+
+    # Calibration: record activation ranges on real chunks
+    with torch.no_grad():
+        for i, (signals, _) in enumerate(calibration_loader):
+            if i >= num_batches:
+                break
+            qmodel(signals)
+
+    convert(qmodel, inplace=True)
+    return quantize_dynamic(qmodel, {nn.Linear}, dtype=torch.qint8)
+
+def export_quantized(qmodel, path=QUANTIZED_MODEL_PATH, num_samples=WINDOW_SAMPLES):
+    """Saves a quantized model as frozen TorchScript, loadable by ai_inference's `int8` backend."""
+    example = torch.zeros(1, 1, num_samples)
+    with torch.no_grad():
+        frozen = torch.jit.freeze(torch.jit.trace(qmodel.eval(), example))
+    frozen.save(path)
+    return path
+
+
+# 2) Reporting helpers
+def per_class_accuracy(model, loader, num_classes):
+    correct = np.zeros(num_classes, dtype=np.int64)
+    total = np.zeros(num_classes, dtype=np.int64)
+    model.eval()
+    with torch.no_grad():
+        for signals, labels in loader:
+            predicted = torch.argmax(model(signals), dim=1)
+            for label, pred in zip(labels.tolist(), predicted.tolist()):
+                total[label] += 1
+                correct[label] += int(label == pred)
+    return correct / np.maximum(total, 1), correct.sum() / max(total.sum(), 1)
+
+def serialized_size_mb(model, num_samples=WINDOW_SAMPLES):
+    """Size of the frozen TorchScript artifact, which is what the service loads."""
+    path = "_size_probe.torchscript.pt"
+    try:
+        export_quantized(model, path, num_samples)
+        return os.path.getsize(path) / 1e6
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+def latency_ms(model, batch_size=1, repeats=50, warmup=5, num_samples=WINDOW_SAMPLES):
+    x = torch.randn(batch_size, 1, num_samples)
+    timings = []
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(x)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(x)
+            timings.append((time.perf_counter() - start) * 1000.0)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 quantization of fault_detector.pt")
+    parser.add_argument("--data-root", default="secdatachunks")
+    parser.add_argument("--model", default="fault_detector.pt")
+    parser.add_argument("--output", default=QUANTIZED_MODEL_PATH)
+    parser.add_argument("--mode", choices=["static", "dynamic"], default="static",
+                        help="which quantized model to export")
+    parser.add_argument("--calibration-batches", type=int, default=32)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--latency-repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    config = read_model_config(os.path.dirname(os.path.abspath(args.model)))
+    architecture, num_samples = config["architecture"], config["window_samples"]
+    if architecture != BASELINE_ARCHITECTURE:
+        parser.error(f"{args.model} is a '{architecture}' model; quantize.py only handles the baseline ImprovedCNN")
+
+    dataset = VibrationDataset(data_root=args.data_root)
+    num_classes = len(dataset.class_to_idx)
+
+    model = ImprovedCNN(num_classes=num_classes)
+    model.load_state_dict(torch.load(args.model, map_location=torch.device('cpu')))
+    model.eval()
+
+    calibration_loader = DataLoader(
+        dataset, batch_size=args.batch_size, shuffle=True,
+        generator=torch.Generator().manual_seed(0),
+    )
+    eval_loader = DataLoader(dataset, batch_size=args.batch_size, shuffle=False)
+
+    print("Quantizing (dynamic)...")
+    dynamic_model = quantize_dynamic_model(model)
+    print(f"Quantizing (static, {args.calibration_batches} calibration batches)...")
+    static_model = quantize_static_model(model, calibration_loader, args.calibration_batches)
+
+    variants = {"fp32": model, "int8 dynamic": dynamic_model, "int8 static": static_model}
+    class_names = [dataset.idx_to_class[i] for i in range(num_classes)]
+
+    print(f"\n{'model':<14} {'size MB':>8} {'p50 ms':>8} {'p99 ms':>8} {'overall':>8} "
+          + " ".join(f"{name:>9}" for name in class_names))
+    baseline = None
+    for name, variant in variants.items():
+        class_acc, overall = per_class_accuracy(variant, eval_loader, num_classes)
+        p50, p99 = latency_ms(variant, repeats=args.latency_repeats, num_samples=num_samples)
+        size = serialized_size_mb(variant, num_samples)
+        print(f"{name:<14} {size:>8.2f} {p50:>8.2f} {p99:>8.2f} {overall:>8.4f} "
+              + " ".join(f"{acc:>9.4f}" for acc in class_acc))
+        if baseline is None:
+            baseline = class_acc
+        else:
+            print(f"{'  Δ vs fp32':<14} {'':>8} {'':>8} {'':>8} {'':>8} "
+                  + " ".join(f"{acc - base:>+9.4f}" for acc, base in zip(class_acc, baseline)))
+
+    chosen = static_model if args.mode == "static" else dynamic_model
+    export_quantized(chosen, args.output, num_samples)
+    print(f"\n{args.mode} INT8 model saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
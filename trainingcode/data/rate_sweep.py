@@ -0,0 +1,110 @@
+"""
+Accuracy vs input rate vs latency: for each --rates entry, the cost of a model
+that takes one-second windows at that rate (resampled from the 38.4 kHz source
+with ai-service/resampling.py, as preprocess_data.py --sample-rate and the
+service do): payload per window, MACs, CPU latency (batch 1 p50/p99) of the
+BatchNorm-folded TorchScript module, resampling cost per source window, and
+end-to-end throughput (resampling + forward, windows/s at --batch-size). With
+--epochs > 0, each rate is also trained with train_model on the chunks
+resampled to it (cached next to --data-root as <data-root>-<rate>hz) and its
+validation accuracy reported.
+
+Usage:
+    python rate_sweep.py                                       # cost only
+    python rate_sweep.py --rates 38400 19200 9600 4800 --epochs 10 --output rate_sweep.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+
+from train import build_network, train_model
+from model_variants import ARCHITECTURES, BASELINE_ARCHITECTURE, SPECTRAL_ARCHITECTURE, count_macs  # ai-service/
+from preprocess_data import cache_resampled_chunks, data_sample_rate
+from resampling import SOURCE_SAMPLE_RATE, get_resampler, to_model_rate, window_samples
+from spectral import SpectralFrontEnd
+from compare_models import WithFrontEnd, serving_module, throughput
+from quantize import latency_ms
+
+
+def resample_ms(sample_rate, batch_size, repeats=5):
+    """Milliseconds per source window to normalize and resample a batch of them to `sample_rate`."""
+    windows = np.random.default_rng(0).standard_normal((batch_size, window_samples(SOURCE_SAMPLE_RATE)),
+                                                        dtype=np.float32)
+    to_model_rate(windows, sample_rate)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        to_model_rate(windows, sample_rate)
+    return (time.perf_counter() - start) / (repeats * batch_size) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", type=int, nargs="+", default=[38400, 19200, 12800, 9600, 4800])
+    parser.add_argument("--architecture", choices=ARCHITECTURES, default=BASELINE_ARCHITECTURE)
+    parser.add_argument("--num-classes", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32, help="batch size of the throughput measurement")
+    parser.add_argument("--latency-repeats", type=int, default=50)
+    parser.add_argument("--data-root", default="secdatachunks", help="source-rate chunks")
+    parser.add_argument("--epochs", type=int, default=0, help="train at each rate this long (0 = cost only)")
+    parser.add_argument("--train-batch-size", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write the rows as JSON to this path")
+    args = parser.parse_args()
+
+    rows = []
+    for rate in args.rates:
+        num_samples = window_samples(rate)
+        spectral_config = {"window_samples": num_samples, "sample_rate": rate}
+        torch.manual_seed(args.seed)
+        model = build_network(args.architecture, args.num_classes, spectral_config).eval()
+        module = serving_module(model, num_samples)
+        pipeline = module
+        if args.architecture == SPECTRAL_ARCHITECTURE:
+            pipeline = WithFrontEnd(SpectralFrontEnd.from_config(spectral_config), module)
+        p50, p99 = latency_ms(pipeline, batch_size=1, repeats=args.latency_repeats, num_samples=num_samples)
+        forward_windows_s = throughput(pipeline, args.batch_size, num_samples=num_samples)
+        resample = resample_ms(rate, args.batch_size)
+        resampler = get_resampler(SOURCE_SAMPLE_RATE, rate)
+        row = {
+            "sample_rate": rate,
+            "bandwidth_hz": rate / 2,
+            "factor": f"{resampler.up}/{resampler.down}",
+            "payload_kb": num_samples * 4 / 1024,
+            "macs": count_macs(model, num_samples),
+            "p50": p50,
+            "p99": p99,
+            "resample_ms": resample,
+            "windows_s": 1.0 / (1.0 / forward_windows_s + resample / 1000.0),
+            "val_acc": None,
+        }
+        if args.epochs > 0:
+            data_root = args.data_root
+            if rate != data_sample_rate(data_root):
+                data_root = cache_resampled_chunks(rate, args.data_root)
+            print(f"\nTraining {args.architecture} at {rate} Hz on '{data_root}'...")
+            history = train_model(data_root, epochs=args.epochs, batch_size=args.train_batch_size,
+                                  architecture=args.architecture, seed=args.seed, export=False)
+            row["val_acc"] = history[-1]["val_acc"]
+        rows.append(row)
+
+    source = rows[0]
+    print(f"\n{args.architecture}, {torch.get_num_threads()} threads, latency at batch size 1, "
+          f"throughput (resampling + forward) at batch size {args.batch_size}")
+    print(f"{'rate Hz':>8} {'factor':>7} {'KB/win':>7} {'MMACs':>8} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'resample':>9} {'windows/s':>10} {'speedup':>8} {'val acc':>8}")
+    for row in rows:
+        val_acc = f"{row['val_acc']:>8.4f}" if row["val_acc"] is not None else f"{'-':>8}"
+        print(f"{row['sample_rate']:>8} {row['factor']:>7} {row['payload_kb']:>7.1f} {row['macs'] / 1e6:>8.0f} "
+              f"{row['p50']:>8.2f} {row['p99']:>8.2f} {row['resample_ms']:>7.3f}ms {row['windows_s']:>10.1f} "
+              f"{row['windows_s'] / source['windows_s']:>7.1f}x {val_acc}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"architecture": args.architecture, "batch_size": args.batch_size, "rows": rows}, f, indent=1)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import json
+import os
+
+import numpy as np
+
+from batch_score import iter_batches, iter_windows
+from preprocess_data import PACKED_MANIFEST
+
+
+def write_packed(root, num_samples, num_windows=3):
+    os.makedirs(root)
+    np.arange(num_windows * num_samples, dtype=np.float32).tofile(os.path.join(root, "train-00000.f32"))
+    np.save(os.path.join(root, "train-00000.labels.npy"), np.zeros(num_windows, dtype=np.int64))
+    with open(os.path.join(root, PACKED_MANIFEST), "w") as f:
+        json.dump({"window_samples": num_samples, "class_mapping": {"0": "healthy"}, "splits": {"train": {"shards": [{
+            "data": "train-00000.f32", "labels": "train-00000.labels.npy", "num_windows": num_windows,
+            "windows": [{"source": f"w{i}"} for i in range(num_windows)],
+        }]}}}, f)
+
+
+def test_windows_at_any_rate_are_batched_by_length(tmp_path):
+    class_to_idx = {"bearing": 0, "healthy": 1}
+    os.makedirs(tmp_path / "chunks-9600hz" / "bearing")
+    for i in range(3):
+        np.save(tmp_path / "chunks-9600hz" / "bearing" / f"chunk_{i}.npy", np.zeros(9600, dtype=np.float32))
+    np.save(tmp_path / "source.npy", np.zeros((2, 38400), dtype=np.float32))
+    np.save(tmp_path / "too_short.npy", np.zeros(10, dtype=np.float32))
+    write_packed(str(tmp_path / "packed-4800hz"), 4800)
+
+    windows = list(iter_windows([str(tmp_path)], class_to_idx))
+    assert sorted(len(window) for _, _, _, window in windows) == [4800] * 3 + [9600] * 3 + [38400] * 2
+
+    batches = list(iter_batches(iter(windows), batch_size=2))
+    assert all(len({len(row) for row in batch}) == 1 for _, _, _, batch in batches)
+    assert sum(len(batch) for _, _, _, batch in batches) == len(windows)
+    labels = np.concatenate([labels for _, _, labels, batch in batches if batch.shape[1] == 9600])
+    assert labels.tolist() == [0, 0, 0]
+    packed = [batch for _, _, _, batch in batches if batch.shape[1] == 4800]
+    np.testing.assert_array_equal(np.concatenate(packed)[2], np.arange(9600, 14400, dtype=np.float32))
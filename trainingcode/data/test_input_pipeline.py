@@ -0,0 +1,22 @@
+import numpy as np
+import torch
+
+from input_pipeline import BatchAugment
+
+
+def test_augmented_windows_stay_normalized():
+    torch.manual_seed(0)
+    raw = np.random.default_rng(0).standard_normal((8, 1000)).astype(np.float32) * 3 + 5
+    centred = raw - raw.mean(axis=1, keepdims=True)
+    batch = torch.from_numpy(centred / np.abs(centred).max(axis=1, keepdims=True)).unsqueeze(1)  # like served windows
+    out = BatchAugment()(batch)
+    assert out.shape == batch.shape
+    np.testing.assert_allclose(out.abs().amax(dim=2).numpy(), 1.0, atol=1e-6)
+    np.testing.assert_allclose(out.mean(dim=2).numpy(), 0.0, atol=1e-6)
+
+
+def test_shift_is_bounded():
+    signals = torch.arange(100, dtype=torch.float32).repeat(4, 1, 1)
+    out = BatchAugment(max_shift=0.1, noise_std=0.0, renormalize=False)(signals)
+    shifts = (out[:, 0, 0] - signals[:, 0, 0]).numpy()
+    assert ((shifts >= 0) & (shifts <= 10)).all()
@@ -0,0 +1,33 @@
+import json
+import os
+
+import numpy as np
+
+from preprocess_data import (PACKED_MANIFEST, CHUNK_SAMPLES, class_directories, pack_chunks,
+                             save_preprocess_manifest)
+from train import VibrationDataset
+
+
+def make_chunk_root(root, classes=("bearing", "healthy"), chunks_per_class=2):
+    for class_name in classes:
+        os.makedirs(os.path.join(root, class_name))
+        for i in range(chunks_per_class):
+            np.save(os.path.join(root, class_name, f"chunk_{i}.npy"), np.zeros(CHUNK_SAMPLES, dtype=np.float32))
+    # Written by slice_and_save_parallel next to the class folders
+    save_preprocess_manifest({"chunk_samples": CHUNK_SAMPLES, "sources": {}}, output_dir=root)
+
+
+def test_manifest_is_not_a_class(tmp_path):
+    root = str(tmp_path / "chunks")
+    make_chunk_root(root)
+    assert os.path.exists(os.path.join(root, "preprocess_manifest.json"))
+    assert class_directories(root) == ["bearing", "healthy"]
+
+    dataset = VibrationDataset(root)
+    assert dataset.class_to_idx == {"bearing": 0, "healthy": 1}
+    assert len(dataset) == 4
+
+    packed = str(tmp_path / "packed")
+    pack_chunks(root, packed, val_fraction=0.5)
+    with open(os.path.join(packed, PACKED_MANIFEST)) as f:
+        assert json.load(f)["class_mapping"] == {"0": "bearing", "1": "healthy"}
@@ -1,11 +1,31 @@
+import argparse
 import os
+import sys
+import json
+import time
 import torch
 import torch.nn as nn
 import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel
 from torch.utils.data import Dataset, DataLoader
+from torch.utils.data.distributed import DistributedSampler
 import numpy as np
 import torch.nn.functional as F
 
+# The cascade's healthy gate and the model registry are shared with the AI service (ai-service/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ai-service"))
+from healthy_gate import GATE_NUM_BANDS, HEALTHY_GATE_PATH, HealthyGate, band_energy_features
+from model_registry import ModelRegistry
+from model_variants import (ARCHITECTURES, BASELINE_ARCHITECTURE, MODEL_CONFIG_FILE, SPECTRAL_ARCHITECTURE,
+                            build_variant, count_macs, count_parameters, read_model_config, write_model_config)
+from spectral import SpectralFrontEnd
+from resampling import SOURCE_SAMPLE_RATE, to_model_rate, window_rate, window_samples
+from window_archive import ArchiveReader
+from preprocess_data import SPECTRAL_CACHE_CONFIG, class_directories, data_sample_rate
+
+from distributed_training import load_checkpoint, save_checkpoint, seed_everything, setup_distributed
+from input_pipeline import DEFAULT_NUM_WORKERS, BatchAugment, TensorBatchLoader, make_loader
+
 # 1) Custom Dataset
 class VibrationDataset(Dataset):
     def __init__(self, data_root, transform=None):
@@ -15,7 +35,8 @@ class VibrationDataset(Dataset):
 
         # data_root is a directory with subfolders for each class
         # e.g. ["healthy", "belt", "bearing", ...]
-        class_names = sorted(os.listdir(data_root))
+        # (files next to them, e.g. preprocess_manifest.json, are not classes)
+        class_names = class_directories(data_root)
         
         # This creates a mapping like {'bearing': 0, 'belt': 1, 'healthy': 2, ...}
         self.class_to_idx = {name: i for i, name in enumerate(class_names)}
@@ -25,12 +46,9 @@ class VibrationDataset(Dataset):
 
         for class_name in class_names:
             class_path = os.path.join(data_root, class_name)
-            if not os.path.isdir(class_path):
-                continue
-            
             label = self.class_to_idx[class_name]
             
-            for fname in os.listdir(class_path):
+            for fname in sorted(os.listdir(class_path)):  # same order (and split) on every machine
                 if fname.endswith(".npy"):
                     filepath = os.path.join(class_path, fname)
                     self.samples.append(filepath)
@@ -58,6 +76,116 @@ class VibrationDataset(Dataset):
         
         return signal_tensor, label_tensor
 
+# 1b) Packed, memory-mapped dataset (written by preprocess_data.pack_chunks)
+class PackedVibrationDataset(Dataset):
+    """
+    Reads one split of the packed dataset: each shard is np.memmap'ed once and
+    samples are returned as torch.from_numpy views of the mapped rows, so
+    __getitem__ does no file open, header parse or copy.
+    """
+    def __init__(self, packed_root, split="train", transform=None):
+        self.transform = transform
+
+        with open(os.path.join(packed_root, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        self.idx_to_class = {int(i): name for i, name in manifest["class_mapping"].items()}
+        self.class_to_idx = {name: i for i, name in self.idx_to_class.items()}
+        window_samples = manifest["window_samples"]
+
+        self.shards = []
+        labels = []
+        for shard in manifest["splits"][split]["shards"]:
+            # mode="c" (copy-on-write) gives writable views, which torch.from_numpy requires
+            data = np.memmap(os.path.join(packed_root, shard["data"]), dtype=np.float32, mode="c",
+                             shape=(shard["num_windows"], window_samples))
+            self.shards.append(data)
+            labels.append(np.load(os.path.join(packed_root, shard["labels"])))
+
+        self.labels = torch.from_numpy(np.concatenate(labels)) if labels else torch.empty(0, dtype=torch.long)
+        # Global index -> (shard, row) via cumulative shard sizes
+        self.shard_ends = np.cumsum([len(d) for d in self.shards])
+
+        print(f"Packed '{split}' split: {len(self)} windows in {len(self.shards)} shard(s), "
+              f"classes: {self.class_to_idx}")
+
+    def __len__(self):
+        return int(self.shard_ends[-1]) if len(self.shard_ends) else 0
+
+    def __getitem__(self, idx):
+        shard_idx = int(np.searchsorted(self.shard_ends, idx, side="right"))
+        row = idx - (int(self.shard_ends[shard_idx - 1]) if shard_idx > 0 else 0)
+        signal = self.shards[shard_idx][row]
+
+        if self.transform:
+            signal = self.transform(signal)
+
+        # Shape for signal: [1, 38400] (channels, signal_length)
+        return torch.from_numpy(signal).unsqueeze(0), self.labels[idx]
+
+# 1c) Windows recorded by the AI service (ai-service/window_archive.py, RECORD_DIR)
+class ArchiveVibrationDataset(Dataset):
+    """
+    Recorded windows, decoded from the memory-mapped archive segments in
+    __getitem__ and normalized (and resampled to `sample_rate`, whatever rate
+    they were recorded at) like the service prepares them. Labels come
+    from `device_labels` ({device id: class}, for devices whose condition is
+    known; windows of other devices are skipped) or, without it, are the
+    service's predictions (pseudo-labels) with at least `min_confidence`.
+    """
+    def __init__(self, archive_root, device_labels=None, min_confidence=0.0, start=None, end=None, transform=None,
+                 sample_rate=SOURCE_SAMPLE_RATE):
+        self.transform = transform
+        self.sample_rate = sample_rate
+        self.reader = ArchiveReader(archive_root)
+        if device_labels is not None:
+            rows = self.reader.select(devices=sorted(device_labels), start=start, end=end)
+            targets = [device_labels[self.reader.device_of(row)] for row in rows]
+        else:
+            rows = self.reader.select(start=start, end=end)
+            rows = rows[rows["confidence"] >= min_confidence]
+            targets = [self.reader.label_of(row) for row in rows]
+        self.rows = rows
+
+        class_names = sorted(set(targets))
+        self.class_to_idx = {name: i for i, name in enumerate(class_names)}
+        self.idx_to_class = {i: name for name, i in self.class_to_idx.items()}
+        self.labels = torch.tensor([self.class_to_idx[t] for t in targets], dtype=torch.long)
+        print(f"Archive '{archive_root}': {len(self)} of {len(self.reader)} recorded windows selected "
+              f"({'device labels' if device_labels is not None else 'predicted labels'}), "
+              f"classes: {self.class_to_idx}")
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, idx):
+        signal = to_model_rate(self.reader.read_window(self.rows[idx])[np.newaxis], self.sample_rate)[0]
+        if self.transform:
+            signal = self.transform(signal)
+        # Shape for signal: [1, window_samples(sample_rate)] (channels, signal_length)
+        return torch.from_numpy(signal).unsqueeze(0), self.labels[idx]
+
+def training_sample_rate(data_root, packed_root=None, spectral_root=None, archive_root=None, sample_rate=None):
+    """
+    Sample rate (Hz) the model is trained at: the rate of the training windows
+    (resampled chunks, see preprocess_data.py --sample-rate), or `sample_rate`
+    for recorded windows, which are resampled as they are read.
+    """
+    if archive_root is not None:
+        return sample_rate or SOURCE_SAMPLE_RATE
+    if spectral_root is not None:
+        with open(os.path.join(spectral_root, SPECTRAL_CACHE_CONFIG)) as f:
+            data_rate = json.load(f)["sample_rate"]
+    elif packed_root is not None:
+        with open(os.path.join(packed_root, "manifest.json")) as f:
+            data_rate = window_rate(json.load(f)["window_samples"])
+    else:
+        data_rate = data_sample_rate(data_root)
+    if sample_rate is not None and sample_rate != data_rate:
+        raise ValueError(f"The training windows are at {data_rate} Hz, not {sample_rate} Hz; "
+                         f"resample them with preprocess_data.py --sample-rate {sample_rate}")
+    return data_rate
+
 # 2) Define Model (Improved CNN)
 class ImprovedCNN(nn.Module):
     def __init__(self, num_classes=4):
@@ -93,49 +221,338 @@ class ImprovedCNN(nn.Module):
         x = self.fc3(x)
         return x
 
-def train_model(data_root, epochs=50, batch_size=8, lr=0.0005):  # More epochs, smaller batch
+def build_network(architecture=BASELINE_ARCHITECTURE, num_classes=4, spectral_config=None):
+    """ImprovedCNN for the baseline, otherwise a compact or spectral variant from ai-service/model_variants.py."""
+    if architecture == BASELINE_ARCHITECTURE:
+        return ImprovedCNN(num_classes=num_classes)
+    return build_variant(architecture, num_classes, spectral_config)
+
+def model_inputs(signals, front_end=None, cached_features=False):
+    """
+    What the network takes for a [B, 1, L] batch: the batch itself, or for a
+    spectral model its [B, num_bands, num_frames] features - computed on the
+    batch's device, or just reshaped when the batch holds cached (flattened)
+    features from preprocess_data.cache_spectral_features.
+    """
+    if front_end is None:
+        return signals
+    if cached_features:
+        return signals.view(signals.size(0), *front_end.feature_shape)
+    with torch.no_grad():
+        return front_end.torch_features(signals[:, 0])
+
+# Knowledge distillation: a compact student learns from a trained model's softened outputs
+def load_teacher(model_dir, num_classes, device):
+    """
+    Frozen eval-mode model from `model_dir` (fault_detector.pt + model_config.json,
+    e.g. a registry version) and its spectral front end (None for waveform models).
+    """
+    config = read_model_config(model_dir)
+    teacher = build_network(config["architecture"], num_classes, config.get("spectral"))
+    teacher.load_state_dict(torch.load(os.path.join(model_dir, "fault_detector.pt"), map_location="cpu"))
+    teacher.to(device).eval()
+    for parameter in teacher.parameters():
+        parameter.requires_grad_(False)
+    front_end = None
+    if config["architecture"] == SPECTRAL_ARCHITECTURE:
+        front_end = SpectralFrontEnd.from_config(config.get("spectral"))
+    return teacher, front_end
+
+def distillation_loss(student_logits, teacher_logits, hard_loss, temperature=4.0, alpha=0.7):
+    """
+    alpha * T^2 * KL(teacher || student) on temperature-softened outputs plus
+    (1 - alpha) * the usual cross-entropy on the labels (Hinton et al.).
+    """
+    soft_loss = F.kl_div(F.log_softmax(student_logits / temperature, dim=1),
+                         F.softmax(teacher_logits / temperature, dim=1), reduction="batchmean")
+    return alpha * temperature * temperature * soft_loss + (1 - alpha) * hard_loss
+
+# 3) Export for serving (TorchScript + ONNX)
+def fold_batchnorm(model):
+    """
+    Returns an eval-mode copy of the model with every BatchNorm1d folded into
+    the Conv1d in front of it (ImprovedCNN's conv1/bn1 ... conv4/bn4, and each
+    Conv1d -> BatchNorm1d pair in the compact variants' blocks), so inference
+    runs one op per layer instead of two.
+    """
+    import copy
+    from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+    fused = copy.deepcopy(model).cpu().eval()
+    for i in range(1, 5):
+        if hasattr(fused, f"conv{i}") and hasattr(fused, f"bn{i}"):
+            setattr(fused, f"conv{i}", fuse_conv_bn_eval(getattr(fused, f"conv{i}"), getattr(fused, f"bn{i}")))
+            setattr(fused, f"bn{i}", nn.Identity())
+    for block in [m for m in fused.modules() if isinstance(m, nn.Sequential)]:
+        children = list(block.named_children())
+        for (conv_name, conv), (bn_name, bn) in zip(children, children[1:]):
+            if isinstance(conv, nn.Conv1d) and isinstance(bn, nn.BatchNorm1d):
+                setattr(block, conv_name, fuse_conv_bn_eval(conv, bn))
+                setattr(block, bn_name, nn.Identity())
+    return fused
+
+def export_model(model, output_prefix="fault_detector", num_samples=38400):
+    """
+    Writes the serving artifacts next to the eager state dict:
+      <prefix>.torchscript.pt - traced + frozen TorchScript module
+      <prefix>.onnx           - ONNX graph with a dynamic batch dimension
+    Both are exported from the BatchNorm-folded model. Spectral models are
+    exported without their front end (the service computes the features).
+    Returns the paths written; a failed ONNX export leaves no .onnx behind.
+    """
+    fused = fold_batchnorm(model)
+    example = torch.zeros((1,) + tuple(getattr(model, "input_shape", (1, num_samples))))
+
+    with torch.no_grad():
+        traced = torch.jit.trace(fused, example)
+        frozen = torch.jit.freeze(traced)
+    torchscript_path = f"{output_prefix}.torchscript.pt"
+    frozen.save(torchscript_path)
+    print(f"TorchScript model saved to {torchscript_path}")
+    written = [torchscript_path]
+
+    onnx_path = f"{output_prefix}.onnx"
+    try:
+        # AdaptiveAvgPool1d(64) over 2401 steps needs the torch.export based
+        # exporter (default in recent PyTorch, requires `onnx` + `onnxscript`)
+        torch.onnx.export(
+            fused, example, onnx_path,
+            input_names=["signal"],
+            output_names=["logits"],
+            dynamic_axes={"signal": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=18,
+            external_data=False,  # keep the weights inside the single .onnx file
+        )
+        print(f"ONNX model saved to {onnx_path}")
+        written.append(onnx_path)
+    except Exception as e:
+        print(f"Skipping ONNX export: {e}")
+        # Neither a partial file nor one from an earlier run may pass as this model's
+        if os.path.exists(onnx_path):
+            os.remove(onnx_path)
+    return written
+
+# 4) Cascade first stage: cheap "clearly healthy" gate
+def extract_gate_features(dataset, batch_size=64, num_bands=GATE_NUM_BANDS):
+    """Band-energy features and labels for every window of `dataset`."""
+    features, labels = [], []
+    for signals, batch_labels in DataLoader(dataset, batch_size=batch_size, shuffle=False):
+        features.append(band_energy_features(signals[:, 0].numpy(), num_bands))
+        labels.append(batch_labels.numpy())
+    return np.concatenate(features), np.concatenate(labels)
+
+def train_healthy_gate(train_dataset, val_dataset, healthy_idx, healthy_label="healthy",
+                       max_fault_pass_rate=0.01, output_path=HEALTHY_GATE_PATH):
+    """
+    Fits the logistic healthy-vs-fault gate used by ai_inference's cascade
+    (INFERENCE_CASCADE=1) and saves it to `output_path`.
+
+    The threshold is set on the validation windows so that at most
+    `max_fault_pass_rate` of the faulty ones would be short-circuited as healthy;
+    everything below it still goes through the full model.
+    """
+    x_train, y_train = extract_gate_features(train_dataset)
+    mean = x_train.mean(axis=0)
+    std = x_train.std(axis=0) + 1e-6
+
+    inputs = torch.tensor((x_train - mean) / std, dtype=torch.float32)
+    targets = torch.tensor(y_train == healthy_idx, dtype=torch.float32)
+    linear = nn.Linear(inputs.shape[1], 1)
+    optimizer = optim.LBFGS(linear.parameters(), max_iter=500)
+
+    def closure():
+        optimizer.zero_grad()
+        loss = F.binary_cross_entropy_with_logits(linear(inputs)[:, 0], targets)
+        loss = loss + 1e-3 * linear.weight.pow(2).sum()  # keeps separable data from diverging
+        loss.backward()
+        return loss
+
+    optimizer.step(closure)
+
+    gate = HealthyGate(
+        linear.weight.detach().numpy()[0], linear.bias.item(), mean, std,
+        threshold=1.0, healthy_label=healthy_label,
+    )
+
+    # Threshold: just above the fault score ranked at `max_fault_pass_rate`
+    x_val, y_val = extract_gate_features(val_dataset)
+    p_healthy = gate.probability_from_features(x_val)
+    fault_scores = np.sort(p_healthy[y_val != healthy_idx])
+    if len(fault_scores):
+        allowed = int(max_fault_pass_rate * len(fault_scores))
+        gate.threshold = max(0.5, float(np.nextafter(fault_scores[-(allowed + 1)], np.inf)))
+    else:
+        gate.threshold = 0.5
+    gate.save(output_path)
+
+    passed = p_healthy >= gate.threshold
+    healthy = y_val == healthy_idx
+    print(f"Healthy gate saved to {output_path} (threshold {gate.threshold:.4f}): "
+          f"short-circuits {passed[healthy].mean() if healthy.any() else 0.0:.1%} of healthy and "
+          f"{passed[~healthy].mean() if (~healthy).any() else 0.0:.1%} of faulty validation windows")
+    return gate
+
+def train_model(data_root, epochs=50, batch_size=8, lr=0.0005, packed_root=None,  # More epochs, smaller batch
+                registry_dir=None, cache="auto", num_workers=DEFAULT_NUM_WORKERS, augment=None,
+                checkpoint_dir=None, checkpoint_every=1, resume=False, seed=0, export=True,
+                architecture=BASELINE_ARCHITECTURE, teacher_dir=None, distill_alpha=0.7, distill_temperature=4.0,
+                spectral_root=None, archive_root=None, archive_labels=None, archive_min_confidence=0.0,
+                sample_rate=None):
+    """
+    Trains the fault detector and writes all serving artifacts. Returns the
+    per-epoch history (loss, accuracy, seconds).
+
+    cache: True keeps each split decoded in one in-RAM tensor, False streams
+    from disk through multi-worker DataLoaders, "auto" caches if it fits (see
+    input_pipeline.py). augment: an optional BatchAugment applied to every
+    training batch on the training device.
+
+    Launched with torchrun, every process trains a DistributedDataParallel
+    replica on its shard of each epoch (`batch_size` is per process), and only
+    rank 0 logs and writes files (see distributed_training.py).
+    checkpoint_dir: save model/optimizer/scheduler/RNG state there every
+    `checkpoint_every` epochs; with `resume`, continue from the checkpoint.
+
+    architecture: "baseline" (ImprovedCNN) or a compact variant from
+    model_variants.py. teacher_dir: distill from the trained model in that
+    folder (see distillation_loss for distill_alpha / distill_temperature).
+    The "spectral" architecture computes spectral.py features of every batch on
+    the training device, or reads them from `spectral_root` (a feature cache
+    written by preprocess_data.py --spectral, which then replaces data_root;
+    no waveform augmentation, healthy gate or distillation in that mode).
+    archive_root: train on windows recorded by the AI service instead of
+    data_root, labeled by `archive_labels` ({device id: class}) or by the
+    recorded predictions with at least `archive_min_confidence` (see
+    ArchiveVibrationDataset).
+    sample_rate: input rate of the model (see training_sample_rate; default:
+    the rate of the training windows), recorded in model_config.json so the
+    service resamples requests to it.
+    """
+    context = setup_distributed()
+    log = print if context.is_main else (lambda *args, **kwargs: None)
+    seed_everything(seed + context.rank)  # replicas start identical anyway: DDP broadcasts rank 0's weights
+
+    sample_rate = training_sample_rate(data_root, packed_root, spectral_root, archive_root, sample_rate)
+    num_samples = window_samples(sample_rate)
+    front_end = None
+    if architecture == SPECTRAL_ARCHITECTURE:
+        front_end = SpectralFrontEnd.from_config({"window_samples": num_samples, "sample_rate": sample_rate})
+    cached_features = front_end is not None and spectral_root is not None
+    if spectral_root is not None and front_end is None:
+        raise ValueError(f"spectral_root needs architecture='{SPECTRAL_ARCHITECTURE}'")
+    if cached_features:
+        if packed_root is not None or teacher_dir is not None:
+            raise ValueError("spectral_root cannot be combined with packed_root or teacher_dir")
+        with open(os.path.join(spectral_root, SPECTRAL_CACHE_CONFIG)) as f:
+            if json.load(f) != front_end.config:
+                raise ValueError(f"{spectral_root} was computed with other spectral settings; "
+                                 f"rerun preprocess_data.py --spectral-only")
+        data_root = spectral_root
+        if augment is not None:
+            log("Cached spectral features: waveform augmentation disabled")
+            augment = None
+
+    if archive_root is not None and (packed_root is not None or cached_features):
+        raise ValueError("archive_root cannot be combined with packed_root or spectral_root")
+
     # dataset
-    dataset = VibrationDataset(data_root=data_root)
+    if packed_root is not None:
+        # Packed shards already carry a deterministic train/val split
+        train_dataset = PackedVibrationDataset(packed_root, split="train")
+        val_dataset = PackedVibrationDataset(packed_root, split="val")
+        dataset = train_dataset
+        log(f"Total samples: {len(train_dataset) + len(val_dataset)}")
+    else:
+        if archive_root is not None:
+            dataset = ArchiveVibrationDataset(archive_root, device_labels=archive_labels,
+                                              min_confidence=archive_min_confidence, sample_rate=sample_rate)
+        else:
+            dataset = VibrationDataset(data_root=data_root)
     
-    # --- Create Train/Validation Split ---
-    # 80% for training, 20% for validation
-    train_size = int(0.8 * len(dataset))
-    val_size = len(dataset) - train_size
-    train_dataset, val_dataset = torch.utils.data.random_split(dataset, [train_size, val_size])
+        # --- Create Train/Validation Split ---
+        # 80% for training, 20% for validation (seeded: identical in every process and on resume)
+        train_size = int(0.8 * len(dataset))
+        val_size = len(dataset) - train_size
+        train_dataset, val_dataset = torch.utils.data.random_split(
+            dataset, [train_size, val_size], generator=torch.Generator().manual_seed(seed))
+        log(f"Total samples: {len(dataset)}")
 
-    print(f"Total samples: {len(dataset)}")
-    print(f"Training samples: {len(train_dataset)}")
-    print(f"Validation samples: {len(val_dataset)}")
-
-    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False)
+    log(f"Training samples: {len(train_dataset)}")
+    log(f"Validation samples: {len(val_dataset)}")
 
     # model, loss, optimizer
     num_classes = len(dataset.class_to_idx)
-    model = ImprovedCNN(num_classes=num_classes)
+    model = build_network(architecture, num_classes, front_end.config if front_end is not None else None)
+    log(f"Architecture: {architecture} ({count_parameters(model):,} parameters, "
+        f"{count_macs(model, num_samples) / 1e6:.0f}M MACs per window at {sample_rate} Hz)")
     
-    # Check for GPU
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    # Check for GPU (multi-process training runs on CPU cores)
+    device = torch.device("cuda" if torch.cuda.is_available() and not context.distributed else "cpu")
     model.to(device)
-    print(f"Training on device: {device}")
+    teacher = teacher_front_end = None
+    if teacher_dir is not None:
+        teacher_rate = read_model_config(teacher_dir)["sample_rate"]
+        if teacher_rate != sample_rate:
+            raise ValueError(f"The teacher in {teacher_dir} takes {teacher_rate} Hz windows, not {sample_rate} Hz")
+        teacher, teacher_front_end = load_teacher(teacher_dir, num_classes, device)
+        log(f"Distilling from {teacher_dir} (alpha {distill_alpha}, temperature {distill_temperature})")
+    log(f"Training on device: {device}" + (f", {context.world_size} processes x {torch.get_num_threads()} threads"
+                                           if context.distributed else ""))
+
+    # Each epoch's shuffle depends only on (seed, epoch), never on the global RNG,
+    # so a resumed run sees exactly the batches the interrupted one would have
+    train_sampler = DistributedSampler(train_dataset, num_replicas=context.world_size, rank=context.rank,
+                                       shuffle=True, seed=seed)
+    val_sampler = (DistributedSampler(val_dataset, num_replicas=context.world_size, rank=context.rank,
+                                      shuffle=False) if context.distributed else None)
+
+    loader_start = time.perf_counter()
+    loader_options = dict(cache=cache, num_workers=num_workers, pin_memory=device.type == "cuda",
+                          cache_copies=context.local_world_size,
+                          generator=torch.Generator().manual_seed(seed + context.rank))
+    train_loader = make_loader(train_dataset, batch_size, shuffle=True, sampler=train_sampler, **loader_options)
+    val_loader = make_loader(val_dataset, batch_size, shuffle=False, sampler=val_sampler, **loader_options)
+    cached = isinstance(train_loader, TensorBatchLoader)
+    log(f"Input pipeline: {'in-memory cache' if cached else f'streaming, {num_workers} workers'}"
+        f"{' + batched augmentation' if augment is not None else ''} "
+        f"(set up in {time.perf_counter() - loader_start:.1f}s)")
 
     criterion = nn.CrossEntropyLoss()
     optimizer = optim.Adam(model.parameters(), lr=lr)
     scheduler = optim.lr_scheduler.StepLR(optimizer, step_size=15, gamma=0.5)  # Reduce LR every 15 epochs
 
+    start_epoch, history = 0, []
+    if checkpoint_dir is not None and resume:
+        start_epoch, history = load_checkpoint(context, checkpoint_dir, model, optimizer, scheduler)
+        if start_epoch:
+            log(f"Resumed from {checkpoint_dir} after epoch {start_epoch}")
+    replica = DistributedDataParallel(model) if context.distributed else model
+
     # train loop
-    for epoch in range(epochs):
-        model.train() # Set model to training mode
+    for epoch in range(start_epoch, epochs):
+        replica.train() # Set model to training mode
+        train_sampler.set_epoch(epoch)
         running_loss = 0.0
         correct_train = 0
         total_train = 0
+        epoch_start = time.perf_counter()
+        data_time = 0.0  # time spent waiting for batches (input pipeline stalls)
         
+        fetch_start = time.perf_counter()
         for signals, labels in train_loader:
-            signals, labels = signals.to(device), labels.to(device)
+            signals = signals.to(device, non_blocking=True)
+            labels = labels.to(device, non_blocking=True)
+            if augment is not None:
+                signals = augment(signals)
+            data_time += time.perf_counter() - fetch_start
             
             optimizer.zero_grad()
-            outputs = model(signals)
+            outputs = replica(model_inputs(signals, front_end, cached_features))
             loss = criterion(outputs, labels)
+            if teacher is not None:
+                with torch.no_grad():
+                    teacher_logits = teacher(model_inputs(signals, teacher_front_end))
+                loss = distillation_loss(outputs, teacher_logits, loss, distill_temperature, distill_alpha)
             loss.backward()
             optimizer.step()
             
@@ -143,34 +560,61 @@ def train_model(data_root, epochs=50, batch_size=8, lr=0.0005):  # More epochs,
             _, predicted = torch.max(outputs, 1)
             correct_train += (predicted == labels).sum().item()
             total_train += labels.size(0)
+            fetch_start = time.perf_counter()
 
+        running_loss, correct_train, total_train = context.all_reduce_sum(running_loss, correct_train, total_train)
         epoch_loss = running_loss / total_train
         epoch_acc = correct_train / total_train
         
         # --- Validation Loop ---
-        model.eval() # Set model to evaluation mode
+        replica.eval() # Set model to evaluation mode
         correct_val = 0
         total_val = 0
         with torch.no_grad():
             for signals, labels in val_loader:
                 signals, labels = signals.to(device), labels.to(device)
-                outputs = model(signals)
+                outputs = model(model_inputs(signals, front_end, cached_features))
                 _, predicted = torch.max(outputs, 1)
                 correct_val += (predicted == labels).sum().item()
                 total_val += labels.size(0)
         
+        correct_val, total_val = context.all_reduce_sum(correct_val, total_val)
         val_acc = correct_val / total_val
+        epoch_time = time.perf_counter() - epoch_start
+        history.append({"epoch": epoch + 1, "train_loss": epoch_loss, "train_acc": epoch_acc,
+                        "val_acc": val_acc, "seconds": epoch_time, "data_seconds": data_time})
 
-        print(f"Epoch {epoch+1}/{epochs}: "
-              f"Train Loss={epoch_loss:.4f}, Train Acc={epoch_acc:.4f} | "
-              f"Val Acc={val_acc:.4f}")
+        log(f"Epoch {epoch+1}/{epochs}: "
+            f"Train Loss={epoch_loss:.4f}, Train Acc={epoch_acc:.4f} | "
+            f"Val Acc={val_acc:.4f} | {epoch_time:.1f}s (waiting for data {data_time:.2f}s)")
 
         scheduler.step()
 
+        if checkpoint_dir is not None and ((epoch + 1) % checkpoint_every == 0 or epoch + 1 == epochs):
+            save_checkpoint(context, checkpoint_dir, epoch + 1, model, optimizer, scheduler, history)
+
+    context.shutdown()
+    if not (context.is_main and export):
+        return history
+
     # Save model
     model_save_path = "fault_detector.pt"
     torch.save(model.state_dict(), model_save_path)
+    model_config = {"sample_rate": sample_rate, "window_samples": num_samples}
+    if front_end is not None:
+        model_config["spectral"] = front_end.config
+    if teacher_dir is not None:
+        model_config["teacher"] = os.path.abspath(teacher_dir)
+    write_model_config(".", architecture, **model_config)
     print(f"Model saved to {model_save_path}")
+
+    # Export TorchScript / ONNX versions for the ai-service backends
+    artifacts = [MODEL_CONFIG_FILE] + export_model(model, num_samples=num_samples)
+
+    # Cheap first stage for the ai-service inference cascade
+    if "healthy" in dataset.class_to_idx and not cached_features:
+        train_healthy_gate(train_dataset, val_dataset, dataset.class_to_idx["healthy"])
+        artifacts.append(HEALTHY_GATE_PATH)
     
     # Save the class mapping
     class_map_path = "class_mapping.txt"
@@ -179,7 +623,77 @@ def train_model(data_root, epochs=50, batch_size=8, lr=0.0005):  # More epochs,
             f.write(f"{idx}:{class_name}\n")
     print(f"Class mapping saved to {class_map_path}")
 
+    # Versioned copy of all artifacts for the AI service (hot swap without restart)
+    if registry_dir is not None:
+        final = history[-1] if history else {}
+        # Only what this run wrote: a gate, ONNX or int8 file left by an earlier run stays out
+        version = ModelRegistry(registry_dir).publish(".", files=artifacts, metadata={
+            "data_root": packed_root or archive_root or data_root,
+            "epochs": epochs,
+            "batch_size": batch_size,
+            "processes": context.world_size,
+            "architecture": architecture,
+            "sample_rate": sample_rate,
+            "parameters": count_parameters(model),
+            "teacher": os.path.abspath(teacher_dir) if teacher_dir else None,
+            "lr": lr,
+            "classes": [dataset.idx_to_class[i] for i in sorted(dataset.idx_to_class)],
+            "train_samples": len(train_dataset),
+            "val_samples": len(val_dataset),
+            "final_train_loss": final.get("train_loss"),
+            "final_train_acc": final.get("train_acc"),
+            "final_val_acc": final.get("val_acc"),
+            "device": str(device),
+            "torch": torch.__version__,
+        })
+        print(f"Model published to {registry_dir} as version '{version}' "
+              f"(activate with POST /models/{version}/activate)")
+    return history
+
 
 if __name__ == "__main__":
-    # Use your actual chunks folder name
-    train_model(data_root="secdatachunks", epochs=10, batch_size=16)
\ No newline at end of file
+    # Single process:  python train.py
+    # Data-parallel:   torchrun --standalone --nproc_per_node=4 train.py --checkpoint-dir checkpoints
+    parser = argparse.ArgumentParser(description="Train the fault detector")
+    parser.add_argument("--data-root", default="secdatachunks")  # Use your actual chunks folder name
+    parser.add_argument("--packed-root", default=None)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=16, help="per process")
+    parser.add_argument("--lr", type=float, default=0.0005)
+    parser.add_argument("--cache", choices=["auto", "on", "off"], default="auto")
+    parser.add_argument("--workers", type=int, default=DEFAULT_NUM_WORKERS)
+    parser.add_argument("--augment", action="store_true",
+                        help="random shift + noise on every batch (windows stay normalized like served ones)")
+    parser.add_argument("--checkpoint-dir", default=None)
+    parser.add_argument("--checkpoint-every", type=int, default=1, help="epochs between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="continue from --checkpoint-dir")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--architecture", choices=ARCHITECTURES, default=BASELINE_ARCHITECTURE)
+    parser.add_argument("--teacher", default=None, help="folder with a trained model to distill from")
+    parser.add_argument("--distill-alpha", type=float, default=0.7, help="weight of the teacher's soft targets")
+    parser.add_argument("--distill-temperature", type=float, default=4.0)
+    parser.add_argument("--spectral-root", default=None,
+                        help="cached spectral features (preprocess_data.py --spectral) for --architecture spectral")
+    parser.add_argument("--archive-root", default=None, help="train on windows recorded by the AI service (RECORD_DIR)")
+    parser.add_argument("--archive-labels", default=None,
+                        help='JSON file {"device id": "class"}; default: the recorded predictions')
+    parser.add_argument("--archive-min-confidence", type=float, default=0.0,
+                        help="minimum recorded confidence of predicted labels")
+    parser.add_argument("--sample-rate", type=int, default=None,
+                        help="model input rate in Hz (default: the rate of the training windows, "
+                             "see preprocess_data.py --sample-rate)")
+    args = parser.parse_args()
+    archive_labels = None
+    if args.archive_labels:
+        with open(args.archive_labels) as f:
+            archive_labels = json.load(f)
+
+    train_model(data_root=args.data_root, epochs=args.epochs, batch_size=args.batch_size, lr=args.lr,
+                packed_root=args.packed_root, registry_dir=os.environ.get("MODEL_REGISTRY_DIR"),
+                cache={"auto": "auto", "on": True, "off": False}[args.cache], num_workers=args.workers,
+                augment=BatchAugment() if args.augment else None,
+                checkpoint_dir=args.checkpoint_dir, checkpoint_every=args.checkpoint_every,
+                resume=args.resume, seed=args.seed, architecture=args.architecture, teacher_dir=args.teacher,
+                distill_alpha=args.distill_alpha, distill_temperature=args.distill_temperature,
+                spectral_root=args.spectral_root, archive_root=args.archive_root, archive_labels=archive_labels,
+                archive_min_confidence=args.archive_min_confidence, sample_rate=args.sample_rate)
\ No newline at end of file